@@ -5,6 +5,10 @@ Usage:
     To run as a program "python3 main.py"
     To use as a library:
         "from pokemonCardLogger import clss_pickle as pcl" for pickle storage
+        "from pokemonCardLogger import clss_sqlite as pcs" for sqlite storage
+        "from pokemonCardLogger import clss_paged as pcp" for memory mapped page storage
+        "from pokemonCardLogger import clss_sharded as pcsh" for sharded folder storage
+        "from pokemonCardLogger import clss_arrow as pca" for Arrow / Parquet storage, needs pyarrow
     To get just the packs and their ids, run "python3 packRef.py"
 """
-from pokemonCardLogger import main, clss_pickle, clss_base, assets, packRef
+from pokemonCardLogger import main, clss_pickle, clss_sqlite, clss_paged, clss_sharded, clss_base, assets, packRef
@@ -0,0 +1,244 @@
+"""
+Description:
+    Counts and values of a log grouped by set, rarity, supertype, Pokémon type, print type or release date
+    The metadata of every card (its set, rarity, supertype, types and release date) is cached on disk in a sqlite
+    database shared by every log, so a card is only requested from pokemonTcgApi the first time any log holds it. The
+    log is grouped in a single pass, and when the collection value of the log is kept up to date its prices are used
+    instead of requesting them
+Usage:
+    from analytics import group_log
+    for set_name, group in group_log(db, "set_name").items():
+        print(set_name, group["cards"], cents_to_dollars(group["value"]))
+"""
+import sqlite3
+from valuation import *
+
+METADATA_FILE = os.path.join(prog_data, "card_metadata.sqlite")
+METADATA_FIELDS = ("set_id", "set_name", "series", "release_date", "rarity", "supertype", "types")
+METADATA_SCHEMA = """
+CREATE TABLE IF NOT EXISTS cards (
+    card_id TEXT PRIMARY KEY,
+    set_id TEXT,
+    set_name TEXT,
+    series TEXT,
+    release_date TEXT,
+    rarity TEXT,
+    supertype TEXT,
+    types TEXT
+) WITHOUT ROWID;
+"""
+SQL_GET_METADATA = "SELECT card_id, set_id, set_name, series, release_date, rarity, supertype, types FROM cards"
+SQL_PUT_METADATA = "INSERT OR REPLACE INTO cards VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+GROUP_KEYS = {
+    "set": lambda meta, print_type: (meta["set_id"], ),
+    "set_name": lambda meta, print_type: (meta["set_name"], ),
+    "series": lambda meta, print_type: (meta["series"], ),
+    "rarity": lambda meta, print_type: (meta["rarity"], ),
+    "supertype": lambda meta, print_type: (meta["supertype"], ),
+    "type": lambda meta, print_type: tuple(meta["types"].split(",")) if meta["types"] else (None, ),
+    "print_type": lambda meta, print_type: (print_type, ),
+    "release_year": lambda meta, print_type: (meta["release_date"] and meta["release_date"][:4], ),
+    "release_date": lambda meta, print_type: (meta["release_date"], )
+}
+UNKNOWN_METADATA = dict.fromkeys(METADATA_FIELDS)
+
+
+def card_metadata(data: dict):
+    """
+    Description:
+        picks the metadata that logs are grouped by out of the card data
+    Parameters:
+        :param data: the card data from pokemonTcgApi
+        :return: dictionary of METADATA_FIELDS, a field the card does not have is None
+    """
+    pack = data.get("set") or {}
+    return {
+        "set_id": pack.get("id"),
+        "set_name": pack.get("name"),
+        "series": pack.get("series"),
+        "release_date": pack.get("releaseDate"),
+        "rarity": data.get("rarity"),
+        "supertype": data.get("supertype"),
+        "types": ",".join(data.get("types") or ()) or None
+    }
+
+
+class MetadataCache:
+    """
+    Description:
+        the metadata of cards kept in a sqlite database, read into memory when it is opened since there are only as
+        many entries as there are cards in the game
+    """
+
+    def __init__(self, file: str = None):
+        """
+        Description:
+            Constructor method
+        Parameters:
+            :param file: the path to the database, defaults to METADATA_FILE, ":memory:" keeps it in memory only
+        """
+        self.file = file or METADATA_FILE
+        self.conn = sqlite3.connect(self.file)
+        self.conn.executescript(METADATA_SCHEMA)
+        self.metadata = {
+            row[0]: dict(zip(METADATA_FIELDS, row[1:])) for row in self.conn.execute(SQL_GET_METADATA)
+        }
+        self._new = {}
+
+    def __contains__(self, card_id: str):
+        return card_id in self.metadata
+
+    def get(self, card_id: str):
+        """
+        Description:
+            the cached metadata of a card
+        Parameters:
+            :param card_id: the id of the card according to pokemonTcgApi
+            :return: dictionary of METADATA_FIELDS, or None if the card is not cached
+        """
+        return self.metadata.get(card_id)
+
+    def put(self, card_id: str, data: dict):
+        """
+        Description:
+            caches the metadata of a card, it is stored by save()
+        Parameters:
+            :param card_id: the id of the card according to pokemonTcgApi
+            :param data: the card data from pokemonTcgApi
+            :return: dictionary of METADATA_FIELDS
+        """
+        meta = self.metadata[card_id] = self._new[card_id] = card_metadata(data)
+        return meta
+
+    def save(self):
+        """
+        Description:
+            stores the metadata cached since the last save
+        Parameters:
+            :return: None
+        """
+        if not self._new:
+            return
+        with self.conn:
+            self.conn.executemany(SQL_PUT_METADATA, (
+                (card_id, *(meta[field] for field in METADATA_FIELDS)) for card_id, meta in self._new.items()
+            ))
+        self._new = {}
+
+    def close(self):
+        """
+        Description:
+            stores the new metadata and closes the database
+        Parameters:
+            :return: None
+        """
+        self.save()
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+def group_log(db: DbHandleBase, keys: (str, tuple) = "set", category: (str, None) = "market",
+              cache: MetadataCache = None, value: RunningValue = None, missing: list = None,
+              workers: int = PRICE_WORKERS, window: int = PRICE_WINDOW):
+    """
+    Description:
+        counts and values the log by groups of cards in a single pass
+        a card is requested from pokemonTcgApi only when its metadata is not cached or its price is needed and value
+        has not valued it, several at the same time and cached by RqHandle, the other cards are added up while they
+        are requested
+        a card of more than one Pokémon type is in the group of each of its types
+    Parameters:
+        :param db: an instance of a DbHandle
+        :param keys: one of GROUP_KEYS, or a tuple of them to group by all of them at once
+        :param category: the price category the groups are valued by, None to only count the cards
+        :param cache: the metadata cache, defaults to opening METADATA_FILE
+        :param value: the RunningValue of the log over PRICE_CATEGORIES, whose prices are used, cards it has not valued
+        are requested
+        :param missing: a list that tuple card_id, print_type and reason is added to for every row without metadata or a
+        price
+        :param workers: the number of requests made at the same time
+        :param window: the largest number of cards requested ahead
+        :return: dictionary of the group, a tuple of the value of each key when keys is a tuple, to a dictionary of
+        "cards", the number of cards, "entries", the number of log entries, "value", the value in cents and "priced",
+        the number of cards that have a price, groups of cards without the metadata are None
+    """
+    single = isinstance(keys, str)
+    keys = (keys, ) if single else tuple(keys)
+    for key in keys:
+        if key not in GROUP_KEYS:
+            raise ValueError(f"unknown group key {key}")
+    if category is not None and category not in PRICE_CATEGORIES:
+        raise ValueError(f"unknown price category {category}")
+    price_index = None if category is None else PRICE_CATEGORIES.index(category)
+    own_cache = cache is None
+    cache = MetadataCache() if own_cache else cache
+    rq = db.rq
+
+    def known_prices(card_id: str, print_type: str):
+        return None if value is None else value.entry_prices(card_id, print_type)
+
+    def needs_request(rows: list):
+        card_id = rows[0][0]
+        if card_id not in cache:
+            return True
+        return price_index is not None and any(known_prices(card_id, print_type) is None for _, print_type, _ in rows)
+
+    def request(rows: list):
+        try:
+            return rows, rq.get_card(rows[0][0])["data"], None
+        except ConnectionError:
+            return rows, None, "the card could not be requested"
+
+    groups = {}
+
+    def add(rows: list, data: (dict, None), reason: (str, None)):
+        card_id = rows[0][0]
+        meta = cache.get(card_id)
+        if meta is None and data is not None:
+            meta = cache.put(card_id, data)
+        if meta is None:
+            meta = UNKNOWN_METADATA
+            if missing is not None:
+                missing.extend((card_id, print_type, reason) for _, print_type, _ in rows)
+        for _, print_type, qnty in rows:
+            price = None
+            if price_index is not None:
+                prices = known_prices(card_id, print_type)
+                if prices is not None:
+                    price = prices[price_index]
+                elif data is not None:
+                    price = card_cents(data, print_type, (category, ))[0][0]
+                if price is None and missing is not None and meta is not UNKNOWN_METADATA:
+                    missing.append((card_id, print_type, reason or f"the card has no {category} price for {print_type}"))
+            for group in itertools.product(*(GROUP_KEYS[key](meta, print_type) for key in keys)):
+                group = group[0] if single else group
+                totals = groups.get(group)
+                if totals is None:
+                    totals = groups[group] = {"cards": 0, "entries": 0, "value": 0, "priced": 0}
+                totals["cards"] += qnty
+                totals["entries"] += 1
+                if price is not None:
+                    totals["value"] += price * qnty
+                    totals["priced"] += qnty
+
+    def to_request():
+        for rows in (list(rows) for _, rows in itertools.groupby(db.get_log(), key=lambda row: row[0])):
+            if needs_request(rows):
+                yield rows
+            else:
+                add(rows, None, None)
+
+    try:
+        for rows, data, reason in prefetch_map(request, to_request(), workers, window, PRICE_CHUNK):
+            add(rows, data, reason)
+    finally:
+        if own_cache:
+            cache.close()
+        else:
+            cache.save()
+    return groups
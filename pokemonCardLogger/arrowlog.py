@@ -0,0 +1,423 @@
+"""
+Description:
+    A card log kept as a columnar Arrow table, for the Arrow / Parquet storage option
+    The table has one row per card id and print type, print types are dictionary encoded, and rows are sorted by card id
+    so a single card is found with a binary search. Single card changes are kept in a small pending dictionary that is
+    folded into the table in one vectorized step, and batches of changes are applied with Arrow compute functions
+    requires pyarrow
+Usage:
+    from arrowlog import ArrowCardLog
+"""
+import pyarrow as pa
+import pyarrow.compute as pc
+from cardlog import split_card_id, set_dicts
+
+SCHEMA = pa.schema([
+    ("card_id", pa.string()),
+    ("print_type", pa.dictionary(pa.int8(), pa.string())),
+    ("qnty", pa.int64())
+])
+PLAIN_SCHEMA = pa.schema([("card_id", pa.string()), ("print_type", pa.string()), ("qnty", pa.int64())])
+PENDING_MAX = 4096
+MERGE_STRATEGIES = ("sum", "max", "theirs")
+
+
+def to_table(rows):
+    """
+    Description:
+        builds a table of changes from rows
+    Parameters:
+        :param rows: an iterable of tuple card_id, print_type and qnty, or a pyarrow table with those columns
+        :return: pyarrow table with plain string print types
+    """
+    if isinstance(rows, pa.Table):
+        return rows.select(["card_id", "print_type", "qnty"]).cast(PLAIN_SCHEMA)
+    card_ids, print_types, qntys = [], [], []
+    for card_id, print_type, qnty in rows:
+        card_ids.append(card_id)
+        print_types.append(print_type)
+        qntys.append(qnty)
+    return pa.table([card_ids, print_types, qntys], schema=PLAIN_SCHEMA)
+
+
+class ArrowCardLog:
+    """
+    Description:
+        a card log of quantities keyed by card id and print type, backed by an Arrow table
+        has the same interface as CardLog
+    """
+    __slots__ = ("_table", "_pending", "_entries", "_total", "_print_type_totals")
+
+    def __init__(self, table: pa.Table = None):
+        """
+        Description:
+            Constructor method
+        Parameters:
+            :param table: a table with the card_id, print_type and qnty columns, without duplicate keys
+        """
+        self._pending = {}
+        self._set_table(to_table(()) if table is None else table)
+
+    def __len__(self):
+        return self._entries
+
+    def __iter__(self):
+        self.flush()
+        for batch in self._table.to_batches():
+            yield from zip(
+                batch.column("card_id").to_pylist(),
+                batch.column("print_type").to_pylist(),
+                batch.column("qnty").to_pylist()
+            )
+
+    def __repr__(self):
+        return f"ArrowCardLog({len(self)} entries)"
+
+    @property
+    def table(self):
+        """
+        Description:
+            the log as an Arrow table, with pending changes folded in
+        Parameters:
+            :return: pyarrow table sorted by card id
+        """
+        self.flush()
+        return self._table
+
+    def _set_table(self, table: pa.Table):
+        """
+        Description:
+            replaces the table, dropping empty rows, sorting it and recounting the running totals in vectorized steps
+        Parameters:
+            :param table: the new table
+            :return: None
+        """
+        table = table.filter(pc.greater(table.column("qnty"), 0))
+        table = table.sort_by("card_id")
+        self._table = pa.table(
+            [
+                table.column("card_id").combine_chunks(),
+                pc.dictionary_encode(table.column("print_type").cast(pa.string())).combine_chunks().cast(
+                    SCHEMA.field("print_type").type
+                ),
+                table.column("qnty").combine_chunks()
+            ],
+            schema=SCHEMA
+        )
+        self._entries = self._table.num_rows
+        self._total = pc.sum(self._table.column("qnty")).as_py() or 0
+        totals = self._table.cast(PLAIN_SCHEMA).group_by("print_type").aggregate([("qnty", "sum")])
+        self._print_type_totals = dict(zip(
+            totals.column("print_type").to_pylist(), totals.column("qnty_sum").to_pylist()
+        ))
+
+    def _bisect(self, card_id: str):
+        """
+        Description:
+            finds the first row of a card id in the sorted table
+        Parameters:
+            :param card_id: the id of the card according to pokemonTcgApi
+            :return: the index of the first row with a card id not below the given one
+        """
+        card_ids = self._table.column("card_id").chunk(0) if self._table.num_rows else None
+        low, high = 0, self._table.num_rows
+        while low < high:
+            mid = (low + high) // 2
+            if card_ids[mid].as_py() < card_id:
+                low = mid + 1
+            else:
+                high = mid
+        return low
+
+    def _table_rows(self, card_id: str):
+        """
+        Description:
+            gets the rows of a card id in the table, without the pending changes
+        Parameters:
+            :param card_id: the id of the card according to pokemonTcgApi
+            :return: generator of tuple print_type and qnty
+        """
+        index = self._bisect(card_id)
+        if index == self._table.num_rows:
+            return
+        card_ids = self._table.column("card_id").chunk(0)
+        print_types = self._table.column("print_type").chunk(0)
+        qntys = self._table.column("qnty").chunk(0)
+        while index < self._table.num_rows and card_ids[index].as_py() == card_id:
+            yield print_types[index].as_py(), qntys[index].as_py()
+            index += 1
+
+    def get(self, card_id: str, print_type: str):
+        """
+        Description:
+            gets the quantity of a card
+        Parameters:
+            :param card_id: the id of the card according to pokemonTcgApi
+            :param print_type: the print type of the card
+            :return: the quantity of the card, 0 if it is not in the log
+        """
+        qnty = self._pending.get((card_id, print_type))
+        if qnty is not None:
+            return qnty
+        for row_print_type, qnty in self._table_rows(card_id):
+            if row_print_type == print_type:
+                return qnty
+        return 0
+
+    def set(self, card_id: str, print_type: str, qnty: int):
+        """
+        Description:
+            sets the quantity of a card, removing it from the log if the quantity is not above 0
+        Parameters:
+            :param card_id: the id of the card according to pokemonTcgApi
+            :param print_type: the print type of the card
+            :param qnty: the new quantity of the card
+            :return: None
+        """
+        qnty = max(qnty, 0)
+        old_qnty = self.get(card_id, print_type)
+        if qnty == old_qnty:
+            return
+        self._entries += bool(qnty) - bool(old_qnty)
+        self._total += qnty - old_qnty
+        self._print_type_totals[print_type] = self._print_type_totals.get(print_type, 0) + qnty - old_qnty
+        if not self._print_type_totals[print_type]:
+            del self._print_type_totals[print_type]
+        self._pending[(card_id, print_type)] = qnty
+        if len(self._pending) >= PENDING_MAX:
+            self.flush()
+
+    def add(self, card_id: str, print_type: str, qnty: int):
+        """
+        Description:
+            adds to the quantity of a card
+        Parameters:
+            :param card_id: the id of the card according to pokemonTcgApi
+            :param print_type: the print type of the card
+            :param qnty: the quantity to add, can be negative
+            :return: the new quantity of the card
+        """
+        qnty = max(self.get(card_id, print_type) + qnty, 0)
+        self.set(card_id, print_type, qnty)
+        return qnty
+
+    def pop(self, card_id: str, print_type: str):
+        """
+        Description:
+            removes a card from the log
+            raises KeyError if the card is not in the log
+        Parameters:
+            :param card_id: the id of the card according to pokemonTcgApi
+            :param print_type: the print type of the card
+            :return: the quantity the card had
+        """
+        qnty = self.get(card_id, print_type)
+        if not qnty:
+            raise KeyError(f"{card_id}.{print_type}")
+        self.set(card_id, print_type, 0)
+        return qnty
+
+    def get_by_id(self, card_id: str):
+        """
+        Description:
+            gets every print type of a card that is in the log
+        Parameters:
+            :param card_id: the id of the card according to pokemonTcgApi
+            :return: generator of tuple print_type and qnty
+        """
+        rows = dict(self._table_rows(card_id))
+        for (pending_card_id, print_type), qnty in self._pending.items():
+            if pending_card_id == card_id:
+                rows[print_type] = qnty
+        for print_type, qnty in rows.items():
+            if qnty:
+                yield print_type, qnty
+
+    def card_ids(self):
+        """
+        Description:
+            gets every distinct card id in the log
+        Parameters:
+            :return: generator of the card ids
+        """
+        yield from pc.unique(self.table.column("card_id")).to_pylist()
+
+    def _set_id_column(self):
+        """
+        Description:
+            gets the set id of every row of the table
+        Parameters:
+            :return: pyarrow array of set ids
+        """
+        card_ids = self.table.column("card_id")
+        return pc.if_else(
+            pc.match_substring(card_ids, "-"),
+            pc.replace_substring_regex(card_ids, pattern="-[^-]*$", replacement=""),
+            ""
+        )
+
+    def set_ids(self):
+        """
+        Description:
+            gets the ids of every set that has a card in the log
+        Parameters:
+            :return: generator of set ids
+        """
+        yield from pc.unique(self._set_id_column()).to_pylist()
+
+    def get_set_numbers(self, set_id: str):
+        """
+        Description:
+            gets the collectors numbers of every card of a set that is in the log
+        Parameters:
+            :param set_id: the id of the set according to pokemonTcgApi
+            :return: set of the card numbers
+        """
+        card_ids = self.table.column("card_id")
+        rows = card_ids.filter(pc.equal(self._set_id_column(), set_id))
+        return {split_card_id(card_id)[1] for card_id in rows.to_pylist()}
+
+    def total(self):
+        """
+        Description:
+            gets the total quantity of cards in the log
+        Parameters:
+            :return: int of the total quantity
+        """
+        return self._total
+
+    def print_type_totals(self):
+        """
+        Description:
+            gets the total quantity of cards of each print type in the log
+        Parameters:
+            :return: dictionary of print type to total quantity, print types without cards are left out
+        """
+        return dict(self._print_type_totals)
+
+    def flush(self):
+        """
+        Description:
+            folds the pending single card changes into the table
+        Parameters:
+            :return: None
+        """
+        if not self._pending:
+            return
+        pending = to_table((card_id, print_type, qnty) for (card_id, print_type), qnty in self._pending.items())
+        self._pending = {}
+        self.apply(pending, "theirs")
+
+    def apply(self, rows, strategy: str = "sum"):
+        """
+        Description:
+            applies a batch of changes to the log in vectorized steps
+            with "sum" the quantities are added (negative quantities remove cards), with "max" the larger quantity is
+            kept, and with "theirs" the quantities of the batch replace those of the log
+        Parameters:
+            :param rows: an iterable of tuple card_id, print_type and qnty, or a pyarrow table with those columns
+            :param strategy: one of MERGE_STRATEGIES
+            :return: None
+        """
+        if strategy not in MERGE_STRATEGIES:
+            raise ValueError(f"unknown strategy {strategy}")
+        self.flush()
+        changes = to_table(rows)
+        if not changes.num_rows:
+            return
+        base = self._table.cast(PLAIN_SCHEMA)
+        keys = ["card_id", "print_type"]
+        if strategy == "theirs":
+            changes = changes.group_by(keys, use_threads=False).aggregate([("qnty", "last")])
+            changes = changes.rename_columns(["card_id", "print_type", "qnty"])
+            base_keys = pc.binary_join_element_wise(base.column("card_id"), base.column("print_type"), ".")
+            change_keys = pc.binary_join_element_wise(changes.column("card_id"), changes.column("print_type"), ".")
+            base = base.filter(pc.invert(pc.is_in(base_keys, value_set=change_keys)))
+            table = pa.concat_tables([base, changes])
+        else:
+            aggregate = "sum" if strategy == "sum" else "max"
+            table = pa.concat_tables([base, changes]).group_by(keys).aggregate([("qnty", aggregate)])
+            table = table.rename_columns(["card_id", "print_type", "qnty"])
+        self._set_table(table)
+
+    @classmethod
+    def from_rows(cls, rows):
+        """
+        Description:
+            builds a card log from rows without duplicate card id and print type pairs
+        Parameters:
+            :param rows: an iterable of tuple card_id, print_type and qnty, or a pyarrow table with those columns
+            :return: a new instance of ArrowCardLog
+        """
+        return cls(to_table(rows))
+
+    @classmethod
+    def from_dict(cls, log: dict):
+        """
+        Description:
+            builds a card log from the "card_id.print_type" dictionary used by the log files
+        Parameters:
+            :param log: dictionary of "card_id.print_type" keys and quantity values
+            :return: a new instance of ArrowCardLog
+        """
+        keys = pa.array(list(log.keys()), pa.string())
+        parts = pc.split_pattern(keys, ".", max_splits=1)
+        table = pa.table(
+            [pc.list_element(parts, 0), pc.list_element(parts, 1), pa.array(list(log.values()), pa.int64())],
+            schema=PLAIN_SCHEMA
+        )
+        return cls(table)
+
+    def close(self):
+        """
+        Description:
+            releases the file the log is read from, the table is always in memory
+        Parameters:
+            :return: None
+        """
+
+    def to_dict(self):
+        """
+        Description:
+            converts the card log to the "card_id.print_type" dictionary used by the log files
+        Parameters:
+            :return: dictionary of "card_id.print_type" keys and quantity values
+        """
+        return {f"{card_id}.{print_type}": qnty for card_id, print_type, qnty in self}
+
+    def set_dicts(self):
+        """
+        Description:
+            gets every set of the log as a "number.print_type" dictionary
+        Parameters:
+            :return: dictionary of set id to dictionary of "number.print_type" keys and quantity values
+        """
+        return set_dicts(self)
+
+    def check(self):
+        """
+        Description:
+            checks that the log table is consistent
+            raises ValueError describing the first problem found
+        Parameters:
+            :return: True if the log is consistent
+        """
+        self.flush()
+        table = self._table
+        if table.schema != SCHEMA:
+            raise ValueError("log table has the wrong schema")
+        if table.num_rows and pc.min(table.column("qnty")).as_py() <= 0:
+            raise ValueError("entry without quantity")
+        card_ids = table.column("card_id")
+        if table.num_rows > 1 and not pc.all(pc.less_equal(card_ids[:-1], card_ids[1:])).as_py():
+            raise ValueError("rows are not sorted by card id")
+        counts = table.cast(PLAIN_SCHEMA).group_by(["card_id", "print_type"]).aggregate([("qnty", "count")])
+        if counts.num_rows != table.num_rows:
+            raise ValueError("duplicate card id and print type")
+        if self._entries != table.num_rows or self._total != (pc.sum(table.column("qnty")).as_py() or 0):
+            raise ValueError("running totals do not match the log")
+        totals = table.cast(PLAIN_SCHEMA).group_by("print_type").aggregate([("qnty", "sum")])
+        if dict(zip(totals.column("print_type").to_pylist(), totals.column("qnty_sum").to_pylist())) != \
+                self._print_type_totals:
+            raise ValueError("print type totals do not match the log")
+        return True
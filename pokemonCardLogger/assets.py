@@ -17,7 +17,20 @@ ENERGY_TYPES = BASIC_ENERGY
 ENERGY_TYPES["dn"] = "Dragon"
 ENERGY_TYPES["cs"] = "Colorless"
 ENERGY_PRINT_TYPES = ("normal", "reverseHolofoil")
+PRINT_TYPES = (
+    "normal",
+    "holofoil",
+    "reverseHolofoil",
+    "1stEditionNormal",
+    "1stEditionHolofoil",
+    "unlimited",
+    "1stEdition",
+    "unlimitedHolofoil"
+)
+PRICE_CATEGORIES = ("low", "mid", "high", "market", "directLow")
 ITERATIONS = 1000000
+LOGIN_HISTORY_MAX = 10000
+LOGIN_SEGMENTS_MAX = 64
 LRU_CACHE_EXPO = 18
 
 pltfrm = sys.platform
@@ -0,0 +1,586 @@
+"""
+Description:
+    The in memory representation of the regular card log
+    Cards are grouped by set, card numbers and print types are stored as small int codes, and every entry is a packed
+    key and a quantity in typed arrays, so the log holds no per entry python objects
+    Running totals are kept up to date on every change, so sizes are read in constant time
+    Each set can be packed into page bytes, which the log file formats store as is
+    The old "card_id.print_type" dictionary is only used when reading or writing old log files
+Usage:
+    from cardlog import CardLog
+"""
+import sys
+import struct
+from array import array
+from bisect import bisect_left
+from assets import PRINT_TYPES
+
+PRINT_TYPE_BITS = 8
+PAGE_HEADER = struct.Struct("<II")
+
+
+def _to_little_endian(values: array):
+    """
+    Description:
+        makes a typed array little endian, so page files can be moved between machines
+    Parameters:
+        :param values: the array to convert in place
+        :return: the array
+    """
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values
+
+
+def split_card_id(card_id: str):
+    """
+    Description:
+        splits a card id into the id of its set and its collectors number
+    Parameters:
+        :param card_id: the id of the card according to pokemonTcgApi
+        :return: tuple of the set id and the card number
+    """
+    set_id, _, number = card_id.rpartition("-")
+    return set_id, number
+
+
+def join_card_id(set_id: str, number: str):
+    """
+    Description:
+        builds a card id from the id of its set and its collectors number
+    Parameters:
+        :param set_id: the id of the set according to pokemonTcgApi
+        :param number: the collectors number of the card
+        :return: the id of the card according to pokemonTcgApi
+    """
+    return f"{set_id}-{number}" if set_id else number
+
+
+def set_dicts(rows):
+    """
+    Description:
+        groups rows of a log by set into "number.print_type" dictionaries, which can be compared a set at a time
+    Parameters:
+        :param rows: an iterable of tuple card_id, print_type and qnty
+        :return: dictionary of set id to dictionary of "number.print_type" keys and quantity values
+    """
+    sets = {}
+    for card_id, print_type, qnty in rows:
+        set_id, number = split_card_id(card_id)
+        sets.setdefault(set_id, {})[f"{number}.{print_type}"] = qnty
+    return sets
+
+
+class _SetBlock:
+    """
+    Description:
+        the entries of one set, sorted by their packed card number and print type key
+    """
+    __slots__ = ("keys", "qnty")
+
+    def __init__(self):
+        self.keys = array("Q")
+        self.qnty = array("q")
+
+
+class CardLog:
+    """
+    Description:
+        a compact log of card quantities keyed by card id and print type
+    """
+    __slots__ = (
+        "_print_types", "_print_type_codes", "_numbers", "_number_codes", "_sets", "_entries", "_total",
+        "_print_type_totals"
+    )
+
+    def __init__(self):
+        """
+        Description:
+            Constructor method
+        """
+        self._print_types = list(PRINT_TYPES)
+        self._print_type_codes = {print_type: code for code, print_type in enumerate(self._print_types)}
+        self._numbers = []
+        self._number_codes = {}
+        self._sets = {}
+        self._entries = 0
+        self._total = 0
+        self._print_type_totals = array("q", bytes(8 * len(self._print_types)))
+
+    def __len__(self):
+        return self._entries
+
+    def __iter__(self):
+        numbers = self._numbers
+        print_types = self._print_types
+        mask = (1 << PRINT_TYPE_BITS) - 1
+        for set_id, block in self._sets.items():
+            prefix = join_card_id(set_id, "")
+            for key, qnty in zip(block.keys, block.qnty):
+                yield prefix + numbers[key >> PRINT_TYPE_BITS], print_types[key & mask], qnty
+
+    def __repr__(self):
+        return f"CardLog({len(self)} entries)"
+
+    @staticmethod
+    def _intern(value: str, values: list, codes: dict):
+        """
+        Description:
+            gets the code of a value in a code table, adding the value to the table if it is new
+        Parameters:
+            :param value: the string to get the code of
+            :param values: the list of strings of the table
+            :param codes: the dictionary of strings to codes of the table
+            :return: int code of the value
+        """
+        code = codes.get(value)
+        if code is None:
+            code = len(values)
+            value = sys.intern(value)
+            values.append(value)
+            codes[value] = code
+        return code
+
+    def _print_type_code(self, print_type: str):
+        """
+        Description:
+            gets the code of a print type, adding it and its running total if it is new
+            raises ValueError if the log already has as many print types as fit in PRINT_TYPE_BITS
+        Parameters:
+            :param print_type: the print type of the card
+            :return: int code of the print type
+        """
+        if print_type not in self._print_type_codes and len(self._print_types) >= 1 << PRINT_TYPE_BITS:
+            raise ValueError(f"the log can not hold more than {1 << PRINT_TYPE_BITS} print types")
+        code = self._intern(print_type, self._print_types, self._print_type_codes)
+        if code == len(self._print_type_totals):
+            self._print_type_totals.append(0)
+        return code
+
+    def _find(self, card_id: str, print_type: str):
+        """
+        Description:
+            finds where an entry is or would be in the log, without adding anything
+        Parameters:
+            :param card_id: the id of the card according to pokemonTcgApi
+            :param print_type: the print type of the card
+            :return: tuple of the set block, the packed key and the index of the key, the block is None if the entry
+            cannot be in the log
+        """
+        set_id, number = split_card_id(card_id)
+        block = self._sets.get(set_id)
+        number_code = self._number_codes.get(number)
+        print_type_code = self._print_type_codes.get(print_type)
+        if block is None or number_code is None or print_type_code is None:
+            return None, 0, 0
+        key = (number_code << PRINT_TYPE_BITS) | print_type_code
+        return block, key, bisect_left(block.keys, key)
+
+    def get(self, card_id: str, print_type: str):
+        """
+        Description:
+            gets the quantity of a card
+        Parameters:
+            :param card_id: the id of the card according to pokemonTcgApi
+            :param print_type: the print type of the card
+            :return: the quantity of the card, 0 if it is not in the log
+        """
+        block, key, index = self._find(card_id, print_type)
+        if block is None or index == len(block.keys) or block.keys[index] != key:
+            return 0
+        return block.qnty[index]
+
+    def set(self, card_id: str, print_type: str, qnty: int):
+        """
+        Description:
+            sets the quantity of a card, removing it from the log if the quantity is not above 0
+        Parameters:
+            :param card_id: the id of the card according to pokemonTcgApi
+            :param print_type: the print type of the card
+            :param qnty: the new quantity of the card
+            :return: None
+        """
+        if qnty <= 0:
+            if self.get(card_id, print_type):
+                self.pop(card_id, print_type)
+            return
+        set_id, number = split_card_id(card_id)
+        block = self._sets.get(set_id)
+        if block is None:
+            block = self._sets[sys.intern(set_id)] = _SetBlock()
+        number_code = self._intern(number, self._numbers, self._number_codes)
+        print_type_code = self._print_type_code(print_type)
+        key = (number_code << PRINT_TYPE_BITS) | print_type_code
+        index = bisect_left(block.keys, key)
+        if index < len(block.keys) and block.keys[index] == key:
+            change = qnty - block.qnty[index]
+            block.qnty[index] = qnty
+        else:
+            change = qnty
+            block.keys.insert(index, key)
+            block.qnty.insert(index, qnty)
+            self._entries += 1
+        self._total += change
+        self._print_type_totals[print_type_code] += change
+
+    def add(self, card_id: str, print_type: str, qnty: int):
+        """
+        Description:
+            adds to the quantity of a card
+        Parameters:
+            :param card_id: the id of the card according to pokemonTcgApi
+            :param print_type: the print type of the card
+            :param qnty: the quantity to add, can be negative
+            :return: the new quantity of the card
+        """
+        qnty = max(self.get(card_id, print_type) + qnty, 0)
+        self.set(card_id, print_type, qnty)
+        return qnty
+
+    def pop(self, card_id: str, print_type: str):
+        """
+        Description:
+            removes a card from the log
+            raises KeyError if the card is not in the log
+        Parameters:
+            :param card_id: the id of the card according to pokemonTcgApi
+            :param print_type: the print type of the card
+            :return: the quantity the card had
+        """
+        block, key, index = self._find(card_id, print_type)
+        if block is None or index == len(block.keys) or block.keys[index] != key:
+            raise KeyError(f"{card_id}.{print_type}")
+        qnty = block.qnty[index]
+        del block.keys[index]
+        del block.qnty[index]
+        self._entries -= 1
+        self._total -= qnty
+        self._print_type_totals[key & ((1 << PRINT_TYPE_BITS) - 1)] -= qnty
+        if not block.keys:
+            del self._sets[split_card_id(card_id)[0]]
+        return qnty
+
+    def get_by_id(self, card_id: str):
+        """
+        Description:
+            gets every print type of a card that is in the log
+        Parameters:
+            :param card_id: the id of the card according to pokemonTcgApi
+            :return: generator of tuple print_type and qnty
+        """
+        set_id, number = split_card_id(card_id)
+        block = self._sets.get(set_id)
+        number_code = self._number_codes.get(number)
+        if block is None or number_code is None:
+            return
+        mask = (1 << PRINT_TYPE_BITS) - 1
+        index = bisect_left(block.keys, number_code << PRINT_TYPE_BITS)
+        while index < len(block.keys) and block.keys[index] >> PRINT_TYPE_BITS == number_code:
+            yield self._print_types[block.keys[index] & mask], block.qnty[index]
+            index += 1
+
+    def card_ids(self):
+        """
+        Description:
+            gets every distinct card id in the log
+        Parameters:
+            :return: generator of the card ids
+        """
+        numbers = self._numbers
+        for set_id, block in self._sets.items():
+            prefix = join_card_id(set_id, "")
+            last_code = None
+            for key in block.keys:
+                number_code = key >> PRINT_TYPE_BITS
+                if number_code != last_code:
+                    last_code = number_code
+                    yield prefix + numbers[number_code]
+
+    def set_ids(self):
+        """
+        Description:
+            gets the ids of every set that has a card in the log
+        Parameters:
+            :return: generator of set ids
+        """
+        yield from self._sets.keys()
+
+    def get_set_numbers(self, set_id: str):
+        """
+        Description:
+            gets the collectors numbers of every card of a set that is in the log
+        Parameters:
+            :param set_id: the id of the set according to pokemonTcgApi
+            :return: set of the card numbers
+        """
+        block = self._sets.get(set_id)
+        if block is None:
+            return set()
+        return {self._numbers[key >> PRINT_TYPE_BITS] for key in block.keys}
+
+    def total(self):
+        """
+        Description:
+            gets the total quantity of cards in the log
+        Parameters:
+            :return: int of the total quantity
+        """
+        return self._total
+
+    def print_type_totals(self):
+        """
+        Description:
+            gets the total quantity of cards of each print type in the log
+        Parameters:
+            :return: dictionary of print type to total quantity, print types without cards are left out
+        """
+        return {
+            print_type: qnty for print_type, qnty in zip(self._print_types, self._print_type_totals) if qnty
+        }
+
+    def _encode_page(self, block: _SetBlock):
+        """
+        Description:
+            packs the entries of a set into page bytes
+            card numbers are stored as strings with page local codes, print types use the codes of the log
+        Parameters:
+            :param block: the entries of the set
+            :return: bytes of the page
+        """
+        mask = (1 << PRINT_TYPE_BITS) - 1
+        local_codes = {}
+        numbers = []
+        keys = array("Q")
+        for key in block.keys:
+            number_code = key >> PRINT_TYPE_BITS
+            local_code = local_codes.get(number_code)
+            if local_code is None:
+                local_code = local_codes[number_code] = len(numbers)
+                numbers.append(self._numbers[number_code])
+            keys.append((local_code << PRINT_TYPE_BITS) | (key & mask))
+        numbers = "\n".join(numbers).encode("utf-8")
+        return b"".join((
+            PAGE_HEADER.pack(len(keys), len(numbers)),
+            numbers,
+            _to_little_endian(keys).tobytes(),
+            _to_little_endian(array("q", block.qnty)).tobytes()
+        ))
+
+    def _decode_page(self, page: bytes):
+        """
+        Description:
+            unpacks page bytes into a set block, adding its card numbers to the number table of the log
+            raises ValueError if the page is malformed
+        Parameters:
+            :param page: bytes of the page
+            :return: the set block of the page
+        """
+        mask = (1 << PRINT_TYPE_BITS) - 1
+        entries, numbers_length = PAGE_HEADER.unpack_from(page)
+        start = PAGE_HEADER.size
+        numbers = page[start:start + numbers_length].decode("utf-8").split("\n")
+        start += numbers_length
+        keys = array("Q")
+        keys.frombytes(page[start:start + 8 * entries])
+        qnty = array("q")
+        qnty.frombytes(page[start + 8 * entries:start + 16 * entries])
+        _to_little_endian(keys)
+        _to_little_endian(qnty)
+        if len(keys) != entries or len(qnty) != entries:
+            raise ValueError("malformed page")
+        if entries and (max(keys) >> PRINT_TYPE_BITS >= len(numbers) or min(qnty) <= 0):
+            raise ValueError("malformed page")
+        if entries and max(key & mask for key in keys) >= len(self._print_types):
+            raise ValueError("page uses an unknown print type")
+        codes = [self._intern(number, self._numbers, self._number_codes) for number in numbers]
+        rows = sorted(
+            ((codes[key >> PRINT_TYPE_BITS] << PRINT_TYPE_BITS) | (key & mask), count) for key, count in zip(keys, qnty)
+        )
+        block = _SetBlock()
+        block.keys.extend(key for key, _ in rows)
+        block.qnty.extend(count for _, count in rows)
+        return block
+
+    def close(self):
+        """
+        Description:
+            releases the file the log is read from, the in memory log has none
+        Parameters:
+            :return: None
+        """
+
+    def pages(self):
+        """
+        Description:
+            packs every set of the log into page bytes
+        Parameters:
+            :return: generator of tuple set id and page bytes
+        """
+        for set_id, block in self._sets.items():
+            yield set_id, self._encode_page(block)
+
+    def set_dicts(self):
+        """
+        Description:
+            gets every set of the log as a "number.print_type" dictionary, the names of the packed keys are built once
+            and shared by every set
+        Parameters:
+            :return: dictionary of set id to dictionary of "number.print_type" keys and quantity values
+        """
+        numbers = self._numbers
+        print_types = self._print_types
+        mask = (1 << PRINT_TYPE_BITS) - 1
+        names = {}
+        sets = {}
+        for set_id, block in self._sets.items():
+            for key in set(block.keys).difference(names):
+                names[key] = f"{numbers[key >> PRINT_TYPE_BITS]}.{print_types[key & mask]}"
+            sets[set_id] = dict(zip(map(names.__getitem__, block.keys), block.qnty))
+        return sets
+
+    def print_types(self):
+        """
+        Description:
+            gets the print type table of the log, the print type codes of pages are indexes into it
+        Parameters:
+            :return: list of print types
+        """
+        return list(self._print_types)
+
+    @classmethod
+    def from_pages(cls, print_types: list, pages):
+        """
+        Description:
+            builds a card log from page bytes
+            raises ValueError if a page is malformed or a set is given twice
+        Parameters:
+            :param print_types: the print type table the pages were packed with
+            :param pages: an iterable of tuple set id and page bytes
+            :return: a new instance of the class
+        """
+        if len(print_types) > 1 << PRINT_TYPE_BITS:
+            raise ValueError("more print types than fit in a key")
+        card_log = cls()
+        card_log._print_types = list(print_types)
+        card_log._print_type_codes = {print_type: code for code, print_type in enumerate(card_log._print_types)}
+        card_log._print_type_totals = array("q", bytes(8 * len(card_log._print_types)))
+        mask = (1 << PRINT_TYPE_BITS) - 1
+        for set_id, page in pages:
+            if set_id in card_log._sets:
+                raise ValueError(f"set {set_id} is given twice")
+            block = card_log._decode_page(page)
+            if not block.keys:
+                continue
+            card_log._sets[sys.intern(set_id)] = block
+            card_log._entries += len(block.keys)
+            for key, qnty in zip(block.keys, block.qnty):
+                card_log._print_type_totals[key & mask] += qnty
+        card_log._total = sum(card_log._print_type_totals)
+        return card_log
+
+    @classmethod
+    def from_rows(cls, rows):
+        """
+        Description:
+            builds a card log from rows, later rows replace earlier rows of the same card and print type
+        Parameters:
+            :param rows: an iterable of tuple card_id, print_type and qnty
+            :return: a new instance of the class
+        """
+        card_log = cls()
+        sets = {}
+        for card_id, print_type, qnty in rows:
+            if qnty <= 0:
+                continue
+            set_id, number = split_card_id(card_id)
+            number_code = card_log._intern(number, card_log._numbers, card_log._number_codes)
+            print_type_code = card_log._print_type_code(print_type)
+            set_rows = sets.setdefault(set_id, {})
+            key = (number_code << PRINT_TYPE_BITS) | print_type_code
+            card_log._print_type_totals[print_type_code] += qnty - set_rows.get(key, 0)
+            set_rows[key] = qnty
+        for set_id, set_rows in sets.items():
+            block = card_log._sets[sys.intern(set_id)] = _SetBlock()
+            keys = sorted(set_rows)
+            block.keys.extend(keys)
+            block.qnty.extend(set_rows[key] for key in keys)
+            card_log._entries += len(keys)
+        card_log._total = sum(card_log._print_type_totals)
+        return card_log
+
+    @classmethod
+    def from_dict(cls, log: dict):
+        """
+        Description:
+            builds a card log from the "card_id.print_type" dictionary used by the log files
+        Parameters:
+            :param log: dictionary of "card_id.print_type" keys and quantity values
+            :return: a new instance of the class
+        """
+        return cls.from_rows((*key.split("."), qnty) for key, qnty in log.items())
+
+    def to_dict(self):
+        """
+        Description:
+            converts the card log to the "card_id.print_type" dictionary used by the log files
+        Parameters:
+            :return: dictionary of "card_id.print_type" keys and quantity values
+        """
+        return {f"{card_id}.{print_type}": qnty for card_id, print_type, qnty in self}
+
+    def _check_block(self, set_id: str, block: _SetBlock, print_type_totals: array):
+        """
+        Description:
+            checks that the entries of one set are consistent, and adds them to the print type totals
+            raises ValueError describing the first problem found
+        Parameters:
+            :param set_id: the id of the set according to pokemonTcgApi
+            :param block: the entries of the set
+            :param print_type_totals: the print type totals to add the entries to
+            :return: the number of entries of the set
+        """
+        mask = (1 << PRINT_TYPE_BITS) - 1
+        if not block.keys:
+            raise ValueError(f"empty block for set {set_id}")
+        if len(block.keys) != len(block.qnty):
+            raise ValueError(f"key and quantity columns differ in length for set {set_id}")
+        if any(a >= b for a, b in zip(block.keys, block.keys[1:])):
+            raise ValueError(f"keys are not sorted and unique for set {set_id}")
+        if min(block.qnty) <= 0:
+            raise ValueError(f"entry without quantity for set {set_id}")
+        for key, qnty in zip(block.keys, block.qnty):
+            if key >> PRINT_TYPE_BITS >= len(self._numbers) or key & mask >= len(self._print_types):
+                raise ValueError(f"unknown card number or print type code for set {set_id}")
+            print_type_totals[key & mask] += qnty
+        return len(block.keys)
+
+    def _check_blocks(self, print_type_totals: array):
+        """
+        Description:
+            checks every set of the log
+        Parameters:
+            :param print_type_totals: the print type totals to add the entries to
+            :return: the number of entries of the log
+        """
+        return sum(self._check_block(set_id, block, print_type_totals) for set_id, block in self._sets.items())
+
+    def check(self):
+        """
+        Description:
+            checks that the log structure is consistent, meant for tests and for verifying a freshly read log
+            raises ValueError describing the first problem found
+        Parameters:
+            :return: True if the log is consistent
+        """
+        if len(self._print_types) > 1 << PRINT_TYPE_BITS:
+            raise ValueError("more print types than fit in a key")
+        for values, codes in ((self._numbers, self._number_codes), (self._print_types, self._print_type_codes)):
+            if len(values) != len(codes) or any(codes.get(value) != code for code, value in enumerate(values)):
+                raise ValueError("code table does not match its lookup dictionary")
+        print_type_totals = array("q", bytes(8 * len(self._print_types)))
+        entries = self._check_blocks(print_type_totals)
+        if print_type_totals != self._print_type_totals:
+            raise ValueError("print type totals do not match the log")
+        if self._entries != entries or self._total != sum(print_type_totals):
+            raise ValueError("running totals do not match the log")
+        return True
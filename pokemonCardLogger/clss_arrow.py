@@ -0,0 +1,180 @@
+"""
+Description:
+    The alternate library version of Pokémon Card Logger using Arrow tables and encrypted Parquet files
+    The log is a columnar table, so batches of changes, merges and totals are computed in vectorized steps
+    Single card lookups search the table one value at a time and are more than ten times slower than those of the
+    other backends, see benchmark()
+    requires pyarrow ("pip3 install pokemonCardLogger[arrow]")
+Usage:
+    from pokemonCardLogger import clss_arrow as pca
+"""
+import io
+import sys
+import json
+import time
+import random
+import pyarrow as pa
+import pyarrow.parquet as pq
+from clss_base import *
+from arrowlog import ArrowCardLog, to_table
+from delayedKeyInt import DelayedKeyboardInterrupt
+
+METADATA_KEY = b"pokemonCardLogger"
+
+
+class DbHandle(DbHandleBase):
+    """
+    Description:
+        stores and organizes the log data in an encrypted Parquet file
+    """
+    LOG_CLASS = ArrowCardLog
+
+    def save(self):
+        """
+        Description:
+            saves the log to a file, the rest of the log dictionary is kept in the Parquet metadata
+        Parameters:
+            :return: None
+        """
+        with DelayedKeyboardInterrupt():
+            if self.logfile == ":memory:":
+                return None
+            logdict = dict(self.logdict)
+            table = logdict.pop("log").table
+            table = table.replace_schema_metadata({METADATA_KEY: json.dumps(logdict).encode("utf-8")})
+            buffer = io.BytesIO()
+            pq.write_table(table, buffer, compression="zstd")
+            temp_file = f"{self.logfile}.tmp"
+            with open(temp_file, "wb") as f:
+                f.write(Fernet(self.key).encrypt(buffer.getvalue()))
+            os.replace(temp_file, self.logfile)
+
+    def read(self):
+        """
+        Description:
+            reads the data from the encrypted Parquet file and returns the log dictionary
+        Parameters:
+            :return: dictionary consisting of the log data
+        """
+        with DelayedKeyboardInterrupt():
+            with open(self.logfile, "rb") as f:
+                contents = Fernet(self.key).decrypt(f.read())
+            table = pq.read_table(pa.BufferReader(contents))
+            del contents
+            ld = json.loads(table.schema.metadata[METADATA_KEY])
+            ld["log"] = ArrowCardLog(table.replace_schema_metadata(None))
+            return ld
+
+    def _set_cards(self, rows):
+        """
+        Description:
+            sets the quantities of many cards in one vectorized step, each change is noted in the journal first
+        Parameters:
+            :param rows: an iterable of tuple card_id, print_type and qnty
+            :return: None
+        """
+        self.logdict["log"].apply(self._note_set_cards(rows), "theirs")
+
+    def _add_quantities(self, totals: dict):
+        """
+        Description:
+            adds to the quantities of many cards in one vectorized step, cards that reach 0 are removed, each change
+            is noted in the journal first
+        Parameters:
+            :param totals: dictionary of tuple card_id and print_type to the change in quantity
+            :return: None
+        """
+        self._note_add_quantities(totals)
+        self.logdict["log"].apply(to_table(
+            (card_id, print_type, change) for (card_id, print_type), change in totals.items()
+        ), "sum")
+
+
+def benchmark(sizes: tuple = (100000, 1000000), folder: str = None):
+    """
+    Description:
+        times the Arrow backend against the pickle backend on generated logs, and prints the results
+        the requests of the card data and the card lists of sets are stubbed, so every generated card is valid and
+        no time is spent online
+        raises ValueError if a backend rejected a card of the batch, as the timing would not have added it
+    Parameters:
+        :param sizes: the numbers of log entries to time
+        :param folder: the folder for the temporary log files, defaults to prog_data
+        :return: dictionary of size to dictionary of timing name to tuple of the pickle and Arrow times in seconds
+    """
+    import clss_pickle
+    folder = folder or prog_data
+    rq = RqHandle(API_KEY)
+    rq.get_card = lambda card_id, *args, **kwargs: {}
+    rq.get_set_cards = lambda set_id: tuple(str(number) for number in range(1, 126))
+    results = {}
+    for size in sizes:
+        log = {
+            f"bm{index // 250}-{index % 250 // 2 + 1}.{('normal', 'holofoil')[index % 2]}": random.randint(1, 9)
+            for index in range(size)
+        }
+        batch = [(f"bm{random.randrange(size // 250)}-{random.randint(1, 125)}", "normal", 1) for _ in range(10000)]
+        timings = {}
+        handles = []
+        for name, module in (("pickle", clss_pickle), ("arrow", sys.modules[__name__])):
+            file = os.path.join(folder, f"benchmark-{size}.{name}")
+            for extra_file in (file, f"{file}.logins"):
+                if os.path.exists(extra_file):
+                    os.remove(extra_file)
+            db = module.DbHandle(file, "benchmark", rq)
+            db.logdict["log"] = CardLog.from_dict(log) if name == "pickle" else ArrowCardLog.from_dict(log)
+            db._load_totals()
+            start = time.perf_counter()
+            db.save()
+            timings.setdefault("save", []).append(time.perf_counter() - start)
+            start = time.perf_counter()
+            db.logdict = db.read()
+            timings.setdefault("read", []).append(time.perf_counter() - start)
+            start = time.perf_counter()
+            with db.batch():
+                if name == "arrow":
+                    added = db.add_cards(batch)
+                else:
+                    added = [db.add_card(card_id, qnty, print_type) for card_id, print_type, qnty in batch]
+            timings.setdefault("add 10k cards", []).append(time.perf_counter() - start)
+            if not all(added):
+                raise ValueError(f"the {name} backend rejected {added.count(False)} cards of the batch")
+            start = time.perf_counter()
+            _ = db.reg_log_size
+            timings.setdefault("log size", []).append(time.perf_counter() - start)
+            start = time.perf_counter()
+            for card_id, print_type, _ in batch[:1000]:
+                db.get_card_qnty(card_id, print_type)
+            timings.setdefault("1k lookups", []).append(time.perf_counter() - start)
+            timings.setdefault("file size", []).append(os.path.getsize(file))
+            handles.append((db, file))
+        for db, file in handles:
+            for extra_file in (file, f"{file}.logins"):
+                if os.path.exists(extra_file):
+                    os.remove(extra_file)
+        results[size] = {name: tuple(timing) for name, timing in timings.items()}
+        print(f"{size} entries:")
+        for name, (pickle_timing, arrow_timing) in results[size].items():
+            if name == "file size":
+                print(f"\t{name}: pickle {pickle_timing} bytes arrow {arrow_timing} bytes")
+            else:
+                print(f"\t{name}: pickle {pickle_timing:.4f}s arrow {arrow_timing:.4f}s")
+    return results
+
+
+if __name__ == "__main__":
+    if "benchmark" in sys.argv:
+        init(API_KEY, iterations=1000)
+        benchmark()
+        quit()
+    print("this is for testing purposes")
+    try:
+        import config
+    except ImportError:
+        print("no api key found quitting.")
+        quit()
+    _file = ":memory:"
+    _psswrd = "default"
+    _rq = RqHandle(config.API_KEY)
+    db = DbHandle(_file, _psswrd, _rq)
+    print(db.__repr__())
@@ -9,17 +9,41 @@ from cryptography.hazmat.primitives import hashes
 from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
 import base64
 import hashlib
+import re
 import sys
 from assets import *
 import cliTextTools as ctt
 import functools
+import itertools
+import heapq
+import operator
+import collections
 import time
 import backup
+import logformat
+from concurrent.futures import ThreadPoolExecutor
+from cardlog import CardLog, split_card_id, join_card_id, set_dicts
+from logins import LoginLog
+from loglock import LogLock
 
 TRADE_SUCCESS = 0
 TRADE_CODE_CARD_NOT_IN_LOG = 1
 TRADE_CODE_CARD_DOES_NOT_EXIST = 2
 TRADE_CODE_CARD_NOT_IN_LOG_QNTY = 3
+TRADE_CODE_INVALID_TRADE = 4
+VALIDATE_WORKERS = 8
+CSV_PROGRESS_ROWS = 10000
+PRICE_WORKERS = 8
+PRICE_WINDOW = 64
+PRICE_CHUNK = 16
+PROGRESS_BAR_WIDTH = 40
+BACKEND_SUFFIXES = {
+    "clss_pickle": ".pcllog",
+    "clss_sqlite": ".pcldb",
+    "clss_paged": ".pclpage",
+    "clss_sharded": ".pclshards",
+    "clss_arrow": ".pclarrow"
+}
 
 API_KEY = ""
 
@@ -60,6 +84,100 @@ else:
     quit(1)
 
 
+def derive_key(psswrd: str):
+    """
+    Description:
+        derives the encryption key of a log from its password
+    Parameters:
+        :param psswrd: the password of the log
+        :return: bytes of the Fernet key
+    """
+    kdf = PBKDF2HMAC(
+        algorithm=hashes.SHA256(),
+        length=32,
+        salt="a".encode("utf-8"),
+        iterations=ITERATIONS,
+        backend=default_backend()
+    )
+    return base64.urlsafe_b64encode(kdf.derive(psswrd.encode("utf-8")))
+
+
+def prefetch_map(func, items, workers: int = PRICE_WORKERS, window: int = PRICE_WINDOW, chunk: int = 1):
+    """
+    Description:
+        maps a function over items with a pool of threads, running at most window calls ahead of the consumer, and
+        yields the results in the order of the items
+    Parameters:
+        :param func: the function to call with each item
+        :param items: an iterable of items
+        :param workers: the number of threads
+        :param window: the largest number of tasks that are running or waiting to be consumed
+        :param chunk: the number of items each task calls the function on, more than 1 cuts the cost of the pool when
+        most calls are answered from a cache
+        :return: generator of the results
+    """
+    executor = ThreadPoolExecutor(workers)
+    pending = collections.deque()
+
+    def call_chunk(chunk_items: list):
+        return [func(item) for item in chunk_items]
+
+    try:
+        items = iter(items)
+        while chunk_items := list(itertools.islice(items, chunk)):
+            pending.append(executor.submit(call_chunk, chunk_items))
+            if len(pending) >= window:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def print_progress(done: int, total: int):
+    """
+    Description:
+        draws a progress bar on the current console line
+    Parameters:
+        :param done: the number of items that are done
+        :param total: the number of items
+        :return: None
+    """
+    filled = PROGRESS_BAR_WIDTH * done // total if total else PROGRESS_BAR_WIDTH
+    bar = "#" * filled + "-" * (PROGRESS_BAR_WIDTH - filled)
+    end = "\n" if done >= total else ""
+    print(f"\r[{bar}] {done}/{total}", end=end, flush=True)
+
+
+def check_print_type(print_type: str, energy: bool = False):
+    """
+    Description:
+        checks a print type that was read from a file
+        raises ValueError with the reason if it is not one of PRINT_TYPES, or ENERGY_PRINT_TYPES for an energy card
+    Parameters:
+        :param print_type: the print type as it was read
+        :param energy: if True the print type is of an energy card
+        :return: string of the print type without surrounding whitespace
+    """
+    if not isinstance(print_type, str) or not print_type.strip():
+        raise ValueError("the print type is empty or not text")
+    print_type = print_type.strip()
+    if print_type not in (ENERGY_PRINT_TYPES if energy else PRINT_TYPES):
+        raise ValueError(f"{print_type} is not a print type")
+    return print_type
+
+
+def card_number_sort_key(number: str):
+    """
+    Description:
+        a sort key that orders card numbers the way they are printed, so "2" comes before "10"
+    Parameters:
+        :param number: the collectors number of a card
+        :return: a tuple to sort by
+    """
+    return tuple(int(part) if index % 2 else part for index, part in enumerate(re.split(r"(\d+)", number)))
+
+
 class RqHandle:
     """
     Description:
@@ -77,6 +195,7 @@ class RqHandle:
         """
         self.api_key = api_key
         self.headers = {"X-Api-Key": self.api_key}
+        self._card_generations = {}
 
     def wait_for_con(self):
         while True:
@@ -88,17 +207,43 @@ class RqHandle:
                 continue
             break
 
-    @functools.lru_cache(2 ** LRU_CACHE_EXPO)
-    def get_card(self, card_id: str, select: (bool, iter) = None):    # sourcery skip: raise-from-previous-error
+    def get_card(self, card_id: str, select: (bool, iter) = None):
         """
         Description:
             Requests from pokemonTcgApi the data for a specific card and returns that data as a dictionary
             If the data is bad raises ValueError
+            the data is cached until forget_cards is called with the card
         Parameters:
             :param select: an iterable or bool of True, setting if a query is to be used and what query, default of none and if bool True using name, set, and tcgplayer
             :param card_id: a string that represents the card according to pokemonTcgApi
             :return: dict of the data from pokemonTcgApi
         """
+        return self._get_card(card_id, select, self._card_generations.get(card_id, 0))
+
+    def forget_cards(self, card_ids):
+        """
+        Description:
+            makes the next get_card of each card request it again, the cached data of other cards is kept
+        Parameters:
+            :param card_ids: an iterable of card ids according to pokemonTcgApi
+            :return: None
+        """
+        for card_id in card_ids:
+            self._card_generations[card_id] = self._card_generations.get(card_id, 0) + 1
+
+    @functools.lru_cache(2 ** LRU_CACHE_EXPO)
+    def _get_card(self, card_id: str, select: (bool, iter), generation: int):  # sourcery skip: raise-from-previous-error
+        """
+        Description:
+            Requests from pokemonTcgApi the data for a specific card, cached by the card, the query and the number of
+            times the card was forgotten
+            If the data is bad raises ConnectionError
+        Parameters:
+            :param card_id: a string that represents the card according to pokemonTcgApi
+            :param select: the query of get_card
+            :param generation: the number of times forget_cards was called with the card
+            :return: dict of the data from pokemonTcgApi
+        """
         query = ""
         if select is None:
             query = ""
@@ -150,14 +295,40 @@ class RqHandle:
         else:
             raise ConnectionError
 
+    @functools.lru_cache(2 ** LRU_CACHE_EXPO)
+    def get_set_cards(self, set_id: str):  # sourcery skip: raise-from-previous-error
+        """
+        Description:
+            Requests from pokemonTcgApi the collectors numbers of every card in a set
+            If the data is bad raises ConnectionError
+        Parameters:
+            :param set_id: a string that represents the set according to pokemonTcgApi
+            :return: tuple of the card numbers of the set
+        """
+        numbers = []
+        page = 1
+        while True:
+            params = {"q": f"set.id:{set_id}", "select": "id,number", "page": page, "pageSize": 250}
+            try:
+                data = requests.get(self.card_url, params=params, headers=self.headers)
+            except requests.exceptions.ConnectionError:
+                raise ConnectionError
+            if not data.ok:
+                raise ConnectionError
+            data = data.json()
+            numbers.extend(card["number"] for card in data["data"])
+            if not data["data"] or len(numbers) >= data["totalCount"]:
+                break
+            page += 1
+        return tuple(sorted(numbers, key=card_number_sort_key))
+
     @functools.lru_cache(1)
-    def get_all_sets(self):  # sourcery skip: raise-from-previous-error
+    def _get_all_sets(self):  # sourcery skip: raise-from-previous-error
         """
         Description:
-            Requests a list of packs from pokemonTcgApi and returns a generator
-            The generator yields a tuple with the id of the pack and the packs name
+            Requests a list of packs from pokemonTcgApi
         Parameters:
-            :return: generator consisting of a tuple of pack id and pack name
+            :return: tuple of tuples of pack id and pack name
         """
         try:
             data = requests.get(self.pack_url, headers=self.headers)
@@ -165,8 +336,17 @@ class RqHandle:
             raise ConnectionError
         if not data.ok:
             raise ConnectionError
-        for i in data.json()["data"]:
-            yield i["id"], i["name"]
+        return tuple((i["id"], i["name"]) for i in data.json()["data"])
+
+    def get_all_sets(self):
+        """
+        Description:
+            Requests a list of packs from pokemonTcgApi and returns a generator
+            The generator yields a tuple with the id of the pack and the packs name
+        Parameters:
+            :return: generator consisting of a tuple of pack id and pack name
+        """
+        yield from self._get_all_sets()
 
     def __repr__(self):
         return f"RqHandle({self.api_key}"
@@ -212,43 +392,97 @@ class DbHandleBase:
     Description:
         stores and organizes the log data in a pickle file
     """
+    LOG_CLASS = CardLog
 
-    def __init__(self, file: str, psswrd: str, rq: RqHandle, use_backup: bool = False):
+    def __init__(
+            self, file: str, psswrd: str, rq: RqHandle, use_backup: bool = False, read_only: bool = False,
+            key: bytes = None
+    ):
         """
         Description:
             Constructor method
+            raises FileNotFoundError if the log is opened read only and does not exist
         Parameters
             :param file: the path to the database file
             :param psswrd: the password for the database
             :param rq: an instance of RqHandle
+            :param read_only: opens the log without recording a login or ever saving it, for reading the log of
+            another user
+            :param key: the key derived from the password by derive_key, None to derive it here
         """
         self.use_backup = use_backup
+        self.read_only = read_only
         if self.use_backup:
             backup.init()
+        self._batch_depth = 0
+        self._batch_dirty = False
         self.logfile = file
         _, lf = os.path.split(self.logfile)
-        self.user, _ = lf.split(".")
+        self.user, _ = os.path.splitext(lf)
         self.psswrd = psswrd
         self.rq = rq
-        self.kdf = PBKDF2HMAC(
-            algorithm=hashes.SHA256,
-            length=32,
-            salt="a".encode("utf-8"),
-            iterations=ITERATIONS,
-            backend=default_backend()
-        )
-        self.key = base64.urlsafe_b64encode(self.kdf.derive(self.psswrd.encode("utf-8")))
+        self.key = derive_key(self.psswrd) if key is None else key
         self.key_hash = hashlib.sha512(self.key).hexdigest()
-        if self.logfile == ":memory:":
-            self.logdict = {}
-            self.first_run()
-        elif os.path.exists(self.logfile):
-            self.logdict = self.read()
-        else:
-            self.logdict = {}
-            self.first_run()
+        self._lock = LogLock(None if self.logfile == ":memory:" else self.logfile)
+        self._journal = {}
+        self._value = None
+        self.logins = self._open_logins()
+        with self._lock:
+            if self.logfile == ":memory:":
+                self.logdict = {}
+                self.first_run()
+            elif os.path.exists(self.logfile):
+                self.logdict = self.read()
+            elif self.read_only:
+                raise FileNotFoundError(self.logfile)
+            else:
+                self.logdict = {}
+                self.first_run()
+            self._signature = self._file_signature()
+        self._load_totals()
+        if self.read_only:
+            return
+        self._load_logins()
         self.login_setup()
 
+    def _open_logins(self):
+        """
+        Description:
+            opens the login history, which is kept in its own file next to the log file
+        Parameters:
+            :return: an instance of LoginLog
+        """
+        return LoginLog(None if self.logfile == ":memory:" else f"{self.logfile}.logins", self.key)
+
+    def _load_logins(self):
+        """
+        Description:
+            moves the login times of logs made by older versions out of the log and into the login history
+        Parameters:
+            :return: None
+        """
+        if "login_times" not in self.logdict:
+            return
+        self.logins.extend(dt.datetime.fromisoformat(i) for i in self.logdict.pop("login_times"))
+        self.save()
+
+    def _load_totals(self):
+        """
+        Description:
+            builds the running totals of the energy log and verifies the card log, after the log is loaded
+            the collection value is valued again on its next read
+        Parameters:
+            :return: None
+        """
+        self._value = None
+        self._energy_totals = {}
+        self._energy_entries = 0
+        for energy_type, _, qnty in self.get_energy_log():
+            if qnty:
+                self._energy_totals[energy_type] = self._energy_totals.get(energy_type, 0) + qnty
+                self._energy_entries += 1
+        self.check_log()
+
     def reload_backup(self, index: int, day: int, month: int, year: int):
         if not self.use_backup:
             backup.init()
@@ -268,20 +502,18 @@ class DbHandleBase:
         Parameters:
             :return: None
         """
-        self.logdict = {"login_times": [], "log": {}, "energy": {}}
-        self.login_setup()
+        self.logdict = {"log": self.LOG_CLASS(), "energy": {}}
         self.save()
 
     def login_setup(self):
         """
         Description:
-            Logs the current login to the database
+            Logs the current login to the login history
         Parameters:
             :return: None
         """
-        date = dt.datetime.now().isoformat()
-        self.logdict["login_times"].append(date)
-        self.save()
+        with self._lock:
+            self.logins.add()
 
     def add_card(self, card_id: str, qnty: int, print_type: str):
         """
@@ -293,13 +525,10 @@ class DbHandleBase:
             :param print_type: the print type of the card
             :return: None
         """
-        card_id_print_type = f"{card_id}.{print_type}"
         if not self.test_card(card_id):
             return False
-        if current_qnty := self.get_card_qnty(card_id, print_type):
-            qnty += current_qnty
-        self.logdict["log"].update({card_id_print_type: qnty})
-        self.save()
+        self._set_card(card_id, print_type, self.logdict["log"].get(card_id, print_type) + qnty)
+        self._commit()
         return True
 
     def remove_card(self, card_id: str, qnty: int, print_type: str):
@@ -312,16 +541,13 @@ class DbHandleBase:
             :param print_type: the print type of the card
             :return: a bool based on if the operation was successful or not
         """
-        card_id_print_type = f"{card_id}.{print_type}"
         if not self.test_card(card_id):
             return False
-        current_qnty = self.get_card_qnty(card_id, print_type)
+        current_qnty = self.logdict["log"].get(card_id, print_type)
         if not current_qnty:
             return False
-        qnty = current_qnty - qnty
-        qnty = max(qnty, 0)
-        self.logdict["log"].update({card_id_print_type: qnty})
-        self.save()
+        self._set_card(card_id, print_type, current_qnty - qnty)
+        self._commit()
         return True
 
     def delete_card(self, card_id: str, print_type: str):
@@ -331,15 +557,291 @@ class DbHandleBase:
         Parameters:
             :param card_id: the id of the card according to pokemonTcgApi
             :param print_type: the print type of the card
-            :return: None
+            :return: bool based on if the card was in the log
         """
-        card_id_print_type = f"{card_id}.{print_type}"
         if not self.test_card(card_id):
             return False
-        _ = self.logdict["log"].pop(card_id_print_type)
-        self.save()
+        try:
+            qnty = self.logdict["log"].pop(card_id, print_type)
+        except KeyError:
+            return False
+        self._journal_change("log", card_id, print_type, -qnty)
+        self._value_change(card_id, print_type, qnty, 0)
+        self._commit()
         return True
 
+    def _check_rows(self, rows, energy: bool = False, owned: bool = False):
+        """
+        Description:
+            checks the rows of a bulk change, validating each distinct card id once, and adds up the valid rows of
+            the same card and print type
+        Parameters:
+            :param rows: an iterable of tuple card_id, print_type and qnty
+            :param energy: if True the rows are of energy cards, whose ids are checked without the api
+            :param owned: if True a row is only valid if its card is already in the log
+            :return: tuple of a list of bool of if each row is valid, and a dictionary of tuple card_id and print_type
+            to the total quantity of the valid rows
+        """
+        rows = list(rows)
+        if energy:
+            valid_ids = {energy_type: self.rq.validate_basic_energy(energy_type) for energy_type, _, _ in rows}
+        else:
+            valid_ids = self.validate_card_ids(card_id for card_id, _, _ in rows)
+        get_qnty = self._get_energy_qnty if energy else self._get_qnty
+        results = []
+        totals = {}
+        for card_id, print_type, qnty in rows:
+            valid = valid_ids[card_id] and isinstance(qnty, int) and qnty > 0
+            valid = valid and (not owned or bool(get_qnty(card_id, print_type)))
+            results.append(valid)
+            if valid:
+                totals[card_id, print_type] = totals.get((card_id, print_type), 0) + qnty
+        return results, totals
+
+    def _add_quantities(self, totals: dict):
+        """
+        Description:
+            adds to the quantities of many cards, removing the cards that reach 0, overwritten by backends that can do
+            it in one step
+        Parameters:
+            :param totals: dictionary of tuple card_id and print_type to the change in quantity
+            :return: None
+        """
+        self._set_cards(
+            (card_id, print_type, self._get_qnty(card_id, print_type) + change)
+            for (card_id, print_type), change in totals.items()
+        )
+
+    def add_cards(self, rows):
+        """
+        Description:
+            Adds quantity to many cards with one validation per set and one save, rows of the same card are added up
+        Parameters:
+            :param rows: an iterable of tuple card_id, print_type and qnty
+            :return: list of bool based on if each row was valid and added
+        """
+        results, totals = self._check_rows(rows)
+        if totals:
+            self._add_quantities(totals)
+            self._commit()
+        return results
+
+    def remove_cards(self, rows):
+        """
+        Description:
+            Removes quantity from many cards with one validation per set and one save, cards that reach 0 are removed
+        Parameters:
+            :param rows: an iterable of tuple card_id, print_type and qnty
+            :return: list of bool based on if each row was valid and its card was in the log
+        """
+        results, totals = self._check_rows(rows, owned=True)
+        if totals:
+            self._add_quantities({key: -qnty for key, qnty in totals.items()})
+            self._commit()
+        return results
+
+    def set_quantities(self, quantities: dict):
+        """
+        Description:
+            sets the quantities of many cards with one validation per set and one save, a quantity of 0 removes the
+            card
+        Parameters:
+            :param quantities: dictionary of tuple card_id and print_type to the new quantity
+            :return: dictionary of tuple card_id and print_type to a bool based on if it was valid and set
+        """
+        quantities = dict(quantities)
+        valid_ids = self.validate_card_ids(card_id for card_id, _ in quantities)
+        results = {
+            (card_id, print_type): valid_ids[card_id] and isinstance(qnty, int) and qnty >= 0
+            for (card_id, print_type), qnty in quantities.items()
+        }
+        rows = [(card_id, print_type, qnty) for (card_id, print_type), qnty in quantities.items()
+                if results[card_id, print_type]]
+        if rows:
+            self._set_cards(rows)
+            self._commit()
+        return results
+
+    def _set_card(self, card_id: str, print_type: str, qnty: int):
+        """
+        Description:
+            sets the quantity of a card and notes the change in the journal, removing it if the quantity is not
+            above 0
+        Parameters:
+            :param card_id: the id of the card according to pokemonTcgApi
+            :param print_type: the print type of the card
+            :param qnty: the new quantity of the card
+            :return: None
+        """
+        qnty = max(qnty, 0)
+        old_qnty = self.logdict["log"].get(card_id, print_type)
+        self.logdict["log"].set(card_id, print_type, qnty)
+        self._journal_change("log", card_id, print_type, qnty - old_qnty)
+        self._value_change(card_id, print_type, old_qnty, qnty)
+
+    def _set_cards(self, rows):
+        """
+        Description:
+            sets the quantities of many cards, overwritten by backends that can do it in one step
+        Parameters:
+            :param rows: an iterable of tuple card_id, print_type and qnty
+            :return: None
+        """
+        for card_id, print_type, qnty in rows:
+            self._set_card(card_id, print_type, qnty)
+
+    def _value_change(self, card_id: str, print_type: str, old_qnty: int, new_qnty: int):
+        """
+        Description:
+            applies a change in the quantity of a card to the collection value, if it has been valued
+        Parameters:
+            :param card_id: the id of the card according to pokemonTcgApi
+            :param print_type: the print type of the card
+            :param old_qnty: the quantity before the change
+            :param new_qnty: the quantity after the change
+            :return: None
+        """
+        if self._value is not None:
+            self._value.change(card_id, print_type, old_qnty, max(new_qnty, 0))
+
+    def _note_change(self, card_id: str, print_type: str, old_qnty: int, new_qnty: int):
+        """
+        Description:
+            notes a change in the quantity of a card in the journal and the collection value, for backends that write
+            the change without _set_card
+        Parameters:
+            :param card_id: the id of the card according to pokemonTcgApi
+            :param print_type: the print type of the card
+            :param old_qnty: the quantity before the change
+            :param new_qnty: the quantity after the change
+            :return: None
+        """
+        new_qnty = max(new_qnty, 0)
+        self._journal_change("log", card_id, print_type, new_qnty - old_qnty)
+        self._value_change(card_id, print_type, old_qnty, new_qnty)
+
+    def _note_set_cards(self, rows):
+        """
+        Description:
+            notes the quantities of many cards that are about to be set in one step, when a card is in the rows more
+            than once the last row wins
+        Parameters:
+            :param rows: an iterable of tuple card_id, print_type and qnty
+            :return: list of the rows
+        """
+        rows = list(rows)
+        quantities = {(card_id, print_type): qnty for card_id, print_type, qnty in rows}
+        for (card_id, print_type), qnty in quantities.items():
+            self._note_change(card_id, print_type, self._get_qnty(card_id, print_type), qnty)
+        return rows
+
+    def _note_add_quantities(self, totals: dict):
+        """
+        Description:
+            notes the changes of many cards that are about to be added up in one step
+        Parameters:
+            :param totals: dictionary of tuple card_id and print_type to the change in quantity
+            :return: None
+        """
+        for (card_id, print_type), change in totals.items():
+            old_qnty = self._get_qnty(card_id, print_type)
+            self._note_change(card_id, print_type, old_qnty, old_qnty + change)
+
+    def collection_value(self):
+        """
+        Description:
+            the value of the collection in each price category, the first read values the whole log and after that
+            the value is kept up to date by every change, so reading it does not go over the log, only the entries
+            that were added since the last read are valued
+        Parameters:
+            :return: dictionary of price category to the value in cents
+        """
+        if self._value is None:
+            import valuation
+            self._value = valuation.RunningValue(valuation.Valuation(self))
+        self._value.value_pending()
+        return dict(self._value.totals)
+
+    def collection_counts(self):
+        """
+        Description:
+            the number of cards of the collection that have a price in each price category, kept up to date with
+            collection_value
+        Parameters:
+            :return: dictionary of price category to the number of cards
+        """
+        self.collection_value()
+        return dict(self._value.counts)
+
+    def group_by(self, keys: (str, tuple) = "set", category: (str, None) = "market", missing: list = None,
+                 workers: int = PRICE_WORKERS, window: int = PRICE_WINDOW):
+        """
+        Description:
+            counts and values the log by set, rarity, supertype, Pokémon type, print type or release date in a single
+            pass, joined with the metadata cached on disk, the prices of the collection value are used if it is kept
+        Parameters:
+            :param keys: one of analytics.GROUP_KEYS, or a tuple of them to group by all of them at once
+            :param category: the price category the groups are valued by, None to only count the cards
+            :param missing: a list that tuple card_id, print_type and reason is added to for every row without metadata
+            or a price
+            :param workers: the number of requests made at the same time
+            :param window: the largest number of cards requested ahead
+            :return: dictionary of the group to a dictionary of "cards", "entries", "value" in cents and "priced"
+        """
+        import analytics
+        value = None
+        if self._value is not None and self._value.categories == PRICE_CATEGORIES:
+            value = self._value
+        return analytics.group_log(self, keys, category, value=value, missing=missing, workers=workers, window=window)
+
+    def refresh_prices(self, workers: int = PRICE_WORKERS, window: int = PRICE_WINDOW):
+        """
+        Description:
+            requests the prices of every card of the log again and applies the difference of each changed price to the
+            collection value, the cached data of cards of other logs is kept
+        Parameters:
+            :param workers: the number of requests made at the same time
+            :param window: the largest number of cards requested ahead
+            :return: the number of entries whose prices changed
+        """
+        if self._value is None:
+            self.collection_value()
+            return 0
+        self.rq.forget_cards(self.get_card_ids())
+
+        def request(rows: list):
+            try:
+                return rows, self.rq.get_card(rows[0][0])["data"]
+            except ConnectionError:
+                return rows, None
+
+        groups = (list(rows) for _, rows in itertools.groupby(self.get_log(), key=lambda row: row[0]))
+        changed = 0
+        for rows, data in prefetch_map(request, groups, workers, window, PRICE_CHUNK):
+            for card_id, print_type, qnty in rows:
+                changed += self._value.reprice(card_id, print_type, qnty, data)
+        return changed
+
+    def _journal_change(self, log: str, card_id: str, print_type: str, change: int):
+        """
+        Description:
+            notes a change that was not saved yet, so it can be applied again on top of a log saved by another process
+        Parameters:
+            :param log: "log" for the card log or "energy" for the energy log
+            :param card_id: the id of the card, or the energy type
+            :param print_type: the print type of the card
+            :param change: the change in quantity
+            :return: None
+        """
+        if not change:
+            return
+        key = (log, card_id, print_type)
+        change += self._journal.get(key, 0)
+        if change:
+            self._journal[key] = change
+        else:
+            self._journal.pop(key, None)
+
     def get_card_qnty(self, card_id: str, print_type: str):
         """
         Description:
@@ -349,13 +851,20 @@ class DbHandleBase:
             :param print_type: the print type of the card
             :return: The quantity of the card
         """
-        card_id_print_type = f"{card_id}.{print_type}"
         if not self.test_card(card_id):
             return 0
-        try:
-            return self.logdict["log"][card_id_print_type]
-        except KeyError:
-            return 0
+        return self._get_qnty(card_id, print_type)
+
+    def _get_qnty(self, card_id: str, print_type: str):
+        """
+        Description:
+            gets the quantity of a card without validating the card id
+        Parameters:
+            :param card_id: the id of the card according to pokemonTcgApi
+            :param print_type: the print type of the card
+            :return: The quantity of the card
+        """
+        return self.logdict["log"].get(card_id, print_type)
 
     def get_log(self):
         """
@@ -364,9 +873,7 @@ class DbHandleBase:
         Parameters:
             :return: a generator of the rows in the log
         """
-        for card_id_print_type, qnty in self.logdict["log"].items():
-            card_id, print_type = card_id_print_type.split(".")
-            yield card_id, print_type, qnty
+        yield from self.logdict["log"]
 
     def get_card_by_id_only(self, card_id: str):
         """
@@ -377,11 +884,138 @@ class DbHandleBase:
             :param card_id: the id of the card according to pokemonTcgApi
             :return: generator of tuple print_type and qnty
         """
-        for card_id_print_type in self.logdict["log"].keys():
-            cid, print_type = card_id_print_type.split(".")
-            if card_id == cid:
-                qnty = self.logdict["log"][card_id_print_type]
-                yield print_type, qnty
+        yield from self.logdict["log"].get_by_id(card_id)
+
+    def get_card_ids(self):
+        """
+        Description:
+            a generator of every distinct card id in the log, regardless of print type
+        Parameters:
+            :return: generator of card ids
+        """
+        yield from self.logdict["log"].card_ids()
+
+    def get_set_ids(self):
+        """
+        Description:
+            a generator of the ids of every set that has a card in the log
+        Parameters:
+            :return: generator of set ids
+        """
+        yield from self.logdict["log"].set_ids()
+
+    def get_set_numbers(self, set_id: str):
+        """
+        Description:
+            gets the collectors numbers of every card of a set that is in the log
+        Parameters:
+            :param set_id: the id of the set according to pokemonTcgApi
+            :return: set of the card numbers
+        """
+        return self.logdict["log"].get_set_numbers(set_id)
+
+    def get_set_completion(self, set_id: str):
+        """
+        Description:
+            gets how complete a set is in the log, counting a card as owned if any print type of it is in the log
+            the card list of the set is cached by RqHandle, so only the first call for a set uses the api
+        Parameters:
+            :param set_id: the id of the set according to pokemonTcgApi
+            :return: tuple of the owned count, the total count, and a list of the missing card numbers
+        """
+        set_numbers = self.rq.get_set_cards(set_id)
+        owned = self.get_set_numbers(set_id)
+        missing = [number for number in set_numbers if number not in owned]
+        return len(set_numbers) - len(missing), len(set_numbers), missing
+
+    def get_all_set_completion(self, owned_only: bool = False):
+        """
+        Description:
+            gets how complete every set is in the log
+        Parameters:
+            :param owned_only: if True only sets with at least one card in the log are included
+            :return: generator of a tuple of set id, set name, owned count, total count, and missing card numbers
+        """
+        owned_sets = set(self.get_set_ids())
+        for set_id, set_name in self.rq.get_all_sets():
+            if owned_only and set_id not in owned_sets:
+                continue
+            owned, total, missing = self.get_set_completion(set_id)
+            yield set_id, set_name, owned, total, missing
+
+    def check_log(self):
+        """
+        Description:
+            checks that the in memory log is consistent
+            raises ValueError if it is not
+        Parameters:
+            :return: True if the log is consistent
+        """
+        self.logdict["log"].check()
+        energy_totals = {}
+        energy_entries = 0
+        for energy_type, _, qnty in self.get_energy_log():
+            if qnty:
+                energy_totals[energy_type] = energy_totals.get(energy_type, 0) + qnty
+                energy_entries += 1
+        if energy_totals != self._energy_totals or energy_entries != self._energy_entries:
+            raise ValueError("energy totals do not match the energy log")
+        return True
+
+    def stats(self):
+        """
+        Description:
+            gets the running totals of the log, without going over the log
+        Parameters:
+            :return: dictionary of the card total, entry count, and totals per print type, and the same for the energy
+            log with totals per energy type
+        """
+        return {
+            "cards": self.reg_log_size,
+            "entries": len(self.logdict["log"]),
+            "print_types": self.logdict["log"].print_type_totals(),
+            "energy": self.energy_log_size,
+            "energy_entries": self._energy_entries,
+            "energy_types": dict(self._energy_totals)
+        }
+
+    def log_checksum(self):
+        """
+        Description:
+            sums up the log into counts and a checksum that do not depend on the storage backend, to check copies
+        Parameters:
+            :return: dictionary of the entry count, card total and checksum of the card log, and the energy total
+        """
+        checksum = logformat.log_checksum(self.get_log())
+        checksum["energy"] = self.energy_log_size
+        return checksum
+
+    def migrate_pickle(self, pickle_file: str):
+        """
+        Description:
+            copies the contents of an encrypted log made by clss_pickle into this log, replacing its cards
+            the old log must use the same password, its cards are read a set at a time without validating them against
+            pokemonTcgApi, and the old file is left untouched
+        Parameters:
+            :param pickle_file: the path to the clss_pickle log file
+            :return: the number of card entries that were copied
+        """
+        with open(pickle_file, "rb") as f:
+            contents = Fernet(self.key).decrypt(f.read())
+        logdict, rows = logformat.stream_log(contents)
+        card_log = self.LOG_CLASS.from_rows(rows)
+        del contents, rows
+        login_times = logdict.pop("login_times", None)
+        self.logdict["log"].close()
+        logdict["log"] = card_log
+        self.logdict = logdict
+        if login_times is not None:
+            self.logins.extend(dt.datetime.fromisoformat(i) for i in login_times)
+        else:
+            self.logins.extend(LoginLog(f"{pickle_file}.logins", self.key))
+        self._load_totals()
+        self.save()
+        return len(card_log)
 
     def test_card(self, card_id: str):
         """
@@ -397,9 +1031,36 @@ class DbHandleBase:
         except ConnectionError:
             return False
 
+    def validate_card_ids(self, card_ids, workers: int = VALIDATE_WORKERS):
+        """
+        Description:
+            Tests many card ids at once, the card list of each set is requested once instead of each card, the lists
+            are requested in parallel and cached by RqHandle
+        Parameters:
+            :param card_ids: an iterable of card ids according to pokemonTcgApi
+            :param workers: the number of set lists to request at the same time
+            :return: dictionary of each distinct card id to a bool of if it is valid
+        """
+        sets = {}
+        for card_id in set(card_ids):
+            set_id, number = split_card_id(card_id)
+            sets.setdefault(set_id, []).append((card_id, number))
+
+        def set_numbers(set_id: str):
+            if not set_id:
+                return ()
+            try:
+                return frozenset(self.rq.get_set_cards(set_id))
+            except ConnectionError:
+                return ()
+
+        with ThreadPoolExecutor(workers) as executor:
+            numbers = dict(zip(sets, executor.map(set_numbers, sets)))
+        return {card_id: number in numbers[set_id] for set_id, cards in sets.items() for card_id, number in cards}
+
     @property
     def reg_log_size(self):
-        return sum(q for _, _, q in self.get_log())
+        return self.logdict["log"].total()
 
     def save(self):
         """
@@ -410,6 +1071,123 @@ class DbHandleBase:
         """
         pass
 
+    def _commit(self):
+        """
+        Description:
+            saves the log, unless a batch is open in which case the save is deferred until the batch closes
+        Parameters:
+            :return: None
+        """
+        if self._batch_depth:
+            self._batch_dirty = True
+            return
+        self.sync()
+
+    def _file_signature(self):
+        """
+        Description:
+            gets a signature of the log file that changes whenever the file is replaced or written
+        Parameters:
+            :return: tuple of the inode, size and modification time of the file, None if there is no file
+        """
+        if self.logfile == ":memory:":
+            return None
+        try:
+            stat = os.stat(self._stamp_file())
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+    def _stamp_file(self):
+        """
+        Description:
+            gets the file that is replaced every time the log is saved
+        Parameters:
+            :return: the path to the file
+        """
+        return self.logfile
+
+    def _merge_from_disk(self):
+        """
+        Description:
+            reads the log saved by another process and applies the changes of this process that were not saved yet on
+            top of it
+        Parameters:
+            :return: bool based on if the log on disk had changed
+        """
+        ondisk = self.read()
+        if ondisk.get("generation", 0) == self.logdict.get("generation", 0):
+            with contextlib.suppress(AttributeError):
+                ondisk["log"].close()
+            return False
+        for (log, card_id, print_type), change in self._journal.items():
+            if log == "log":
+                ondisk["log"].add(card_id, print_type, change)
+                continue
+            print_types = ondisk["energy"].setdefault(card_id, {})
+            qnty = print_types.pop(print_type, 0) + change
+            if qnty > 0:
+                print_types[print_type] = qnty
+            elif not print_types:
+                del ondisk["energy"][card_id]
+        with contextlib.suppress(AttributeError):
+            self.logdict["log"].close()
+        self.logdict = ondisk
+        self._load_totals()
+        return True
+
+    def sync(self):
+        """
+        Description:
+            saves the log while holding the log lock, if another process saved the log since it was read, the changes
+            of this process are applied on top of the saved log first, a read only log is never saved
+        Parameters:
+            :return: None
+        """
+        if self.read_only:
+            return
+        with self._lock:
+            if self._file_signature() != self._signature:
+                self._merge_from_disk()
+            self.logdict["generation"] = self.logdict.get("generation", 0) + 1
+            self.save()
+            self._journal = {}
+            self._signature = self._file_signature()
+
+    def refresh(self):
+        """
+        Description:
+            reloads the log if another process saved it, keeping the changes of this process that were not saved yet
+            does not take the log lock, so it never waits on a writer
+        Parameters:
+            :return: bool based on if the log was reloaded
+        """
+        if self.logfile == ":memory:":
+            return False
+        signature = self._file_signature()
+        if signature == self._signature:
+            return False
+        reloaded = self._merge_from_disk()
+        self._signature = signature
+        return reloaded
+
+    @contextlib.contextmanager
+    def batch(self):
+        """
+        Description:
+            a context manager that groups every change made inside of it into a single save
+        Parameters:
+            :return: a context manager
+        """
+        self._batch_depth += 1
+        try:
+            yield self
+        finally:
+            self._batch_depth -= 1
+            if not self._batch_depth and self._batch_dirty:
+                self._batch_dirty = False
+                self.sync()
+
     def list_login(self):
         """
         Description:
@@ -417,19 +1195,39 @@ class DbHandleBase:
         Parameters:
             :return: a generator of a tuple consisting of the datetime data (day, month, year, hour, minute, second)
         """
-        if not self.logdict["login_times"]:
-            return (None, None, None, None, None, None), (None, None, None, None, None, None)
-        for i in self.logdict["login_times"]:
-            d = dt.datetime.fromisoformat(i)
-            date = d.date()
-            time = d.time()
-            day = date.day
-            month = date.month
-            year = date.year
-            hour = time.hour
-            minute = time.minute
-            second = time.second
-            yield day, month, year, hour, minute, second
+        for d in self.logins:
+            yield d.day, d.month, d.year, d.hour, d.minute, d.second
+
+    def _add_logins(self, times):
+        """
+        Description:
+            adds logins to the login history as one write, skipping logins that are already in it or repeated
+        Parameters:
+            :param times: an iterable of datetime of the logins
+            :return: the number of logins that were added
+        """
+        with self._lock:
+            existing = set(self.logins.times)
+            new_times = []
+            for when in times:
+                if int(when.timestamp()) not in existing:
+                    existing.add(int(when.timestamp()))
+                    new_times.append(when)
+            times = new_times
+            if times:
+                self.logins.extend(times)
+        return len(times)
+
+    def get_logins_between(self, start: dt.datetime, end: dt.datetime):
+        """
+        Description:
+            a generator of the successful logins in a range of time
+        Parameters:
+            :param start: the start of the range
+            :param end: the end of the range, inclusive
+            :return: a generator of datetime of the logins
+        """
+        yield from self.logins.between(start, end)
 
     def read(self):
         """
@@ -438,49 +1236,112 @@ class DbHandleBase:
         Parameters:
             :return: None
         """
-        return {"psswrd": self.psswrd_hash, "login_times": [], "log": {}, "energy": {}}
+        return {"psswrd": self.psswrd_hash, "log": CardLog(), "energy": {}}
 
-    def log_with_prices(self, log_list: iter):
+    def _card_prices(self, rows: list, category: str = "market"):
+        """
+        Description:
+            adds the value to rows of the same card with one request
+        Parameters:
+            :param rows: a list of tuple card_id, print_type and qnty of one card
+            :param category: the price category, one of PRICE_CATEGORIES
+            :return: list of tuple of the row with its price added, and None or the reason the price is missing
+        """
+        try:
+            prices = self.rq.get_card(rows[0][0])["data"].get("tcgplayer", {}).get("prices")
+        except ConnectionError:
+            return [((*row, None), "the card could not be requested") for row in rows]
+        if not prices:
+            return [((*row, None), "the card has no prices") for row in rows]
+        priced = []
+        for card_id, print_type, qnty in rows:
+            price = (prices.get(print_type) or {}).get(category)
+            if price is None:
+                priced.append(((card_id, print_type, qnty, None), f"the card has no {category} price for {print_type}"))
+            else:
+                priced.append(((card_id, print_type, qnty, round(price * qnty, 2)), None))
+        return priced
+
+    def log_with_prices(self, log_list: iter, missing: list = None, workers: int = PRICE_WORKERS,
+                        window: int = PRICE_WINDOW, category: str = "market"):
         """
         Descriptions:
             parses the log and adds prices and presents it in the form of a generator
+            the prices of several cards are requested at the same time ahead of the consumer, and the rows are
+            yielded in the order of the log
         Parameters:
             :param log_list: a reference to the log
-            :return: generator of a tuple of card_id, print_type, qnty, and price
+            :param missing: a list that tuple card_id, print_type and reason is added to for every row without a price
+            :param workers: the number of requests made at the same time
+            :param window: the largest number of cards requested ahead of the consumer
+            :param category: the price category, one of PRICE_CATEGORIES
+            :return: generator of a tuple of card_id, print_type, qnty, and price, the price is the price of the
+            category times the quantity, or None if it is missing
+        """
+        groups = (list(rows) for _, rows in itertools.groupby(log_list, key=lambda row: row[0]))
+        card_prices = functools.partial(self._card_prices, category=category)
+        for priced in prefetch_map(card_prices, groups, workers, window, PRICE_CHUNK):
+            for row, reason in priced:
+                if reason is not None and missing is not None:
+                    missing.append((row[0], row[1], reason))
+                yield row
+
+    def get_log_by_total_value(self, n: int = None, category: str = "market", missing: list = None,
+                               workers: int = PRICE_WORKERS, window: int = PRICE_WINDOW):
         """
-        for row in log_list:
-            card_id, print_type, qnty = row
-            price = round((self.rq.get_card(card_id)["data"]["tcgplayer"]["prices"][print_type]["market"] * qnty), 2)
-            # print(f"card id = {card_id}, print type = {print_type}, qnty = {qnty}, price = {price}")
-            yield card_id, print_type, qnty, price
+        Description:
+            ranks the log by the value of each entry, its price times its quantity
+            the log is streamed through log_with_prices, each card's price is requested once and cached, and for a top
+            n only a heap of n entries is kept instead of sorting the whole log
+        Parameters:
+            :param n: the number of most valuable entries to return, None for the whole log
+            :param category: the price category, one of PRICE_CATEGORIES
+            :param missing: a list that tuple card_id, print_type and reason is added to for every row without a price
+            :param workers: the number of requests made at the same time
+            :param window: the largest number of cards requested ahead of the ranking
+            :return: list of tuple card_id, print_type, qnty and value, most valuable first, entries of the same value
+            are in log order, entries without a price are left out
+        """
+        if category not in PRICE_CATEGORIES:
+            raise ValueError(f"unknown price category {category}")
+        rows = (row for row in self.log_with_prices(self.get_log(), missing, workers, window, category)
+                if row[3] is not None)
+        if n is None:
+            return sorted(rows, key=operator.itemgetter(3), reverse=True)
+        return heapq.nlargest(n, rows, key=operator.itemgetter(3))
 
-    def export_csv(self, output_file: str, output: bool = True):
+    def export_csv(self, output_file: str, output: bool = True, prices: bool = True):
         """
         Description:
-            exports log to a csv file.
+            exports log to a csv file, rows are written as they are read, in the order of the log
+            prices are requested for several cards at the same time, ahead of the writer
         Parameters:
-            :param output: a boolean true if you want output to console
+            :param output: a boolean true if you want a progress bar on the console
             :param output_file: a path to the file you wish to write to
-            :return: None
+            :param prices: if False the price column is left empty and the api is not used, so it works offline
+            :return: the number of rows written
         """
-        if output:
-            print("loading cards from log...")
-        data = []
-        for card_id, print_type, qnty, price in self.log_with_prices(self.get_log()):
-            if output:
-                msg = f"loading card id {card_id} with print type {print_type} and quantity of {qnty} with a price of"
-                msg2 = f"${price}"
-                print(f"{msg} {msg2}")
-            data.append({"card_id": card_id, "print_type": print_type, "qnty": qnty, "price": price})
-        with open(output_file, "w") as f:
-            field_name = ["card_id", "print_type", "qnty", "price"]
-            csv_writer = csv.DictWriter(f, field_name)
-            csv_writer.writeheader()
-            for row in data:
-                if output:
-                    print(
-                        f"adding card with card id {row['card_id']} and print type {row['print_type']}, and quantity of {row['qnty']} to the csv file {output_file}")
+        total = self.stats()["entries"]
+        missing = []
+        if prices:
+            priced = self.log_with_prices(self.get_log(), missing)
+        else:
+            priced = ((card_id, print_type, qnty, None) for card_id, print_type, qnty in self.get_log())
+        written = 0
+        step = max(total // 100, 1)
+        with open(output_file, "w", newline="") as f:
+            csv_writer = csv.writer(f)
+            csv_writer.writerow(["card_id", "print_type", "qnty", "price"])
+            for row in priced:
                 csv_writer.writerow(row)
+                written += 1
+                if output and (not written % step or written == total):
+                    print_progress(written, total)
+        if output and written != total:
+            print_progress(written, written)
+        if output and missing:
+            print(f"{len(missing)} rows have no price")
+        return written
 
     def close(self):
         """
@@ -489,7 +1350,7 @@ class DbHandleBase:
         Parameters:
             :return: None
         """
-        self.save()
+        self.sync()
 
     def encrypt(self):
         """
@@ -517,34 +1378,68 @@ class DbHandleBase:
         with open(self.logfile, "wb") as f:
             f.write(output)
 
-    def import_csv(self, input_file: str, output: bool = True):
+    def import_csv(self, input_file: str, output: bool = True, dry_run: bool = False):
         """
         Description:
-            Import to the log from csv
+            Imports cards from a csv file with card_id, print_type and qnty columns, replacing the quantities of the
+            cards that are in the file. The file is read as a stream, rows of the same card and print type are added
+            up, rows whose print type is not one of PRINT_TYPES are skipped, every distinct card id is validated once,
+            and every change is saved in one commit
         Parameters:
-            :param input_file:
-            :param output:
-            :return:
+            :param input_file: the path to the csv file
+            :param output: a boolean true if you want the progress printed to the console
+            :param dry_run: if True the file is checked and the changes are counted, but the log is not changed
+            :return: False if the file does not exist, otherwise a dictionary of the number of rows read, the number
+            of cards that were set (or would be set in a dry run), and a list of tuple line number and reason for the
+            rows that were skipped
         """
         if not os.path.exists(input_file):
             return False
-        with open(input_file, "r") as f:
+        cards = {}
+        lines = {}
+        bad_rows = []
+        row_count = 0
+        with open(input_file, "r", newline="") as f:
             csv_reader = csv.DictReader(f)
             for row in csv_reader:
-                card_id = row["card_id"]
-                print_type = row["print_type"]
-                qnty = int(row["qnty"])
-                if output:
-                    print(f"processing card id {card_id}")
-                with contextlib.suppress(KeyError):
-                    if output:
-                        print("checking for card pre existence")
-                    self.delete_card(card_id, print_type)
-                if output:
-                    print(f"adding card with card id {card_id} and print type {print_type}, and quantity of {qnty}")
-                self.add_card(card_id, qnty, print_type)
-        self.save()
-        return True
+                row_count += 1
+                if output and not row_count % CSV_PROGRESS_ROWS:
+                    print(f"read {row_count} rows")
+                try:
+                    card_id = row["card_id"].strip()
+                    print_type = row["print_type"].strip()
+                    qnty = int(row["qnty"])
+                except (KeyError, AttributeError, TypeError, ValueError):
+                    bad_rows.append((csv_reader.line_num, "the row is missing a card id, print type or quantity"))
+                    continue
+                if not card_id or not print_type or qnty < 0:
+                    bad_rows.append((csv_reader.line_num, "the row has an empty field or a negative quantity"))
+                    continue
+                try:
+                    print_type = check_print_type(print_type)
+                except ValueError as e:
+                    bad_rows.append((csv_reader.line_num, str(e)))
+                    continue
+                cards[card_id, print_type] = cards.get((card_id, print_type), 0) + qnty
+                lines.setdefault(card_id, []).append(csv_reader.line_num)
+        if output:
+            print(f"read {row_count} rows, validating {len(lines)} card ids")
+        valid_ids = self.validate_card_ids(lines)
+        for card_id, valid in valid_ids.items():
+            if not valid:
+                bad_rows.extend((line, f"{card_id} is not a valid card id") for line in lines[card_id])
+        rows = [(card_id, print_type, qnty) for (card_id, print_type), qnty in cards.items() if valid_ids[card_id]]
+        bad_rows.sort()
+        if output:
+            for line, reason in bad_rows:
+                print(f"skipped line {line}: {reason}")
+        if not dry_run:
+            if output:
+                print(f"setting {len(rows)} cards")
+            with self.batch():
+                self._set_cards(rows)
+                self._commit()
+        return {"rows": row_count, "cards": len(rows), "bad_rows": bad_rows}
 
     def get_full_price_data(self, card_id: str, print_type: str):
         """
@@ -562,11 +1457,92 @@ class DbHandleBase:
         price_data = cd["tcgplayer"]["prices"][print_type]
         yield from price_data.items()
 
+    def _log_sets(self):
+        """
+        Description:
+            gets the card log grouped by set, overwritten by backends whose log is not kept in logdict
+        Parameters:
+            :return: dictionary of set id to dictionary of "number.print_type" keys and quantity values
+        """
+        return self.logdict["log"].set_dicts()
+
+    def diff(self, other):
+        """
+        Description:
+            compares the card log with the card log of another log without using the api, the logs are compared a set
+            at a time and only the cards of the sets that differ are compared one by one
+        Parameters:
+            :param other: a reference to another instance of DbHandleBase or its subclasses
+            :return: dictionary of "added" for the cards only in the other log with their quantity there, "removed" for
+            the cards only in this log with their quantity here, and "changed" for the cards in both with a different
+            quantity, with their quantity in the other log, each a sorted list of tuple card_id, print_type and qnty
+        """
+        mine = self._log_sets()
+        theirs = other._log_sets()
+        added = []
+        removed = []
+        changed = []
+        for set_id in mine.keys() | theirs.keys():
+            my_cards = mine.get(set_id, {})
+            their_cards = theirs.get(set_id, {})
+            if my_cards == their_cards:
+                continue
+            for key, qnty in my_cards.items():
+                their_qnty = their_cards.get(key)
+                if their_qnty is None:
+                    removed.append((set_id, key, qnty))
+                elif their_qnty != qnty:
+                    changed.append((set_id, key, their_qnty))
+            added.extend((set_id, key, their_cards[key]) for key in their_cards.keys() - my_cards.keys())
+        return {
+            name: sorted(
+                (join_card_id(set_id, number), print_type, qnty)
+                for set_id, key, qnty in rows
+                for number, _, print_type in (key.rpartition("."), )
+            )
+            for name, rows in (("added", added), ("removed", removed), ("changed", changed))
+        }
+
+    def merge(self, other, strategy: str = "sum"):
+        """
+        Description:
+            merges the card log of another log into this one with one save, without using the api
+            with "sum" the quantities of both logs are added, with "max" the larger quantity is kept, and with "theirs"
+            the quantities of the other log replace those of this log. Cards that are only in this log are kept
+        Parameters:
+            :param other: a reference to another instance of DbHandleBase or its subclasses
+            :param strategy: "sum", "max" or "theirs"
+            :return: the number of cards whose quantity changed
+        """
+        if strategy not in ("sum", "max", "theirs"):
+            raise ValueError(f"unknown strategy {strategy}")
+        mine = self._log_sets()
+        rows = []
+        for set_id, their_cards in other._log_sets().items():
+            my_cards = mine.get(set_id, {})
+            if strategy != "sum" and my_cards == their_cards:
+                continue
+            for key, qnty in their_cards.items():
+                my_qnty = my_cards.get(key, 0)
+                if strategy == "sum":
+                    new_qnty = my_qnty + qnty
+                elif strategy == "max":
+                    new_qnty = max(my_qnty, qnty)
+                else:
+                    new_qnty = qnty
+                if new_qnty != my_qnty:
+                    number, _, print_type = key.rpartition(".")
+                    rows.append((join_card_id(set_id, number), print_type, new_qnty))
+        if rows:
+            self._set_cards(rows)
+            self._commit()
+        return len(rows)
+
     def trade(self, other, other_card_id: str, other_print_type: str, other_qnty: int, card_id: str, print_type: str,
               qnty: int):
         """
         Description:
-            trades with another user
+            trades one card with another user, see trade_cards
         Parameters:
             :param other: a reference to another instance of DbHandleBase or its subclasses of the other user
             :param other_card_id: card id of user two as is according to pokemonTcgApi
@@ -577,24 +1553,103 @@ class DbHandleBase:
             :param qnty: the quantity of user one's card to trade
             :return: int of the trade success status
         """
-        self.test_card(card_id)
-        if not self.test_card(other_card_id) and not self.test_card(card_id):
+        return self.trade_cards(other, [(card_id, print_type, qnty)], [(other_card_id, other_print_type, other_qnty)])
+
+    @staticmethod
+    def _aggregate_rows(rows):
+        """
+        Description:
+            adds up the quantities of rows of the same card and print type
+        Parameters:
+            :param rows: an iterable of tuple card_id, print_type and qnty
+            :return: dictionary of tuple card_id and print_type to the total quantity, in the order first seen
+        """
+        totals = {}
+        for card_id, print_type, qnty in rows:
+            totals[card_id, print_type] = totals.get((card_id, print_type), 0) + qnty
+        return totals
+
+    def trade_cards(self, other, give, take):
+        """
+        Description:
+            trades many cards with another user at once. Every card is validated and both logs are checked for the
+            quantities before anything changes, then both sides are applied together and each log is saved once
+            if applying or saving either side fails, both logs are put back the way they were and the error is raised
+        Parameters:
+            :param other: a reference to another instance of DbHandleBase or its subclasses of the other user
+            :param give: an iterable of tuple card_id, print_type and qnty that this user gives to the other user
+            :param take: an iterable of tuple card_id, print_type and qnty that the other user gives to this user
+            :return: int of the trade success status
+        """
+        give = self._aggregate_rows(give)
+        take = self._aggregate_rows(take)
+        if other is self or not give and not take:
+            return TRADE_CODE_INVALID_TRADE
+        if any(not isinstance(qnty, int) or qnty <= 0 for qnty in itertools.chain(give.values(), take.values())):
+            return TRADE_CODE_INVALID_TRADE
+        valid_ids = self.validate_card_ids(card_id for card_id, _ in itertools.chain(give, take))
+        if not all(valid_ids.values()):
             return TRADE_CODE_CARD_DOES_NOT_EXIST
-        if (o_qnty := other.get_card_qnty(other_card_id, other_print_type)) == 0:
-            return TRADE_CODE_CARD_NOT_IN_LOG
-        if (self_qnty := self.get_card_qnty(card_id, print_type)) == 0:
-            return TRADE_CODE_CARD_NOT_IN_LOG
-        if o_qnty < other_qnty:
-            return TRADE_CODE_CARD_NOT_IN_LOG_QNTY
-        if self_qnty < qnty:
-            return TRADE_CODE_CARD_NOT_IN_LOG_QNTY
-        other.add_card(card_id, qnty, print_type)
-        other.remove_card(other_card_id, other_qnty, other_print_type)
-        self.add_card(other_card_id, other_qnty, other_print_type)
-        self.remove_card(card_id, qnty, print_type)
-        self.save()
+        for db, cards in ((self, give), (other, take)):
+            for (card_id, print_type), qnty in cards.items():
+                owned = db._get_qnty(card_id, print_type)
+                if not owned:
+                    return TRADE_CODE_CARD_NOT_IN_LOG
+                if owned < qnty:
+                    return TRADE_CODE_CARD_NOT_IN_LOG_QNTY
+        keys = list(dict.fromkeys(itertools.chain(give, take)))
+        self_before = [(card_id, print_type, self._get_qnty(card_id, print_type)) for card_id, print_type in keys]
+        other_before = [(card_id, print_type, other._get_qnty(card_id, print_type)) for card_id, print_type in keys]
+        self_after = [
+            (card_id, print_type, qnty - give.get((card_id, print_type), 0) + take.get((card_id, print_type), 0))
+            for card_id, print_type, qnty in self_before
+        ]
+        other_after = [
+            (card_id, print_type, qnty + give.get((card_id, print_type), 0) - take.get((card_id, print_type), 0))
+            for card_id, print_type, qnty in other_before
+        ]
+        try:
+            self._set_cards(self_after)
+            other._set_cards(other_after)
+        except BaseException:
+            self._set_cards(self_before)
+            other._set_cards(other_before)
+            raise
+        try:
+            other._commit()
+        except BaseException:
+            self._set_cards(self_before)
+            other._set_cards(other_before)
+            raise
+        try:
+            self._commit()
+        except BaseException:
+            self._set_cards(self_before)
+            other._set_cards(other_before)
+            other._commit()
+            raise
         return TRADE_SUCCESS
 
+    def trade_summary(self, give, take):
+        """
+        Description:
+            values both sides of a trade at market price, prices are requested once per card and cached
+        Parameters:
+            :param give: an iterable of tuple card_id, print_type and qnty that this user gives
+            :param take: an iterable of tuple card_id, print_type and qnty that this user gets
+            :return: dictionary of the value given, the value taken, the difference (positive when the trade is in
+            favor of this user), and a list of tuple card_id, print_type and reason for the cards without a price,
+            which are left out of the values
+        """
+        summary = {"missing": []}
+        for side, rows in (("give", give), ("take", take)):
+            rows = sorted((card_id, print_type, qnty) for (card_id, print_type), qnty in self._aggregate_rows(rows).items())
+            summary[side] = round(sum(
+                price for _, _, _, price in self.log_with_prices(rows, summary["missing"]) if price is not None
+            ), 2)
+        summary["difference"] = round(summary["take"] - summary["give"], 2)
+        return summary
+
     def add_energy_card(self, energy_type: str, print_type: str, qnty: int):
         """
         Description:
@@ -607,10 +1662,8 @@ class DbHandleBase:
         """
         if not self.rq.validate_basic_energy(energy_type):
             return False
-        qnty = self.get_energy_card(energy_type, print_type) + qnty
-        self.logdict["energy"].update({energy_type: {}})
-        self.logdict["energy"][energy_type].update({print_type: qnty})
-        self.save()
+        self._set_energy(energy_type, print_type, self.get_energy_card(energy_type, print_type) + qnty)
+        self._commit()
         return True
 
     def remove_energy_card(self, energy_type: str, print_type: str, qnty: int):
@@ -629,12 +1682,8 @@ class DbHandleBase:
             return False
         if print_type not in self.logdict["energy"][energy_type]:
             return False
-        qnty = self.get_energy_card(energy_type, print_type) - qnty
-        qnty = max(qnty, 0)
-        if qnty == 0:
-            _ = self.logdict["energy"][energy_type].pop(print_type)
-        self.logdict["energy"][energy_type][print_type] = qnty
-        self.save()
+        self._set_energy(energy_type, print_type, self.get_energy_card(energy_type, print_type) - qnty)
+        self._commit()
         return True
 
     def delete_energy_card(self, energy_type: str, print_type: str):
@@ -652,10 +1701,97 @@ class DbHandleBase:
             return False
         if print_type not in self.logdict["energy"][energy_type]:
             return False
-        _ = self.logdict["energy"][energy_type].pop(print_type)
-        self.save()
+        self._set_energy(energy_type, print_type, 0)
+        self._commit()
         return True
 
+    def add_energy_cards(self, rows):
+        """
+        Description:
+            Adds many energy cards with one save, rows of the same energy card are added up
+        Parameters:
+            :param rows: an iterable of tuple energy_type, print_type and qnty
+            :return: list of bool based on if each row was valid and added
+        """
+        results, totals = self._check_rows(rows, energy=True)
+        for (energy_type, print_type), qnty in totals.items():
+            self._set_energy(energy_type, print_type, self._get_energy_qnty(energy_type, print_type) + qnty)
+        if totals:
+            self._commit()
+        return results
+
+    def remove_energy_cards(self, rows):
+        """
+        Description:
+            Removes many energy cards with one save, energy cards that reach 0 are removed
+        Parameters:
+            :param rows: an iterable of tuple energy_type, print_type and qnty
+            :return: list of bool based on if each row was valid and its energy card was in the log
+        """
+        results, totals = self._check_rows(rows, energy=True, owned=True)
+        for (energy_type, print_type), qnty in totals.items():
+            self._set_energy(energy_type, print_type, self._get_energy_qnty(energy_type, print_type) - qnty)
+        if totals:
+            self._commit()
+        return results
+
+    def set_energy_quantities(self, quantities: dict):
+        """
+        Description:
+            sets the counts of many energy cards with one save, a count of 0 removes the energy card
+        Parameters:
+            :param quantities: dictionary of tuple energy_type and print_type to the new count
+            :return: dictionary of tuple energy_type and print_type to a bool based on if it was valid and set
+        """
+        results = {}
+        for (energy_type, print_type), qnty in dict(quantities).items():
+            valid = self.rq.validate_basic_energy(energy_type) and isinstance(qnty, int) and qnty >= 0
+            results[energy_type, print_type] = valid
+            if valid:
+                self._set_energy(energy_type, print_type, qnty)
+        if any(results.values()):
+            self._commit()
+        return results
+
+    def _get_energy_qnty(self, energy_type: str, print_type: str):
+        """
+        Description:
+            gets the count of an energy card without validating the energy type
+        Parameters:
+            :param energy_type: the energy card id of the card
+            :param print_type: the print type of the energy card
+            :return: the count of the energy card
+        """
+        return self.get_energy_card(energy_type, print_type) or 0
+
+    def _set_energy(self, energy_type: str, print_type: str, qnty: int):
+        """
+        Description:
+            sets the count of an energy card and updates the running totals, removing it if the count is not above 0
+        Parameters:
+            :param energy_type: the energy card id of the card
+            :param print_type: the print type of the energy card
+            :param qnty: the new count of the card
+            :return: None
+        """
+        print_types = self.logdict["energy"].setdefault(energy_type, {})
+        old_qnty = print_types.pop(print_type, 0)
+        self._journal_change("energy", energy_type, print_type, max(qnty, 0) - old_qnty)
+        if old_qnty:
+            self._energy_entries -= 1
+        if qnty > 0:
+            print_types[print_type] = qnty
+            self._energy_entries += 1
+        else:
+            qnty = 0
+            if not print_types:
+                del self.logdict["energy"][energy_type]
+        total = self._energy_totals.get(energy_type, 0) + qnty - old_qnty
+        if total:
+            self._energy_totals[energy_type] = total
+        else:
+            self._energy_totals.pop(energy_type, None)
+
     def get_energy_card(self, energy_type: str, print_type: str):
         """
         Description:
@@ -686,7 +1822,7 @@ class DbHandleBase:
 
     @property
     def energy_log_size(self):
-        return sum(q for _, _, q in self.get_energy_log())
+        return sum(self._energy_totals.values())
 
     def __len__(self):
         return self.energy_log_size + self.reg_log_size
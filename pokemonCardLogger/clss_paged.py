@@ -0,0 +1,69 @@
+"""
+Description:
+    The alternate library version of Pokémon Card Logger using a memory mapped page file
+    Opening a log only decrypts its index, the cards of a set are decrypted the first time one of them is used, so
+    opening a very large log and looking up a card is quick and memory use follows what is used
+Usage:
+    from pokemonCardLogger import clss_paged as pcp
+"""
+from clss_base import *
+from pagedlog import PagedCardLog
+from delayedKeyInt import DelayedKeyboardInterrupt
+
+
+class DbHandle(DbHandleBase):
+    """
+    Description:
+        stores and organizes the log data in a memory mapped page file
+    """
+    LOG_CLASS = PagedCardLog
+
+    def save(self):
+        """
+        Description:
+            saves the log to a file, only the sets that were changed are encrypted again
+        Parameters:
+            :return: None
+        """
+        with DelayedKeyboardInterrupt():
+            if self.logfile == ":memory:":
+                return None
+            logdict = dict(self.logdict)
+            card_log = logdict.pop("log")
+            card_log.write(self.logfile, Fernet(self.key), logdict)
+
+    def read(self):
+        """
+        Description:
+            opens the page file and reads its index, the cards are read when they are used
+        Parameters:
+            :return: dictionary consisting of the log data
+        """
+        with DelayedKeyboardInterrupt():
+            card_log, ld = self.LOG_CLASS.open(self.logfile, Fernet(self.key))
+            ld["log"] = card_log
+            return ld
+
+    def close(self):
+        """
+        Description:
+            cleanly closes the log
+        Parameters:
+            :return: None
+        """
+        self.sync()
+        self.logdict["log"].close()
+
+
+if __name__ == "__main__":
+    print("this is for testing purposes")
+    try:
+        import config
+    except ImportError:
+        print("no api key found quitting.")
+        quit()
+    _file = ":memory:"
+    _psswrd = "default"
+    _rq = RqHandle(config.API_KEY)
+    db = DbHandle(_file, _psswrd, _rq)
+    print(db.__repr__())
@@ -1,11 +1,14 @@
 """
 Description:
-    The alternate library version of Pokémon Card Logger using sqlite
+    The alternate library version of Pokémon Card Logger using a single encrypted file
+    The log is stored in the binary format of logformat, compressed before it is encrypted. Logs that were stored with
+    pickle by older versions are still read, and are stored in the new format the next time they are saved
     FYI this module is pre alpha and experimental
 Usage:
     from pokemonCardLogger import clss_pickle as pcl
 """
 import pickle
+import logformat
 from clss_base import *
 from delayedKeyInt import DelayedKeyboardInterrupt
 import backup
@@ -14,8 +17,9 @@ import backup
 class DbHandle(DbHandleBase):
     """
     Description:
-        stores and organizes the log data in a pickle file
+        stores and organizes the log data in an encrypted log format file
     """
+    COMPRESSION = logformat.DEFAULT_COMPRESSION
 
     def save(self):
         """
@@ -25,33 +29,30 @@ class DbHandle(DbHandleBase):
             :return: None
         """
         with DelayedKeyboardInterrupt():
-            for i in [card for card, qnty in self.logdict["log"].items() if qnty == 0]:
-                _ = self.logdict["log"].pop(i)
             if self.logfile == ":memory:":
                 return None
-            with open(self.logfile, "wb") as f:
-                pickle.dump(self.logdict, f)
-            self.encrypt()
+            temp_file = f"{self.logfile}.tmp"
+            with open(temp_file, "wb") as f:
+                f.write(Fernet(self.key).encrypt(logformat.dumps(self.logdict, self.COMPRESSION)))
+            os.replace(temp_file, self.logfile)
 
     def read(self):
         """
         Description:
-            reads the data from pickle and returns the log dictionary
+            reads the data from the log file and returns the log dictionary, logs stored with pickle are still read
         Parameters:
             :return: dictionary consisting of the log data
         """
         with DelayedKeyboardInterrupt():
-            self.decrypt()
             if self.logfile == ":memory:":
                 return None
             with open(self.logfile, "rb") as f:
-                try:
-                    ld = pickle.load(f)
-                except pickle.PickleError:
-                    if self.has_encryption:
-                        self.encrypt()
-                        raise PermissionError
-                    raise pickle.PickleError
+                contents = Fernet(self.key).decrypt(f.read())
+            if logformat.is_log_format(contents):
+                return logformat.loads(contents)
+            ld = pickle.loads(contents)
+            del contents
+            ld["log"] = CardLog.from_dict(ld["log"])
             return ld
 
 
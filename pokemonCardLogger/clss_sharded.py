@@ -0,0 +1,52 @@
+"""
+Description:
+    The alternate library version of Pokémon Card Logger using a folder of encrypted shard files
+    Each set of the log is its own encrypted shard and a manifest holds the index and totals, so saving after a change
+    only writes the shards of the changed sets and the manifest instead of the whole log
+Usage:
+    from pokemonCardLogger import clss_sharded as pcsh
+"""
+from clss_base import *
+from clss_paged import DbHandle as PagedDbHandle
+from pagedlog import ShardedCardLog, MANIFEST
+
+
+class DbHandle(PagedDbHandle):
+    """
+    Description:
+        stores and organizes the log data in a folder of shard files, the log file path is the path of the folder
+    """
+    LOG_CLASS = ShardedCardLog
+
+    def _stamp_file(self):
+        """
+        Description:
+            gets the file that is replaced every time the log is saved
+        Parameters:
+            :return: the path to the manifest of the log folder
+        """
+        return os.path.join(self.logfile, MANIFEST)
+
+    def load_all(self, workers: int = None):
+        """
+        Description:
+            reads every shard of the log now instead of when it is first used, reading the shards in parallel
+        Parameters:
+            :param workers: the number of threads to use
+            :return: the number of shards that were read
+        """
+        return self.logdict["log"].load_all(workers)
+
+
+if __name__ == "__main__":
+    print("this is for testing purposes")
+    try:
+        import config
+    except ImportError:
+        print("no api key found quitting.")
+        quit()
+    _file = ":memory:"
+    _psswrd = "default"
+    _rq = RqHandle(config.API_KEY)
+    db = DbHandle(_file, _psswrd, _rq)
+    print(db.__repr__())
@@ -0,0 +1,1001 @@
+"""
+Description:
+    The alternate library version of Pokémon Card Logger using sqlite
+    The log is kept in indexed tables of an in memory database, so lookups and running totals do not go over the whole
+    collection
+    On disk the log is a sqlite database in WAL mode of encrypted pages, one page per set of the card log, one for the
+    energy log and one for the login history, each page is found by a keyed hash of its name so neither the set ids
+    nor the cards are stored in the clear. A save only encrypts and writes the pages of the sets that changed in one
+    transaction, so a single edit does not rewrite the log. Opening the log decrypts every page
+    Saves take the log lock like the other backends, and when another process saved the log since it was read, the
+    changes of this process are applied again on top of the pages on disk
+    Files of older versions, a database encrypted as a whole, are moved to pages when they are opened, and files left
+    decrypted are refused until they are moved with encrypt_plaintext()
+Usage:
+    from pokemonCardLogger import clss_sqlite as pcs
+"""
+import hmac
+import json
+import tempfile
+import itertools
+import sqlite3
+from cryptography.fernet import InvalidToken
+import logformat
+from clss_base import *
+from cardlog import split_card_id
+from delayedKeyInt import DelayedKeyboardInterrupt
+
+SQLITE_HEADER = b"SQLite format 3\x00"
+MIGRATE_BATCH_SIZE = 10000
+PAGE_ID_SIZE = 16
+PAGES_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS pages (
+    page BLOB PRIMARY KEY,
+    data BLOB NOT NULL
+) WITHOUT ROWID;
+"""
+PAGE_CARDS = "cards"
+PAGE_ENERGY = "energy"
+PAGE_LOGINS = "logins"
+
+TABLE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS cards (
+    card_id TEXT NOT NULL,
+    print_type TEXT NOT NULL,
+    set_id TEXT NOT NULL,
+    qnty INTEGER NOT NULL,
+    PRIMARY KEY (card_id, print_type)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS energy (
+    energy_type TEXT NOT NULL,
+    print_type TEXT NOT NULL,
+    qnty INTEGER NOT NULL,
+    PRIMARY KEY (energy_type, print_type)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS logins (
+    login_time INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS totals (
+    kind TEXT NOT NULL,
+    key TEXT NOT NULL,
+    qnty INTEGER NOT NULL,
+    entries INTEGER NOT NULL,
+    PRIMARY KEY (kind, key)
+) WITHOUT ROWID;
+"""
+INDEX_SCHEMA = """
+CREATE INDEX IF NOT EXISTS cards_set_id ON cards (set_id);
+CREATE INDEX IF NOT EXISTS logins_login_time ON logins (login_time);
+CREATE TRIGGER IF NOT EXISTS cards_insert AFTER INSERT ON cards BEGIN
+    INSERT INTO totals (kind, key, qnty, entries) VALUES ('print_type', NEW.print_type, NEW.qnty, 1)
+    ON CONFLICT (kind, key) DO UPDATE SET qnty = qnty + excluded.qnty, entries = entries + 1;
+END;
+CREATE TRIGGER IF NOT EXISTS cards_update AFTER UPDATE OF qnty ON cards BEGIN
+    UPDATE totals SET qnty = qnty + NEW.qnty - OLD.qnty WHERE kind = 'print_type' AND key = NEW.print_type;
+END;
+CREATE TRIGGER IF NOT EXISTS cards_delete AFTER DELETE ON cards BEGIN
+    UPDATE totals SET qnty = qnty - OLD.qnty, entries = entries - 1 WHERE kind = 'print_type' AND key = OLD.print_type;
+END;
+CREATE TRIGGER IF NOT EXISTS energy_insert AFTER INSERT ON energy BEGIN
+    INSERT INTO totals (kind, key, qnty, entries) VALUES ('energy_type', NEW.energy_type, NEW.qnty, 1)
+    ON CONFLICT (kind, key) DO UPDATE SET qnty = qnty + excluded.qnty, entries = entries + 1;
+END;
+CREATE TRIGGER IF NOT EXISTS energy_update AFTER UPDATE OF qnty ON energy BEGIN
+    UPDATE totals SET qnty = qnty + NEW.qnty - OLD.qnty WHERE kind = 'energy_type' AND key = NEW.energy_type;
+END;
+CREATE TRIGGER IF NOT EXISTS energy_delete AFTER DELETE ON energy BEGIN
+    UPDATE totals SET qnty = qnty - OLD.qnty, entries = entries - 1
+    WHERE kind = 'energy_type' AND key = OLD.energy_type;
+END;
+"""
+SCHEMA = TABLE_SCHEMA + INDEX_SCHEMA
+
+REBUILD_TOTALS = """
+DELETE FROM totals;
+INSERT INTO totals (kind, key, qnty, entries)
+    SELECT 'print_type', print_type, SUM(qnty), COUNT(*) FROM cards GROUP BY print_type;
+INSERT INTO totals (kind, key, qnty, entries)
+    SELECT 'energy_type', energy_type, SUM(qnty), COUNT(*) FROM energy GROUP BY energy_type;
+"""
+
+SQL_GET_CARD = "SELECT qnty FROM cards WHERE card_id = ? AND print_type = ?"
+SQL_ADD_CARD = """
+INSERT INTO cards (card_id, print_type, set_id, qnty) VALUES (?, ?, ?, ?)
+ON CONFLICT (card_id, print_type) DO UPDATE SET qnty = qnty + excluded.qnty
+"""
+SQL_SET_CARD = """
+INSERT INTO cards (card_id, print_type, set_id, qnty) VALUES (?, ?, ?, ?)
+ON CONFLICT (card_id, print_type) DO UPDATE SET qnty = excluded.qnty
+"""
+SQL_DELETE_CARD = "DELETE FROM cards WHERE card_id = ? AND print_type = ?"
+SQL_GET_LOG = "SELECT card_id, print_type, qnty FROM cards"
+SQL_GET_BY_ID = "SELECT print_type, qnty FROM cards WHERE card_id = ?"
+SQL_LOG_SIZE = "SELECT COALESCE(SUM(qnty), 0) FROM totals WHERE kind = 'print_type'"
+SQL_GET_CARD_IDS = "SELECT DISTINCT card_id FROM cards"
+SQL_GET_SET_CARD_IDS = "SELECT DISTINCT card_id FROM cards WHERE set_id = ?"
+SQL_GET_SET_IDS = "SELECT DISTINCT set_id FROM cards"
+SQL_GET_ENERGY = "SELECT qnty FROM energy WHERE energy_type = ? AND print_type = ?"
+SQL_SET_ENERGY = """
+INSERT INTO energy (energy_type, print_type, qnty) VALUES (?, ?, ?)
+ON CONFLICT (energy_type, print_type) DO UPDATE SET qnty = excluded.qnty
+"""
+SQL_ADD_ENERGY = """
+INSERT INTO energy (energy_type, print_type, qnty) VALUES (?, ?, ?)
+ON CONFLICT (energy_type, print_type) DO UPDATE SET qnty = qnty + excluded.qnty
+"""
+SQL_DELETE_EMPTY = "DELETE FROM cards WHERE qnty <= 0; DELETE FROM energy WHERE qnty <= 0;"
+SQL_DELETE_ENERGY = "DELETE FROM energy WHERE energy_type = ? AND print_type = ?"
+SQL_GET_ENERGY_LOG = "SELECT energy_type, print_type, qnty FROM energy"
+SQL_ENERGY_SIZE = "SELECT COALESCE(SUM(qnty), 0) FROM totals WHERE kind = 'energy_type'"
+SQL_GET_TOTALS = "SELECT kind, key, qnty, entries FROM totals WHERE entries > 0"
+SQL_COUNT_TOTALS = """
+SELECT 'print_type', print_type, SUM(qnty), COUNT(*) FROM cards GROUP BY print_type
+UNION ALL
+SELECT 'energy_type', energy_type, SUM(qnty), COUNT(*) FROM energy GROUP BY energy_type
+"""
+SQL_COUNT_EMPTY = "SELECT (SELECT COUNT(*) FROM cards WHERE qnty <= 0) + (SELECT COUNT(*) FROM energy WHERE qnty <= 0)"
+SQL_ADD_LOGIN = "INSERT INTO logins (login_time) VALUES (?)"
+SQL_TRIM_LOGINS = """
+DELETE FROM logins WHERE rowid IN (SELECT rowid FROM logins ORDER BY login_time DESC, rowid DESC LIMIT -1 OFFSET ?)
+"""
+SQL_LIST_LOGIN = "SELECT login_time FROM logins ORDER BY login_time"
+SQL_LOGINS_BETWEEN = "SELECT login_time FROM logins WHERE login_time BETWEEN ? AND ? ORDER BY login_time"
+
+SQL_GET_PAGE_CARDS = "SELECT card_id, print_type, qnty FROM cards WHERE set_id = ?"
+SQL_PUT_PAGE = "INSERT OR REPLACE INTO pages (page, data) VALUES (?, ?)"
+SQL_DELETE_PAGE = "DELETE FROM pages WHERE page = ?"
+SQL_GET_GENERATION = "SELECT value FROM meta WHERE key = 'generation'"
+SQL_BUMP_GENERATION = "UPDATE meta SET value = value + 1 WHERE key = 'generation'"
+
+
+def get_set_id(card_id: str):
+    """
+    Description:
+        gets the set id out of a card id
+    Parameters:
+        :param card_id: the id of the card according to pokemonTcgApi
+        :return: the id of the set the card belongs to
+    """
+    return split_card_id(card_id)[0]
+
+
+def connect_memory():
+    """
+    Description:
+        opens an in memory database with the tables of the log
+    Parameters:
+        :return: the connection
+    """
+    conn = sqlite3.connect(":memory:")
+    conn.executescript(SCHEMA)
+    conn.commit()
+    return conn
+
+
+def page_id(key: bytes, kind: str, name: str = ""):
+    """
+    Description:
+        gets the id a page is stored under, a keyed hash of its name so the name is not stored in the clear
+    Parameters:
+        :param key: the key of the log
+        :param kind: PAGE_CARDS, PAGE_ENERGY or PAGE_LOGINS
+        :param name: the set id of a PAGE_CARDS page
+        :return: bytes of the page id
+    """
+    return hmac.new(key, f"{kind}\x00{name}".encode("utf-8"), hashlib.sha256).digest()[:PAGE_ID_SIZE]
+
+
+def page_rows(conn: sqlite3.Connection, kind: str, name: str = ""):
+    """
+    Description:
+        gets the rows of a page out of the in memory database
+    Parameters:
+        :param conn: the in memory database
+        :param kind: PAGE_CARDS, PAGE_ENERGY or PAGE_LOGINS
+        :param name: the set id of a PAGE_CARDS page
+        :return: list of the rows of the page
+    """
+    if kind == PAGE_CARDS:
+        return conn.execute(SQL_GET_PAGE_CARDS, (name, )).fetchall()
+    if kind == PAGE_ENERGY:
+        return conn.execute(SQL_GET_ENERGY_LOG).fetchall()
+    return [login_time for login_time, in conn.execute(SQL_LIST_LOGIN)]
+
+
+def all_pages(conn: sqlite3.Connection):
+    """
+    Description:
+        the names of every page of the in memory database
+    Parameters:
+        :param conn: the in memory database
+        :return: list of tuple kind and name of the pages
+    """
+    pages = [(PAGE_CARDS, set_id) for set_id, in conn.execute(SQL_GET_SET_IDS)]
+    return pages + [(PAGE_ENERGY, ""), (PAGE_LOGINS, "")]
+
+
+def write_pages(disk: sqlite3.Connection, key: bytes, conn: sqlite3.Connection, pages):
+    """
+    Description:
+        encrypts pages of the in memory database and writes them to the database on disk, an empty page is deleted
+        the caller commits the transaction
+    Parameters:
+        :param disk: the database on disk
+        :param key: the key of the log
+        :param conn: the in memory database
+        :param pages: an iterable of tuple kind and name of the pages to write
+        :return: None
+    """
+    fernet = Fernet(key)
+    for kind, name in pages:
+        rows = page_rows(conn, kind, name)
+        if rows:
+            data = fernet.encrypt(json.dumps([kind, name, rows], separators=(",", ":")).encode("utf-8"))
+            disk.execute(SQL_PUT_PAGE, (page_id(key, kind, name), data))
+        else:
+            disk.execute(SQL_DELETE_PAGE, (page_id(key, kind, name), ))
+
+
+def read_pages(disk: sqlite3.Connection, key: bytes):
+    """
+    Description:
+        decrypts every page of the database on disk into a new in memory database, the indexes and the running totals
+        are built once every row is in
+        raises InvalidToken if the key is not the key of the log
+    Parameters:
+        :param disk: the database on disk
+        :param key: the key of the log
+        :return: the in memory database
+    """
+    fernet = Fernet(key)
+    row = disk.execute("SELECT value FROM meta WHERE key = 'check'").fetchone()
+    if row is None or fernet.decrypt(row[0]) != hashlib.sha512(key).hexdigest().encode("utf-8"):
+        raise InvalidToken
+    conn = sqlite3.connect(":memory:")
+    conn.executescript(TABLE_SCHEMA)
+    for data, in disk.execute("SELECT data FROM pages"):
+        kind, name, rows = json.loads(fernet.decrypt(data))
+        if kind == PAGE_CARDS:
+            conn.executemany(
+                "INSERT INTO cards (card_id, print_type, set_id, qnty) VALUES (?, ?, ?, ?)",
+                ((card_id, print_type, name, qnty) for card_id, print_type, qnty in rows)
+            )
+        elif kind == PAGE_ENERGY:
+            conn.executemany("INSERT INTO energy (energy_type, print_type, qnty) VALUES (?, ?, ?)", rows)
+        else:
+            conn.executemany(SQL_ADD_LOGIN, ((login_time, ) for login_time in rows))
+    conn.executescript(f"BEGIN;{REBUILD_TOTALS}{INDEX_SCHEMA}COMMIT;")
+    return conn
+
+
+def connect_disk(file: str):
+    """
+    Description:
+        opens the database on disk in WAL mode, transactions are started and committed by the caller
+    Parameters:
+        :param file: the path to the database file
+        :return: the connection
+    """
+    disk = sqlite3.connect(file, isolation_level=None)
+    disk.execute("PRAGMA journal_mode = WAL")
+    disk.execute("PRAGMA synchronous = NORMAL")
+    disk.executescript(PAGES_SCHEMA)
+    return disk
+
+
+def write_database(file: str, key: bytes, conn: sqlite3.Connection):
+    """
+    Description:
+        writes every page of an in memory database into a new database file, replacing the file
+    Parameters:
+        :param file: the path to the database file
+        :param key: the key of the log
+        :param conn: the in memory database
+        :return: None
+    """
+    temp_file = f"{file}.tmp"
+    if os.path.exists(temp_file):
+        os.remove(temp_file)
+    disk = sqlite3.connect(temp_file, isolation_level=None)
+    try:
+        disk.executescript(PAGES_SCHEMA)
+        disk.execute("BEGIN")
+        disk.execute(
+            "INSERT INTO meta (key, value) VALUES ('check', ?)",
+            (Fernet(key).encrypt(hashlib.sha512(key).hexdigest().encode("utf-8")), )
+        )
+        disk.execute("INSERT INTO meta (key, value) VALUES ('generation', 0)")
+        write_pages(disk, key, conn, all_pages(conn))
+        disk.execute("COMMIT")
+    finally:
+        disk.close()
+    for extra_file in (f"{file}-wal", f"{file}-shm"):
+        if os.path.exists(extra_file):
+            os.remove(extra_file)
+    os.replace(temp_file, file)
+
+
+def _is_paged(file: str):
+    """
+    Description:
+        checks if a sqlite file is a database of encrypted pages, and not a database an older version left decrypted
+    Parameters:
+        :param file: the path to the database file
+        :return: bool based on if the file holds encrypted pages
+    """
+    conn = sqlite3.connect(file)
+    try:
+        return conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'pages'").fetchone() is not None
+    finally:
+        conn.close()
+
+
+def _upgrade_legacy(conn: sqlite3.Connection):
+    """
+    Description:
+        brings an in memory copy of a database of an older version up to the current tables, moving the login times
+        of the oldest versions into the logins table
+    Parameters:
+        :param conn: the in memory database
+        :return: None
+    """
+    conn.executescript(SCHEMA)
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'login_times'").fetchone() is not None:
+        conn.executemany(
+            SQL_ADD_LOGIN,
+            (
+                (int(dt.datetime.fromisoformat(login_time).timestamp()), )
+                for login_time, in conn.execute("SELECT login_time FROM login_times").fetchall()
+            )
+        )
+        conn.execute("DROP TABLE login_times")
+    conn.executescript(f"BEGIN;{REBUILD_TOTALS}COMMIT;")
+
+
+def encrypt_plaintext(file: str, psswrd: str):
+    """
+    Description:
+        encrypts a database file that an older version left decrypted on disk into pages, so it can be opened again
+        raises InvalidToken if the password is not the password of the database
+    Parameters:
+        :param file: the path to the database file
+        :param psswrd: the password for the database
+        :return: bool based on if the file was decrypted and is now encrypted
+    """
+    with open(file, "rb") as f:
+        if f.read(len(SQLITE_HEADER)) != SQLITE_HEADER:
+            return False
+    if _is_paged(file):
+        return False
+    key = derive_key(psswrd)
+    plaintext = sqlite3.connect(file)
+    try:
+        row = plaintext.execute("SELECT value FROM meta WHERE key = 'key_hash'").fetchone()
+        if row is None or row[0] != hashlib.sha512(key).hexdigest():
+            raise InvalidToken
+        conn = connect_memory()
+        plaintext.backup(conn)
+    finally:
+        plaintext.close()
+    _upgrade_legacy(conn)
+    write_database(file, key, conn)
+    conn.close()
+    return True
+
+
+class DbHandle(DbHandleBase):
+    """
+    Description:
+        stores and organizes the log data in a sqlite database
+    """
+
+    def first_run(self):
+        """
+        Description:
+            Sets up the database if it was freshly created
+        Parameters:
+            :return: None
+        """
+        self.conn = connect_memory()
+        self.logdict = {}
+        if self.logfile == ":memory:":
+            self.disk = None
+            return
+        write_database(self.logfile, self.key, self.conn)
+        self.disk = connect_disk(self.logfile)
+
+    def _read_database(self):
+        """
+        Description:
+            decrypts every page of the database on disk into a new in memory database, in one read transaction
+            raises InvalidToken if the password is wrong
+        Parameters:
+            :return: the in memory database
+        """
+        self.disk.execute("BEGIN")
+        try:
+            return read_pages(self.disk, self.key)
+        finally:
+            self.disk.execute("COMMIT")
+
+    def _read_legacy(self):
+        """
+        Description:
+            moves a database an older version encrypted as a whole to pages, it is decrypted into a private temporary
+            file that is removed right after it is read
+            raises InvalidToken if the password is wrong
+        Parameters:
+            :return: None
+        """
+        with open(self.logfile, "rb") as f:
+            contents = Fernet(self.key).decrypt(f.read())
+        handle, temp_file = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(self.logfile)))
+        try:
+            with os.fdopen(handle, "wb") as f:
+                f.write(contents)
+            del contents
+            legacy = sqlite3.connect(temp_file)
+            conn = sqlite3.connect(":memory:")
+            try:
+                legacy.backup(conn)
+            finally:
+                legacy.close()
+        finally:
+            for extra_file in (temp_file, f"{temp_file}-wal", f"{temp_file}-shm"):
+                if os.path.exists(extra_file):
+                    os.remove(extra_file)
+        row = conn.execute("SELECT value FROM meta WHERE key = 'key_hash'").fetchone()
+        if row is None or row[0] != self.key_hash:
+            conn.close()
+            raise InvalidToken
+        _upgrade_legacy(conn)
+        write_database(self.logfile, self.key, conn)
+        conn.close()
+
+    def read(self):
+        """
+        Description:
+            decrypts the pages of the database file into an in memory database
+            raises InvalidToken if the password is wrong and PermissionError if the file is not encrypted
+        Parameters:
+            :return: an empty dictionary as the log data is kept in the database
+        """
+        with DelayedKeyboardInterrupt():
+            with open(self.logfile, "rb") as f:
+                header = f.read(len(SQLITE_HEADER))
+            if header != SQLITE_HEADER:
+                self._read_legacy()
+            elif not _is_paged(self.logfile):
+                raise PermissionError(
+                    f"{self.logfile} is not encrypted, encrypt it with clss_sqlite.encrypt_plaintext"
+                )
+            self.disk = connect_disk(self.logfile)
+            try:
+                self.conn = self._read_database()
+            except InvalidToken:
+                self.disk.close()
+                raise
+        return {}
+
+    def _file_signature(self):
+        """
+        Description:
+            gets the generation of the database on disk, which every save that wrote a page raises by one
+        Parameters:
+            :return: the generation, None for a log kept in memory only
+        """
+        if self.disk is None:
+            return None
+        return self.disk.execute(SQL_GET_GENERATION).fetchone()[0]
+
+    def _changed_pages(self):
+        """
+        Description:
+            the pages that hold the changes that were not saved yet
+        Parameters:
+            :return: set of tuple kind and name of the pages
+        """
+        pages = {
+            (PAGE_CARDS, get_set_id(card_id)) if log == "log" else (PAGE_ENERGY, "")
+            for log, card_id, _ in self._journal
+        }
+        if self._login_journal:
+            pages.add((PAGE_LOGINS, ""))
+        return pages
+
+    def save(self):
+        """
+        Description:
+            commits the pending changes, and encrypts and writes the pages they changed in one transaction
+        Parameters:
+            :return: None
+        """
+        with DelayedKeyboardInterrupt():
+            self.conn.commit()
+            if self.disk is None:
+                return None
+            pages = self._changed_pages()
+            if not pages:
+                return None
+            self.disk.execute("BEGIN IMMEDIATE")
+            try:
+                write_pages(self.disk, self.key, self.conn, pages)
+                self.disk.execute(SQL_BUMP_GENERATION)
+            except BaseException:
+                self.disk.execute("ROLLBACK")
+                raise
+            self.disk.execute("COMMIT")
+
+    def _merge_from_disk(self):
+        """
+        Description:
+            reads the database saved by another process and applies the changes and logins of this process that were
+            not saved yet on top of it
+        Parameters:
+            :return: True as the database on disk had changed
+        """
+        conn = self._read_database()
+        for (log, card_id, print_type), change in self._journal.items():
+            if log == "log":
+                conn.execute(SQL_ADD_CARD, (card_id, print_type, get_set_id(card_id), change))
+            else:
+                conn.execute(SQL_ADD_ENERGY, (card_id, print_type, change))
+        conn.executescript(f"BEGIN;{SQL_DELETE_EMPTY}COMMIT;")
+        existing = {login_time for login_time, in conn.execute(SQL_LIST_LOGIN)}
+        conn.executemany(SQL_ADD_LOGIN, ((login_time, ) for login_time in self._login_journal if login_time not in existing))
+        conn.execute(SQL_TRIM_LOGINS, (LOGIN_HISTORY_MAX, ))
+        conn.commit()
+        self.conn.close()
+        self.conn = conn
+        self._load_totals()
+        return True
+
+    def sync(self):
+        """
+        Description:
+            saves the database while holding the log lock, applying the changes of this process on top of the database
+            first if another process saved it since it was read
+        Parameters:
+            :return: None
+        """
+        super().sync()
+        self._login_journal = []
+
+    def close(self):
+        """
+        Description:
+            saves and closes the database
+        Parameters:
+            :return: None
+        """
+        with DelayedKeyboardInterrupt():
+            self.sync()
+            self.conn.close()
+            if self.disk is not None:
+                self.disk.close()
+
+    def _open_logins(self):
+        """
+        Description:
+            the login history is kept in the database, the logins of this process that were not saved yet are kept
+            apart so they can be added to a database saved by another process
+        Parameters:
+            :return: None
+        """
+        self._login_journal = []
+        return None
+
+    def login_setup(self):
+        """
+        Description:
+            Logs the current login to the database, dropping the oldest logins once there are too many
+        Parameters:
+            :return: None
+        """
+        login_time = int(dt.datetime.now().timestamp())
+        self._login_journal.append(login_time)
+        self.conn.execute(SQL_ADD_LOGIN, (login_time, ))
+        self.conn.execute(SQL_TRIM_LOGINS, (LOGIN_HISTORY_MAX, ))
+        self._commit()
+
+    def _add_logins(self, times):
+        """
+        Description:
+            adds logins to the logins table with one statement, skipping logins that are already in it
+        Parameters:
+            :param times: an iterable of datetime of the logins
+            :return: the number of logins that were added
+        """
+        existing = {login_time for login_time, in self.conn.execute(SQL_LIST_LOGIN)}
+        times = {int(when.timestamp()) for when in times} - existing
+        self._login_journal.extend(times)
+        self.conn.executemany(SQL_ADD_LOGIN, ((login_time, ) for login_time in sorted(times)))
+        self.conn.execute(SQL_TRIM_LOGINS, (LOGIN_HISTORY_MAX, ))
+        self._commit()
+        return len(times)
+
+    def list_login(self):
+        """
+        Description:
+            a generator of all successful logins
+        Parameters:
+            :return: a generator of a tuple consisting of the datetime data (day, month, year, hour, minute, second)
+        """
+        for login_time, in self.conn.execute(SQL_LIST_LOGIN):
+            d = dt.datetime.fromtimestamp(login_time)
+            yield d.day, d.month, d.year, d.hour, d.minute, d.second
+
+    def get_logins_between(self, start: dt.datetime, end: dt.datetime):
+        """
+        Description:
+            a generator of the successful logins in a range of time
+        Parameters:
+            :param start: the start of the range
+            :param end: the end of the range, inclusive
+            :return: a generator of datetime of the logins
+        """
+        for login_time, in self.conn.execute(SQL_LOGINS_BETWEEN, (int(start.timestamp()), int(end.timestamp()))):
+            yield dt.datetime.fromtimestamp(login_time)
+
+    def _get_qnty(self, card_id: str, print_type: str):
+        """
+        Description:
+            gets the quantity of a card without validating the card id
+        Parameters:
+            :param card_id: the id of the card according to pokemonTcgApi
+            :param print_type: the print type of the card
+            :return: The quantity of the card
+        """
+        row = self.conn.execute(SQL_GET_CARD, (card_id, print_type)).fetchone()
+        return 0 if row is None else row[0]
+
+    def add_card(self, card_id: str, qnty: int, print_type: str):
+        """
+        Description:
+            Adds quantity to the card as well as adds a new card to the database
+        Parameters:
+            :param card_id: the id of the card according to pokemonTcgApi
+            :param qnty: the quantity of cards to add. if there is already quantity, it adds to that
+            :param print_type: the print type of the card
+            :return: bool based on if the operation was successful or not
+        """
+        if not self.test_card(card_id):
+            return False
+        old_qnty = self._get_qnty(card_id, print_type)
+        self._note_change(card_id, print_type, old_qnty, old_qnty + qnty)
+        self.conn.execute(SQL_ADD_CARD, (card_id, print_type, get_set_id(card_id), qnty))
+        self._commit()
+        return True
+
+    def remove_card(self, card_id: str, qnty: int, print_type: str):
+        """
+        Description:
+            Removes quantity from a card in the log
+        Parameters:
+            :param card_id: the id of the card according to pokemonTcgApi
+            :param qnty: the quantity of cards to remove. if there is already quantity, it subtracts from that
+            :param print_type: the print type of the card
+            :return: a bool based on if the operation was successful or not
+        """
+        if not self.test_card(card_id):
+            return False
+        current_qnty = self._get_qnty(card_id, print_type)
+        if not current_qnty:
+            return False
+        qnty = current_qnty - qnty
+        self._note_change(card_id, print_type, current_qnty, qnty)
+        if qnty > 0:
+            self.conn.execute(SQL_SET_CARD, (card_id, print_type, get_set_id(card_id), qnty))
+        else:
+            self.conn.execute(SQL_DELETE_CARD, (card_id, print_type))
+        self._commit()
+        return True
+
+    def delete_card(self, card_id: str, print_type: str):
+        """
+        Description:
+            Deletes a card from the log
+        Parameters:
+            :param card_id: the id of the card according to pokemonTcgApi
+            :param print_type: the print type of the card
+            :return: bool based on if the card was in the log
+        """
+        if not self.test_card(card_id):
+            return False
+        self._note_change(card_id, print_type, self._get_qnty(card_id, print_type), 0)
+        deleted = self.conn.execute(SQL_DELETE_CARD, (card_id, print_type)).rowcount
+        self._commit()
+        return bool(deleted)
+
+    def _set_cards(self, rows):
+        """
+        Description:
+            sets the quantities of many cards with one statement for the cards that are set and one for those removed
+        Parameters:
+            :param rows: an iterable of tuple card_id, print_type and qnty
+            :return: None
+        """
+        rows = self._note_set_cards(rows)
+        self.conn.executemany(
+            SQL_SET_CARD,
+            ((card_id, print_type, get_set_id(card_id), qnty) for card_id, print_type, qnty in rows if qnty > 0)
+        )
+        self.conn.executemany(
+            SQL_DELETE_CARD, ((card_id, print_type) for card_id, print_type, qnty in rows if qnty <= 0)
+        )
+
+    def get_card_qnty(self, card_id: str, print_type: str):
+        """
+        Description:
+            Gets and returns the quantity of a given card in the log
+        Parameters
+            :param card_id: the id of the card according to pokemonTcgApi
+            :param print_type: the print type of the card
+            :return: The quantity of the card
+        """
+        if not self.test_card(card_id):
+            return 0
+        return self._get_qnty(card_id, print_type)
+
+    def get_log(self):
+        """
+        Description:
+            A generator consisting of the log
+        Parameters:
+            :return: a generator of the rows in the log
+        """
+        yield from self.conn.execute(SQL_GET_LOG)
+
+    def _log_sets(self):
+        """
+        Description:
+            gets the card log grouped by set
+        Parameters:
+            :return: dictionary of set id to dictionary of "number.print_type" keys and quantity values
+        """
+        return set_dicts(self.conn.execute(SQL_GET_LOG))
+
+    def get_card_by_id_only(self, card_id: str):
+        """
+        Description:
+            gets all cards in collection that match card_id, and creates a generator for each entry where
+            print_type is the print type of the entry, and qnty is the quantity of the card
+        Parameters:
+            :param card_id: the id of the card according to pokemonTcgApi
+            :return: generator of tuple print_type and qnty
+        """
+        yield from self.conn.execute(SQL_GET_BY_ID, (card_id,))
+
+    @property
+    def reg_log_size(self):
+        return self.conn.execute(SQL_LOG_SIZE).fetchone()[0]
+
+    def get_card_ids(self):
+        """
+        Description:
+            a generator of every distinct card id in the log, regardless of print type
+        Parameters:
+            :return: generator of card ids
+        """
+        for card_id, in self.conn.execute(SQL_GET_CARD_IDS):
+            yield card_id
+
+    def get_set_ids(self):
+        """
+        Description:
+            a generator of the ids of every set that has a card in the log
+        Parameters:
+            :return: generator of set ids
+        """
+        for set_id, in self.conn.execute(SQL_GET_SET_IDS):
+            yield set_id
+
+    def get_set_numbers(self, set_id: str):
+        """
+        Description:
+            gets the collectors numbers of every card of a set that is in the log
+        Parameters:
+            :param set_id: the id of the set according to pokemonTcgApi
+            :return: set of the card numbers
+        """
+        return {split_card_id(card_id)[1] for card_id, in self.conn.execute(SQL_GET_SET_CARD_IDS, (set_id,))}
+
+    def check_log(self):
+        """
+        Description:
+            checks that the database, its indexes and its running totals are consistent, and that every entry has a
+            quantity
+            raises ValueError if they are not
+        Parameters:
+            :return: True if the database is consistent
+        """
+        result = self.conn.execute("PRAGMA integrity_check").fetchone()[0]
+        if result != "ok":
+            raise ValueError(result)
+        if self.conn.execute(SQL_COUNT_EMPTY).fetchone()[0]:
+            raise ValueError("entry without quantity")
+        if set(self.conn.execute(SQL_GET_TOTALS)) != set(self.conn.execute(SQL_COUNT_TOTALS)):
+            raise ValueError("running totals do not match the log")
+        return True
+
+    def _load_totals(self):
+        """
+        Description:
+            verifies the running totals after the database is opened, rebuilding them if they do not match
+            the collection value is valued again on its next read
+        Parameters:
+            :return: None
+        """
+        self._value = None
+        if set(self.conn.execute(SQL_GET_TOTALS)) != set(self.conn.execute(SQL_COUNT_TOTALS)):
+            self.conn.executescript(f"BEGIN;{REBUILD_TOTALS}COMMIT;")
+
+    def stats(self):
+        """
+        Description:
+            gets the running totals of the log, without going over the log
+        Parameters:
+            :return: dictionary of the card total, entry count, and totals per print type, and the same for the energy
+            log with totals per energy type
+        """
+        stats = {
+            "cards": 0, "entries": 0, "print_types": {}, "energy": 0, "energy_entries": 0, "energy_types": {}
+        }
+        for kind, key, qnty, entries in self.conn.execute(SQL_GET_TOTALS):
+            prefix = "" if kind == "print_type" else "energy_"
+            stats["energy" if prefix else "cards"] += qnty
+            stats[f"{prefix}entries"] += entries
+            stats[f"{kind}s"][key] = qnty
+        return stats
+
+    def add_energy_card(self, energy_type: str, print_type: str, qnty: int):
+        """
+        Description:
+            adds an energy card to the log
+        Parameters:
+            :param energy_type: the energy card id of the card
+            :param print_type: the print type of the energy card
+            :param qnty: the nuber of card you wish to add
+            :return: bool based on the successfulness of the process
+        """
+        if not self.rq.validate_basic_energy(energy_type):
+            return False
+        self._set_energy(energy_type, print_type, self.get_energy_card(energy_type, print_type) + qnty)
+        self._commit()
+        return True
+
+    def remove_energy_card(self, energy_type: str, print_type: str, qnty: int):
+        """
+        Description:
+            removes an energy card from the log
+        Parameters:
+            :param energy_type: the energy card id of the card
+            :param print_type: the print type of the energy card
+            :param qnty: the nuber of card you wish to remove
+            :return: bool based on the successfulness of the process
+        """
+        if not self.rq.validate_basic_energy(energy_type):
+            return False
+        current_qnty = self.get_energy_card(energy_type, print_type)
+        if not current_qnty:
+            return False
+        self._set_energy(energy_type, print_type, current_qnty - qnty)
+        self._commit()
+        return True
+
+    def delete_energy_card(self, energy_type: str, print_type: str):
+        """
+        Description:
+            deletes an energy card from the log of a given print type
+        Parameters:
+            :param energy_type: the energy card id of the card
+            :param print_type: the print type of the energy card
+            :return: bool based on the successfulness of the process
+        """
+        if not self.rq.validate_basic_energy(energy_type):
+            return False
+        deleted = bool(self.get_energy_card(energy_type, print_type))
+        self._set_energy(energy_type, print_type, 0)
+        self._commit()
+        return deleted
+
+    def _set_energy(self, energy_type: str, print_type: str, qnty: int):
+        """
+        Description:
+            sets the count of an energy card and notes the change in the journal, removing it if the count is not
+            above 0
+        Parameters:
+            :param energy_type: the energy card id of the card
+            :param print_type: the print type of the energy card
+            :param qnty: the new count of the card
+            :return: None
+        """
+        row = self.conn.execute(SQL_GET_ENERGY, (energy_type, print_type)).fetchone()
+        self._journal_change("energy", energy_type, print_type, max(qnty, 0) - (0 if row is None else row[0]))
+        if qnty > 0:
+            self.conn.execute(SQL_SET_ENERGY, (energy_type, print_type, qnty))
+        else:
+            self.conn.execute(SQL_DELETE_ENERGY, (energy_type, print_type))
+
+    def get_energy_card(self, energy_type: str, print_type: str):
+        """
+        Description:
+            returns the count of the given energy type
+        Parameters:
+            :param energy_type: the energy card id of the card
+            :param print_type: the print type of the energy card
+            :return: the count of the given card that is in the collection
+        """
+        if not self.rq.validate_basic_energy(energy_type):
+            return False
+        row = self.conn.execute(SQL_GET_ENERGY, (energy_type, print_type)).fetchone()
+        return 0 if row is None else row[0]
+
+    def get_energy_log(self):
+        """
+        Description:
+            returns a generator that gives the energy log
+        Parameters:
+            :return: returns a generator that yields a tuple consisting of a card id, print type and a count
+        """
+        yield from self.conn.execute(SQL_GET_ENERGY_LOG)
+
+    @property
+    def energy_log_size(self):
+        return self.conn.execute(SQL_ENERGY_SIZE).fetchone()[0]
+
+    def migrate_pickle(self, pickle_file: str):
+        """
+        Description:
+            copies the contents of an encrypted log made by clss_pickle into this database, replacing its cards and
+            energy cards
+            the old log must use the same password, rows are inserted in batches without validating them against
+            pokemonTcgApi, and the old file is left untouched
+        Parameters:
+            :param pickle_file: the path to the clss_pickle log file
+            :return: the number of card entries that were copied
+        """
+        with open(pickle_file, "rb") as f:
+            contents = Fernet(self.key).decrypt(f.read())
+        logdict, rows = logformat.stream_log(contents)
+        del contents
+        count = 0
+        with self.batch():
+            self._set_cards([(card_id, print_type, 0) for card_id, print_type, _ in self.get_log()])
+            for energy_type, print_type, _ in list(self.get_energy_log()):
+                self._set_energy(energy_type, print_type, 0)
+            while batch := list(itertools.islice(rows, MIGRATE_BATCH_SIZE)):
+                self._set_cards(batch)
+                count += len(batch)
+            for energy_type, print_types in logdict["energy"].items():
+                for print_type, qnty in print_types.items():
+                    self._set_energy(energy_type, print_type, qnty)
+            if "login_times" in logdict:
+                login_times = (dt.datetime.fromisoformat(i) for i in logdict["login_times"])
+            else:
+                login_times = LoginLog(f"{pickle_file}.logins", self.key)
+            self._add_logins(login_times)
+            self._commit()
+        self._value = None
+        return count
+
+if __name__ == "__main__":
+    print("this is for testing purposes")
+    try:
+        import config
+    except ImportError:
+        print("no api key found quitting.")
+        quit()
+    _file = ":memory:"
+    _psswrd = "default"
+    _rq = RqHandle(config.API_KEY)
+    db = DbHandle(_file, _psswrd, _rq)
+    print(db.__repr__())
@@ -0,0 +1,493 @@
+"""
+Description:
+    A long running daemon that keeps unlocked logs and the pokemonTcgApi cache in memory, and serves them to local
+    programs over a Unix socket, so a program does not have to derive the key and read the log every time it starts
+    Every connection logs in as a user first. Reads are answered from memory, and the writes of every connection that
+    arrive while a log is being saved are saved together in the next group commit, each write is answered once it was
+    saved
+Protocol:
+    every message is its length as "<I" followed by json, requests are [operation, arguments] and replies are
+    [True, result] or [False, error message]. The first request of a connection is ["login", [user, password]]
+Usage:
+    python3 daemon.py [backend]
+    from pokemonCardLogger.daemon import DaemonClient
+"""
+import sys
+import json
+import hmac
+import functools
+import contextlib
+import socket
+import struct
+import hashlib
+import importlib
+import queue
+import threading
+import socketserver
+import datetime as dt
+from collections.abc import Iterator
+from concurrent.futures import Future
+from cryptography.fernet import InvalidToken
+import clss_base
+from clss_base import *
+
+SOCKET_FILE = os.path.join(prog_data, "daemon.sock")
+FRAME = struct.Struct("<I")
+REQUEST_MAX = 1 << 24
+READ_OPERATIONS = (
+    "get_card_qnty", "get_log", "get_card_by_id_only", "get_card_ids", "get_set_ids", "get_set_numbers",
+    "get_set_completion", "get_all_set_completion", "get_energy_card", "get_energy_log", "list_login", "stats",
+    "log_checksum", "test_card", "reg_log_size", "energy_log_size", "collection_value", "collection_counts"
+)
+WRITE_OPERATIONS = (
+    "add_card", "remove_card", "delete_card", "add_energy_card", "remove_energy_card", "delete_energy_card",
+    "add_cards", "remove_cards", "add_energy_cards", "remove_energy_cards", "set_quantities", "merge",
+    "refresh_prices"
+)
+VALIDATED_OPERATIONS = ("add_card", "remove_card", "delete_card")
+
+
+def _to_json(value):
+    """
+    Description:
+        converts the results of the log that json does not know, generators were already made lists by the thread of
+        the daemon, as they read the log
+    Parameters:
+        :param value: the value json could not convert
+        :return: a value json can convert
+    """
+    if isinstance(value, (dt.datetime, dt.date)):
+        return value.isoformat()
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    raise TypeError(f"{type(value).__name__} can not be sent")
+
+
+def send_message(sock: socket.socket, message):
+    """
+    Description:
+        sends one message over a socket
+    Parameters:
+        :param sock: the connected socket
+        :param message: the json serializable message
+        :return: None
+    """
+    data = json.dumps(message, separators=(",", ":"), default=_to_json).encode("utf-8")
+    sock.sendall(FRAME.pack(len(data)) + data)
+
+
+def _receive_exactly(sock: socket.socket, length: int):
+    """
+    Description:
+        receives a number of bytes from a socket
+    Parameters:
+        :param sock: the connected socket
+        :param length: the number of bytes
+        :return: the bytes, or None if the connection was closed
+    """
+    data = bytearray()
+    while len(data) < length:
+        chunk = sock.recv(length - len(data))
+        if not chunk:
+            return None
+        data += chunk
+    return bytes(data)
+
+
+def receive_message(sock: socket.socket, max_length: int = None):
+    """
+    Description:
+        receives one message from a socket
+        raises ValueError if the message is too large
+    Parameters:
+        :param sock: the connected socket
+        :param max_length: the largest message length to accept, None for any length
+        :return: the message, or None if the connection was closed
+    """
+    header = _receive_exactly(sock, FRAME.size)
+    if header is None:
+        return None
+    length, = FRAME.unpack(header)
+    if max_length is not None and length > max_length:
+        raise ValueError("message is too large")
+    data = _receive_exactly(sock, length)
+    if data is None:
+        return None
+    return json.loads(data)
+
+
+class _OpenLog:
+    """
+    Description:
+        an unlocked log kept in memory by the daemon
+    """
+    __slots__ = ("db", "psswrd_hash")
+
+    def __init__(self, db: DbHandleBase, psswrd_hash: bytes):
+        """
+        Description:
+            Constructor method
+        Parameters:
+            :param db: the open log
+            :param psswrd_hash: the keyed hash of the password of the log
+        """
+        self.db = db
+        self.psswrd_hash = psswrd_hash
+
+
+class _Handler(socketserver.BaseRequestHandler):
+    """
+    Description:
+        serves one connection, the operations themselves are run by the thread of the daemon
+    """
+
+    def _login(self, user: str, psswrd: str):
+        """
+        Description:
+            logs in to the log of a user, the key is derived by the thread of the connection so the slow key
+            derivation never holds up the thread of the daemon
+        Parameters:
+            :param user: the name of the user
+            :param psswrd: the password of the user
+            :return: the open log of the user
+        """
+        daemon = self.server.daemon
+        key = None if user in daemon.logs else derive_key(psswrd)
+        return daemon.submit(None, "login", [user, psswrd, key]).result()
+
+    def _arguments(self, operation: str, args: list):
+        """
+        Description:
+            converts the arguments of the operations that take what json can not send, set_quantities takes rows of
+            card id, print type and quantity instead of a dictionary, and merge takes the user name and password of
+            the other log, optionally followed by the strategy, instead of the other log
+        Parameters:
+            :param operation: one of READ_OPERATIONS or WRITE_OPERATIONS
+            :param args: the arguments as they were received
+            :return: list of the arguments of the method of the log
+        """
+        if operation == "set_quantities":
+            return [{(card_id, print_type): qnty for card_id, print_type, qnty in args[0]}]
+        if operation == "merge":
+            user, psswrd, *strategy = args
+            return [self._login(user, psswrd).db, *strategy]
+        return args
+
+    def handle(self):
+        daemon = self.server.daemon
+        open_log = None
+        while True:
+            try:
+                request = receive_message(self.request, REQUEST_MAX)
+            except (ValueError, OSError):
+                return
+            if request is None:
+                return
+            try:
+                operation, args = request
+                if operation == "login":
+                    open_log = self._login(*args)
+                    result = None
+                elif open_log is None:
+                    raise ValueError("log in first")
+                elif operation in READ_OPERATIONS or operation in WRITE_OPERATIONS:
+                    if operation in VALIDATED_OPERATIONS and args:
+                        open_log.db.test_card(args[0])
+                    result = daemon.submit(open_log, operation, self._arguments(operation, args)).result()
+                    if operation == "set_quantities":
+                        result = [[card_id, print_type, ok] for (card_id, print_type), ok in result.items()]
+                else:
+                    raise ValueError(f"unknown operation {operation}")
+                reply = [True, result]
+            except Exception as e:
+                reply = [False, f"{type(e).__name__}: {e}"]
+            try:
+                send_message(self.request, reply)
+            except TypeError as e:
+                send_message(self.request, [False, str(e)])
+            except OSError:
+                return
+
+
+class _Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class LogDaemon:
+    """
+    Description:
+        serves the logs of a folder over a Unix socket, keeping every log that was logged in to open
+        connections are read by their own threads, but every operation is run by the thread that called
+        serve_forever, which has to be the main thread as saving a log delays keyboard interrupts. The operations
+        that are waiting are run together, and every log they changed is saved once before the writes are answered
+    """
+
+    def __init__(self, backend: str = "clss_pickle", folder: str = prog_data, socket_file: str = SOCKET_FILE):
+        """
+        Description:
+            Constructor method
+        Parameters:
+            :param backend: one of the keys of BACKEND_SUFFIXES, the storage option of the logs
+            :param folder: the folder of the logs
+            :param socket_file: the path of the socket
+        """
+        if backend not in BACKEND_SUFFIXES:
+            raise ValueError(f"unknown backend {backend}")
+        self.module = importlib.import_module(backend)
+        self.suffix = BACKEND_SUFFIXES[backend]
+        self.folder = folder
+        self.socket_file = socket_file
+        self.rq = RqHandle(clss_base.API_KEY)
+        self.logs = {}
+        self.jobs = queue.SimpleQueue()
+        self.server = None
+        self._secret = os.urandom(32)
+
+    def submit(self, open_log: (_OpenLog, None), operation: str, args: list):
+        """
+        Description:
+            queues an operation for the thread of the daemon
+        Parameters:
+            :param open_log: the open log to run the operation on, None for a login
+            :param operation: "login", or one of READ_OPERATIONS or WRITE_OPERATIONS
+            :param args: the arguments of the operation
+            :return: a Future of the result of the operation
+        """
+        future = Future()
+        self.jobs.put((future, open_log, operation, args))
+        return future
+
+    def _hash(self, psswrd: str):
+        """
+        Description:
+            hashes a password with a key that only exists in this process, so a user that is already open is checked
+            without deriving the key of the log again
+        Parameters:
+            :param psswrd: the password
+            :return: bytes of the hash
+        """
+        return hmac.new(self._secret, psswrd.encode("utf-8"), hashlib.sha256).digest()
+
+    def login(self, user: str, psswrd: str, key: bytes = None):
+        """
+        Description:
+            checks the password of a user and opens the log of the user if it is not open yet
+            raises ValueError if the user has no log or the password is wrong
+        Parameters:
+            :param user: the name of the user
+            :param psswrd: the password of the user
+            :param key: the key derived from the password, derived by the thread of the connection so the slow key
+            derivation never holds up the thread of the daemon, None to derive it here
+            :return: the open log of the user
+        """
+        if not user or os.path.basename(user) != user or user.startswith("."):
+            raise ValueError("invalid user name")
+        psswrd_hash = self._hash(psswrd)
+        open_log = self.logs.get(user)
+        if open_log is None:
+            logfile = os.path.join(self.folder, f"{user}{self.suffix}")
+            if not os.path.exists(logfile):
+                raise ValueError(f"the user {user} has no log")
+            try:
+                db = self.module.DbHandle(logfile, psswrd, self.rq, key=key)
+            except InvalidToken:
+                raise ValueError("wrong password") from None
+            open_log = self.logs[user] = _OpenLog(db, psswrd_hash)
+        if not hmac.compare_digest(open_log.psswrd_hash, psswrd_hash):
+            raise ValueError("wrong password")
+        return open_log
+
+    def _run_jobs(self, jobs: list):
+        """
+        Description:
+            runs a group of operations, the writes of each log are saved in one batch before they are answered
+            results that are generators are made lists here, so the log is never read by the thread of a connection
+        Parameters:
+            :param jobs: list of tuple future, open log, operation and arguments
+            :return: None
+        """
+        batches = {}
+        refreshed = set()
+        writes = []
+        for future, open_log, operation, args in jobs:
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                if open_log is None:
+                    future.set_result(self.login(*args))
+                    continue
+                if open_log not in refreshed:
+                    open_log.db.refresh()
+                    refreshed.add(open_log)
+                if operation in WRITE_OPERATIONS:
+                    if open_log not in batches:
+                        batches[open_log] = open_log.db.batch()
+                        batches[open_log].__enter__()
+                    writes.append((future, open_log, getattr(open_log.db, operation)(*args)))
+                    continue
+                value = getattr(open_log.db, operation)
+                value = value(*args) if callable(value) else value
+                future.set_result(list(value) if isinstance(value, Iterator) else value)
+            except Exception as e:
+                future.set_exception(e)
+        errors = {}
+        for open_log, batch in batches.items():
+            try:
+                batch.__exit__(None, None, None)
+            except Exception as e:
+                errors[open_log] = ValueError(f"the log could not be saved: {e}")
+        for future, open_log, result in writes:
+            if open_log in errors:
+                future.set_exception(errors[open_log])
+            else:
+                future.set_result(result)
+
+    def _remove_stale_socket(self):
+        """
+        Description:
+            removes the socket of a daemon that did not shut down cleanly
+            raises ValueError if another daemon is serving the socket
+        Parameters:
+            :return: None
+        """
+        if not os.path.exists(self.socket_file):
+            return
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            try:
+                sock.connect(self.socket_file)
+            except OSError:
+                os.remove(self.socket_file)
+                return
+        raise ValueError(f"a daemon is already serving {self.socket_file}")
+
+    def serve_forever(self):
+        """
+        Description:
+            serves connections until shutdown is called, the socket can only be used by the user running the daemon
+        Parameters:
+            :return: None
+        """
+        self._remove_stale_socket()
+        umask = os.umask(0o177)
+        try:
+            self.server = _Server(self.socket_file, _Handler)
+        finally:
+            os.umask(umask)
+        self.server.daemon = self
+        thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        thread.start()
+        try:
+            while True:
+                jobs = [self.jobs.get()]
+                while not self.jobs.empty():
+                    jobs.append(self.jobs.get())
+                stop = None in jobs
+                self._run_jobs([job for job in jobs if job is not None])
+                if stop:
+                    break
+        finally:
+            self.server.shutdown()
+            self.server.server_close()
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(self.socket_file)
+            self.close()
+
+    def shutdown(self):
+        """
+        Description:
+            stops serving connections, called from another thread
+        Parameters:
+            :return: None
+        """
+        self.jobs.put(None)
+
+    def close(self):
+        """
+        Description:
+            closes every open log
+        Parameters:
+            :return: None
+        """
+        for open_log in self.logs.values():
+            open_log.db.close()
+        self.logs.clear()
+
+
+class DaemonClient:
+    """
+    Description:
+        a connection to the daemon, logged in as one user
+        the read and write operations of DbHandleBase are methods of the client, and raise ValueError on errors
+        set_quantities takes and returns rows of card id, print type and quantity or result, and merge takes the user
+        name and password of the other log, optionally followed by the strategy
+    """
+
+    def __init__(self, user: str, psswrd: str, socket_file: str = SOCKET_FILE):
+        """
+        Description:
+            Constructor method, connects and logs in
+            raises ConnectionError if the daemon is not running, and ValueError if the login fails
+        Parameters:
+            :param user: the name of the user
+            :param psswrd: the password of the user
+            :param socket_file: the path of the socket of the daemon
+        """
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            self.sock.connect(socket_file)
+        except OSError:
+            self.sock.close()
+            raise ConnectionError(f"no daemon is serving {socket_file}") from None
+        self.call("login", user, psswrd)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __getattr__(self, operation: str):
+        if operation not in READ_OPERATIONS and operation not in WRITE_OPERATIONS:
+            raise AttributeError(operation)
+        return functools.partial(self.call, operation)
+
+    def call(self, operation: str, *args):
+        """
+        Description:
+            runs an operation on the log of the user in the daemon
+            raises ValueError if the operation failed and ConnectionError if the daemon went away
+        Parameters:
+            :param operation: one of READ_OPERATIONS or WRITE_OPERATIONS
+            :param args: the arguments of the operation
+            :return: the result of the operation, generators are returned as lists
+        """
+        try:
+            send_message(self.sock, [operation, args])
+            reply = receive_message(self.sock)
+        except OSError:
+            raise ConnectionError("the daemon went away") from None
+        if reply is None:
+            raise ConnectionError("the daemon went away")
+        ok, result = reply
+        if not ok:
+            raise ValueError(result)
+        return result
+
+    def close(self):
+        """
+        Description:
+            closes the connection
+        Parameters:
+            :return: None
+        """
+        self.sock.close()
+
+
+if __name__ == "__main__":
+    init(clss_base.API_KEY)
+    _daemon = LogDaemon(sys.argv[1] if len(sys.argv) > 1 else "clss_pickle")
+    print(f"serving the logs of {_daemon.folder} on {_daemon.socket_file}, press ctrl-c to stop")
+    try:
+        _daemon.serve_forever()
+    except KeyboardInterrupt:
+        print("stopped")
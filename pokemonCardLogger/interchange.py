@@ -0,0 +1,317 @@
+"""
+Description:
+    Streams a whole log, its card log, energy log and login history, to and from JSONL or Parquet files, so a collection
+    can be loaded into other tools without parsing csv
+    Exports write rows as they are read and imports apply rows in chunks inside one batch, so files of millions of rows
+    are never held in memory. Prices are optional on export and ignored on import
+    JSONL dumps are a single file with one object per line and a "kind" of "card", "energy" or "login", files ending in
+    ".gz" are compressed. Parquet dumps are a folder of cards.parquet, energy.parquet and logins.parquet and need
+    pyarrow ("pip3 install pokemonCardLogger[arrow]")
+Usage:
+    from pokemonCardLogger import interchange
+    interchange.export_jsonl(db, "dump.jsonl.gz")
+    interchange.import_parquet(db, "dump")
+"""
+import gzip
+import json
+from clss_base import *
+
+CHUNK_ROWS = 65536
+PARQUET_FILES = {"card": "cards.parquet", "energy": "energy.parquet", "login": "logins.parquet"}
+FIELDS = {"card": ("card_id", "print_type", "qnty"), "energy": ("energy_type", "print_type", "qnty"), "login": ("time",)}
+
+
+def _open_text(file: str, mode: str):
+    """
+    Description:
+        opens a text file, compressed with gzip if its name ends in ".gz"
+    Parameters:
+        :param file: the path to the file
+        :param mode: "r" or "w"
+        :return: a text file object
+    """
+    if file.endswith(".gz"):
+        return gzip.open(file, f"{mode}t", encoding="utf-8")
+    return open(file, mode, encoding="utf-8")
+
+
+def dump_rows(db: DbHandleBase, prices: bool = False, missing: list = None):
+    """
+    Description:
+        a generator of every row of a log, the card log in log order, then the energy log, then the login history
+    Parameters:
+        :param db: an instance of a DbHandle
+        :param prices: if True the card rows get the market price times the quantity, which needs the api
+        :param missing: a list that tuple card_id, print_type and reason is added to for every card without a price
+        :return: generator of a tuple of the kind and a dictionary of the row
+    """
+    if prices:
+        for card_id, print_type, qnty, price in db.log_with_prices(db.get_log(), missing):
+            yield "card", {"card_id": card_id, "print_type": print_type, "qnty": qnty, "price": price}
+    else:
+        for card_id, print_type, qnty in db.get_log():
+            yield "card", {"card_id": card_id, "print_type": print_type, "qnty": qnty}
+    for energy_type, print_type, qnty in db.get_energy_log():
+        yield "energy", {"energy_type": energy_type, "print_type": print_type, "qnty": qnty}
+    for day, month, year, hour, minute, second in db.list_login():
+        yield "login", {"time": dt.datetime(year, month, day, hour, minute, second)}
+
+
+def export_jsonl(db: DbHandleBase, output_file: str, prices: bool = False):
+    """
+    Description:
+        exports a log to a JSONL file, writing each row as it is read
+    Parameters:
+        :param db: an instance of a DbHandle
+        :param output_file: the path to the file, it is compressed with gzip if it ends in ".gz"
+        :param prices: if True the card rows get a "price" of the market price times the quantity, or null if it is
+        missing, this needs the api
+        :return: dictionary of the number of rows written of each kind
+    """
+    counts = dict.fromkeys(FIELDS, 0)
+    with _open_text(output_file, "w") as f:
+        for kind, row in dump_rows(db, prices):
+            if kind == "login":
+                row = {"time": row["time"].isoformat()}
+            f.write(json.dumps({"kind": kind, **row}, separators=(",", ":")))
+            f.write("\n")
+            counts[kind] += 1
+    return counts
+
+
+def export_parquet(db: DbHandleBase, folder: str, prices: bool = False):
+    """
+    Description:
+        exports a log to a folder of Parquet files, writing a row group every CHUNK_ROWS rows
+    Parameters:
+        :param db: an instance of a DbHandle
+        :param folder: the folder to write cards.parquet, energy.parquet and logins.parquet to, it is made if needed
+        :param prices: if True cards.parquet gets a "price" column of the market price times the quantity, null when
+        it is missing, this needs the api
+        :return: dictionary of the number of rows written of each kind
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    schemas = {
+        "card": pa.schema(
+            [("card_id", pa.string()), ("print_type", pa.string()), ("qnty", pa.int64())] +
+            ([("price", pa.float64())] if prices else [])
+        ),
+        "energy": pa.schema([("energy_type", pa.string()), ("print_type", pa.string()), ("qnty", pa.int64())]),
+        "login": pa.schema([("time", pa.timestamp("s"))])
+    }
+    os.makedirs(folder, exist_ok=True)
+    counts = dict.fromkeys(FIELDS, 0)
+    writers = {}
+    chunks = {kind: [] for kind in FIELDS}
+
+    def flush(kind: str):
+        if kind not in writers:
+            writers[kind] = pq.ParquetWriter(os.path.join(folder, PARQUET_FILES[kind]), schemas[kind])
+        if chunks[kind]:
+            writers[kind].write_table(pa.Table.from_pylist(chunks[kind], schemas[kind]))
+            counts[kind] += len(chunks[kind])
+            chunks[kind] = []
+
+    try:
+        for kind, row in dump_rows(db, prices):
+            chunks[kind].append(row)
+            if len(chunks[kind]) >= CHUNK_ROWS:
+                flush(kind)
+        for kind in FIELDS:
+            flush(kind)
+    finally:
+        for writer in writers.values():
+            writer.close()
+    return counts
+
+
+def _parse_row(kind: str, row: dict):
+    """
+    Description:
+        checks a row of a dump and turns it into a tuple, print types are checked like import_csv does with
+        check_print_type
+        raises ValueError with the reason if the row is bad
+    Parameters:
+        :param kind: "card", "energy" or "login"
+        :param row: dictionary of the row
+        :return: tuple card_id, print_type and qnty for a card, energy_type, print_type and qnty for an energy card,
+        or a datetime for a login
+    """
+    if not isinstance(row, dict):
+        raise ValueError("the row is not a JSON object")
+    if kind not in FIELDS:
+        raise ValueError(f"the row has an unknown kind {kind!r}")
+    try:
+        values = [row[field] for field in FIELDS[kind]]
+    except (KeyError, TypeError):
+        raise ValueError(f"the {kind} row is missing one of {', '.join(FIELDS[kind])}")
+    if kind == "login":
+        when, = values
+        if isinstance(when, str):
+            try:
+                when = dt.datetime.fromisoformat(when)
+            except ValueError:
+                raise ValueError("the login time is not an iso format time")
+        if not isinstance(when, dt.datetime):
+            raise ValueError("the login time is not a time")
+        return when
+    key, print_type, qnty = values
+    if not isinstance(key, str) or not isinstance(print_type, str) or not key.strip() or not print_type.strip():
+        raise ValueError(f"the {kind} row has an empty or non text field")
+    if not isinstance(qnty, int) or isinstance(qnty, bool) or qnty < 0:
+        raise ValueError(f"the {kind} row has a quantity that is not a whole number of 0 or more")
+    return key.strip(), check_print_type(print_type, kind == "energy"), qnty
+
+
+def import_rows(db: DbHandleBase, rows, validate: bool = True, dry_run: bool = False, output: bool = False):
+    """
+    Description:
+        applies the rows of a dump to a log in chunks of CHUNK_ROWS, the card ids of each chunk are validated with one
+        api request per set, and every change is saved in one commit at the end
+        the quantities of the cards and energy cards in the dump replace those in the log, a quantity of 0 removes
+        the card, and when a card is in the dump more than once the last row wins. Logins already in the history are
+        skipped
+    Parameters:
+        :param db: an instance of a DbHandle
+        :param rows: an iterable of tuple of the location of the row, its kind and a dictionary of the row
+        :param validate: if False the card ids are not checked with the api, for dumps that were exported from a log
+        :param dry_run: if True the rows are checked and counted, but the log is not changed
+        :param output: a boolean true if you want the progress printed to the console
+        :return: dictionary of the number of rows read, the number of cards, energy cards and logins that were set
+        or added (or would be in a dry run), and a list of tuple location and reason for the rows that were skipped
+    """
+    report = {"rows": 0, "cards": 0, "energy": 0, "logins": 0, "bad_rows": []}
+    cards = []
+    logins = []
+
+    def flush_cards():
+        if validate:
+            valid_ids = db.validate_card_ids(card_id for _, card_id, _, _ in cards)
+        else:
+            valid_ids = collections.defaultdict(lambda: True)
+        good = []
+        for location, card_id, print_type, qnty in cards:
+            if valid_ids[card_id]:
+                good.append((card_id, print_type, qnty))
+            else:
+                report["bad_rows"].append((location, f"{card_id} is not a valid card id"))
+        if not dry_run:
+            db._set_cards(good)
+        report["cards"] += len(good)
+        cards.clear()
+
+    with db.batch():
+        for location, kind, row in rows:
+            report["rows"] += 1
+            if output and not report["rows"] % CHUNK_ROWS:
+                print(f"read {report['rows']} rows")
+            try:
+                parsed = _parse_row(kind, row)
+            except ValueError as e:
+                report["bad_rows"].append((location, str(e)))
+                continue
+            if kind == "card":
+                cards.append((location, *parsed))
+                if len(cards) >= CHUNK_ROWS:
+                    flush_cards()
+            elif kind == "energy":
+                if not db.rq.validate_basic_energy(parsed[0]):
+                    report["bad_rows"].append((location, f"{parsed[0]} is not a basic energy type"))
+                    continue
+                if not dry_run:
+                    db._set_energy(*parsed)
+                report["energy"] += 1
+            else:
+                logins.append(parsed)
+        flush_cards()
+        if dry_run:
+            report["logins"] = len(set(int(when.timestamp()) for when in logins) - set(
+                int(dt.datetime(year, month, day, hour, minute, second).timestamp())
+                for day, month, year, hour, minute, second in db.list_login()
+            ))
+        else:
+            report["logins"] = db._add_logins(logins)
+            db._commit()
+    if output:
+        for location, reason in report["bad_rows"]:
+            print(f"skipped {location}: {reason}")
+    return report
+
+
+def jsonl_rows(input_file: str):
+    """
+    Description:
+        a generator of the rows of a JSONL dump, read as a stream
+    Parameters:
+        :param input_file: the path to the file, it is read with gzip if it ends in ".gz"
+        :return: generator of a tuple of "line <number>", the kind and the row, which is a dictionary unless the
+        line is not a JSON object
+    """
+    with _open_text(input_file, "r") as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError:
+                row = None
+            yield f"line {line_number}", row.get("kind") if isinstance(row, dict) else None, row
+
+
+def parquet_rows(folder: str):
+    """
+    Description:
+        a generator of the rows of a Parquet dump, read a batch of CHUNK_ROWS rows at a time
+    Parameters:
+        :param folder: the folder with cards.parquet, energy.parquet and logins.parquet, missing files are skipped
+        :return: generator of a tuple of "<file> row <number>", the kind and a dictionary of the row
+    """
+    import pyarrow.parquet as pq
+    for kind, name in PARQUET_FILES.items():
+        file = os.path.join(folder, name)
+        if not os.path.exists(file):
+            continue
+        parquet_file = pq.ParquetFile(file)
+        columns = [field for field in FIELDS[kind] if field in parquet_file.schema_arrow.names]
+        row_number = 0
+        for batch in parquet_file.iter_batches(CHUNK_ROWS, columns=columns):
+            for row in batch.to_pylist():
+                row_number += 1
+                yield f"{name} row {row_number}", kind, row
+
+
+def import_jsonl(db: DbHandleBase, input_file: str, validate: bool = True, dry_run: bool = False,
+                 output: bool = False):
+    """
+    Description:
+        imports a JSONL dump into a log, see import_rows
+    Parameters:
+        :param db: an instance of a DbHandle
+        :param input_file: the path to the file, it is read with gzip if it ends in ".gz"
+        :param validate: if False the card ids are not checked with the api
+        :param dry_run: if True the rows are checked and counted, but the log is not changed
+        :param output: a boolean true if you want the progress printed to the console
+        :return: False if the file does not exist, otherwise the report of import_rows
+    """
+    if not os.path.exists(input_file):
+        return False
+    return import_rows(db, jsonl_rows(input_file), validate, dry_run, output)
+
+
+def import_parquet(db: DbHandleBase, folder: str, validate: bool = True, dry_run: bool = False,
+                   output: bool = False):
+    """
+    Description:
+        imports a Parquet dump into a log, see import_rows
+    Parameters:
+        :param db: an instance of a DbHandle
+        :param folder: the folder with cards.parquet, energy.parquet and logins.parquet
+        :param validate: if False the card ids are not checked with the api
+        :param dry_run: if True the rows are checked and counted, but the log is not changed
+        :param output: a boolean true if you want the progress printed to the console
+        :return: False if the folder does not exist, otherwise the report of import_rows
+    """
+    if not os.path.isdir(folder):
+        return False
+    return import_rows(db, parquet_rows(folder), validate, dry_run, output)
@@ -0,0 +1,375 @@
+"""
+Description:
+    The binary file format of the log, used instead of pickle
+    The format is versioned, is read without running any code from the file, is compressed before it is encrypted,
+    and is written and read as a stream of records, one per set, so it never needs a second copy of the log in memory
+File layout:
+    MAGIC, the format version and the compression as "<6sBB", then a stream of records that is compressed as a whole
+    every record is its type and length as "<BI" followed by its payload:
+        RECORD_META: json of the print type table and the rest of the log dictionary
+        RECORD_SET: the length of the set id as "<H", the set id, then the page of the set
+        RECORD_END: the entry count, the card total and the crc32 of every record before it as "<QQI"
+Usage:
+    import logformat
+"""
+import io
+import json
+import time
+import zlib
+import pickle
+import random
+import struct
+from cardlog import CardLog
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+MAGIC = b"PCLLOG"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<6sBB")
+RECORD = struct.Struct("<BI")
+SET_ID = struct.Struct("<H")
+END = struct.Struct("<QQI")
+RECORD_META = 1
+RECORD_SET = 2
+RECORD_END = 3
+COMPRESSIONS = {"none": 0, "zlib": 1, "zstd": 2}
+DEFAULT_COMPRESSION = "zstd" if zstandard is not None else "zlib"
+ZLIB_LEVEL = 6
+ZSTD_LEVEL = 3
+READ_SIZE = 1 << 20
+DECOMPRESS_ERRORS = (zlib.error, ) if zstandard is None else (zlib.error, zstandard.ZstdError)
+
+
+def _compressor(compression: int):
+    """
+    Description:
+        makes a streaming compressor
+    Parameters:
+        :param compression: the compression code
+        :return: an object with compress and flush methods, None for no compression
+    """
+    if compression == COMPRESSIONS["zlib"]:
+        return zlib.compressobj(ZLIB_LEVEL)
+    if compression == COMPRESSIONS["zstd"]:
+        if zstandard is None:
+            raise ValueError("zstd compression needs the zstandard module")
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compressobj()
+    if compression == COMPRESSIONS["none"]:
+        return None
+    raise ValueError(f"unknown compression {compression}")
+
+
+def _decompressor(compression: int):
+    """
+    Description:
+        makes a streaming decompressor
+    Parameters:
+        :param compression: the compression code
+        :return: an object with a decompress method, None for no compression
+    """
+    if compression == COMPRESSIONS["zlib"]:
+        return zlib.decompressobj()
+    if compression == COMPRESSIONS["zstd"]:
+        if zstandard is None:
+            raise ValueError("this log is compressed with zstd, which needs the zstandard module")
+        return zstandard.ZstdDecompressor().decompressobj()
+    if compression == COMPRESSIONS["none"]:
+        return None
+    raise ValueError(f"unknown compression {compression}")
+
+
+def is_log_format(contents: bytes):
+    """
+    Description:
+        checks if decrypted log contents are in this format rather than pickle
+    Parameters:
+        :param contents: the start of the decrypted log
+        :return: bool based on if the contents start with the format header
+    """
+    return contents[:len(MAGIC)] == MAGIC
+
+
+class LogWriter:
+    """
+    Description:
+        writes the records of a log to a binary file object
+    """
+
+    def __init__(self, f, compression: str = DEFAULT_COMPRESSION):
+        """
+        Description:
+            Constructor method, writes the header
+        Parameters:
+            :param f: a binary file object to write to
+            :param compression: one of the keys of COMPRESSIONS
+        """
+        self.f = f
+        self.crc = 0
+        self.compressor = _compressor(COMPRESSIONS[compression])
+        f.write(HEADER.pack(MAGIC, FORMAT_VERSION, COMPRESSIONS[compression]))
+
+    def _write(self, data: bytes):
+        self.crc = zlib.crc32(data, self.crc)
+        self.f.write(self.compressor.compress(data) if self.compressor is not None else data)
+
+    def record(self, kind: int, *parts: bytes):
+        """
+        Description:
+            writes a record
+        Parameters:
+            :param kind: the record type
+            :param parts: the bytes of the payload
+            :return: None
+        """
+        self._write(RECORD.pack(kind, sum(len(part) for part in parts)))
+        for part in parts:
+            self._write(part)
+
+    def close(self, entries: int, total: int):
+        """
+        Description:
+            writes the end record and flushes the compressor
+        Parameters:
+            :param entries: the number of entries of the log
+            :param total: the total quantity of cards of the log
+            :return: None
+        """
+        self.record(RECORD_END, END.pack(entries, total, self.crc))
+        if self.compressor is not None:
+            self.f.write(self.compressor.flush())
+
+
+def read_records(f):
+    """
+    Description:
+        reads the records of a log from a binary file object, a chunk at a time
+        raises ValueError if the file is not a log, was made by a newer version, or is cut short
+    Parameters:
+        :param f: a binary file object to read from
+        :return: generator of tuple record type and payload, ending with the end record
+    """
+    header = f.read(HEADER.size)
+    if len(header) < HEADER.size:
+        raise ValueError("not a log file")
+    magic, version, compression = HEADER.unpack(header)
+    if magic != MAGIC:
+        raise ValueError("not a log file")
+    if version > FORMAT_VERSION:
+        raise ValueError("the log was made by a newer version")
+    decompressor = _decompressor(compression)
+    buffer = bytearray()
+    start = 0
+    crc = 0
+    while True:
+        chunk = f.read(READ_SIZE)
+        if chunk:
+            try:
+                buffer += decompressor.decompress(chunk) if decompressor is not None else chunk
+            except DECOMPRESS_ERRORS as e:
+                raise ValueError("the log is corrupt") from e
+        while len(buffer) - start >= RECORD.size:
+            kind, length = RECORD.unpack_from(buffer, start)
+            end = start + RECORD.size + length
+            if end > len(buffer):
+                break
+            payload = bytes(buffer[start + RECORD.size:end])
+            if kind == RECORD_END:
+                entries, total, end_crc = END.unpack(payload)
+                if end_crc != crc:
+                    raise ValueError("the log failed its checksum")
+                yield kind, payload
+                return
+            crc = zlib.crc32(buffer[start:end], crc)
+            start = end
+            yield kind, payload
+        if start > READ_SIZE:
+            del buffer[:start]
+            start = 0
+        if not chunk:
+            raise ValueError("the log is cut short")
+
+
+def write_log(f, logdict: dict, compression: str = DEFAULT_COMPRESSION):
+    """
+    Description:
+        writes a log dictionary to a binary file object
+    Parameters:
+        :param f: a binary file object to write to
+        :param logdict: the log dictionary, its "log" is a CardLog and the rest must be json serializable
+        :param compression: one of the keys of COMPRESSIONS
+        :return: None
+    """
+    card_log = logdict["log"]
+    writer = LogWriter(f, compression)
+    meta = {"print_types": card_log.print_types(), "logdict": {k: v for k, v in logdict.items() if k != "log"}}
+    writer.record(RECORD_META, json.dumps(meta).encode("utf-8"))
+    for set_id, page in card_log.pages():
+        set_id = set_id.encode("utf-8")
+        writer.record(RECORD_SET, SET_ID.pack(len(set_id)), set_id, page)
+    writer.close(len(card_log), card_log.total())
+
+
+def read_log(f, log_class: type = CardLog):
+    """
+    Description:
+        reads a log dictionary from a binary file object
+        raises ValueError if the log is malformed
+    Parameters:
+        :param f: a binary file object to read from
+        :param log_class: the CardLog class to build the card log with
+        :return: the log dictionary
+    """
+    records = read_records(f)
+    kind, payload = next(records)
+    if kind != RECORD_META:
+        raise ValueError("the log does not start with its metadata")
+    meta = json.loads(payload)
+    end = []
+
+    def pages():
+        for record_kind, record in records:
+            if record_kind == RECORD_SET:
+                length, = SET_ID.unpack_from(record)
+                yield record[SET_ID.size:SET_ID.size + length].decode("utf-8"), record[SET_ID.size + length:]
+            elif record_kind == RECORD_END:
+                end.append(END.unpack(record))
+
+    card_log = log_class.from_pages(meta["print_types"], pages())
+    entries, total, _ = end[0]
+    if entries != len(card_log) or total != card_log.total():
+        raise ValueError("the log does not match its counts")
+    logdict = meta["logdict"]
+    logdict["log"] = card_log
+    return logdict
+
+
+def dumps(logdict: dict, compression: str = DEFAULT_COMPRESSION):
+    """
+    Description:
+        packs a log dictionary into bytes
+    Parameters:
+        :param logdict: the log dictionary
+        :param compression: one of the keys of COMPRESSIONS
+        :return: bytes of the log
+    """
+    f = io.BytesIO()
+    write_log(f, logdict, compression)
+    return f.getvalue()
+
+
+def loads(contents: bytes, log_class: type = CardLog):
+    """
+    Description:
+        unpacks a log dictionary from bytes
+    Parameters:
+        :param contents: bytes of the log
+        :param log_class: the CardLog class to build the card log with
+        :return: the log dictionary
+    """
+    return read_log(io.BytesIO(contents), log_class)
+
+
+def stream_log(contents: bytes):
+    """
+    Description:
+        unpacks decrypted log contents in this format a set at a time, or in the pickle format of older versions
+        which can only be unpacked as a whole, the counts and checksum of the log are tested once every row was read
+        raises ValueError if the log is malformed
+    Parameters:
+        :param contents: the decrypted bytes of the log
+        :return: tuple of the log dictionary without its "log", and a generator of tuple card_id, print_type and qnty
+    """
+    if not is_log_format(contents):
+        logdict = pickle.loads(contents)
+        log = logdict.pop("log")
+        return logdict, ((*key.split("."), qnty) for key, qnty in log.items() if qnty > 0)
+    records = read_records(io.BytesIO(contents))
+    kind, payload = next(records)
+    if kind != RECORD_META:
+        raise ValueError("the log does not start with its metadata")
+    meta = json.loads(payload)
+
+    def rows():
+        entries = 0
+        total = 0
+        for record_kind, record in records:
+            if record_kind == RECORD_SET:
+                length, = SET_ID.unpack_from(record)
+                page = (record[SET_ID.size:SET_ID.size + length].decode("utf-8"), record[SET_ID.size + length:])
+                for row in CardLog.from_pages(meta["print_types"], (page, )):
+                    entries += 1
+                    total += row[2]
+                    yield row
+            elif record_kind == RECORD_END:
+                end_entries, end_total, _ = END.unpack(record)
+                if (entries, total) != (end_entries, end_total):
+                    raise ValueError("the log does not match its counts")
+
+    return meta["logdict"], rows()
+
+
+def log_checksum(rows):
+    """
+    Description:
+        sums up rows into counts and a checksum that does not depend on the order of the rows, so logs in different
+        storage backends can be compared
+    Parameters:
+        :param rows: an iterable of tuple card_id, print_type and qnty, rows with no quantity are skipped
+        :return: dictionary of the entry count, the card total and the checksum
+    """
+    entries = 0
+    total = 0
+    checksum = 0
+    for card_id, print_type, qnty in rows:
+        if qnty <= 0:
+            continue
+        entries += 1
+        total += qnty
+        checksum += zlib.crc32(f"{card_id}.{print_type}.{qnty}".encode("utf-8"))
+    return {"entries": entries, "cards": total, "checksum": checksum & 0xFFFFFFFFFFFFFFFF}
+
+
+def benchmark(sizes: tuple = (10000, 100000, 1000000)):
+    """
+    Description:
+        times this format against the pickle format it replaces and prints the results
+        the pickle timings include converting the log to and from the dictionary that was pickled
+    Parameters:
+        :param sizes: the numbers of log entries to time
+        :return: dictionary of size to dictionary of format to tuple of write seconds, read seconds and size in bytes
+    """
+    results = {}
+    for size in sizes:
+        log = {
+            f"bm{index // 250}-{index % 250 // 2 + 1}.{('normal', 'holofoil')[index % 2]}": random.randint(1, 9)
+            for index in range(size)
+        }
+        logdict = {"log": CardLog.from_dict(log), "energy": {"fr": {"normal": 3}}, "generation": 1}
+        del log
+        results[size] = {}
+        start = time.perf_counter()
+        contents = pickle.dumps(dict(logdict, log=logdict["log"].to_dict()))
+        write_time = time.perf_counter() - start
+        start = time.perf_counter()
+        CardLog.from_dict(pickle.loads(contents)["log"])
+        results[size]["pickle"] = (write_time, time.perf_counter() - start, len(contents))
+        for compression in COMPRESSIONS:
+            if compression == "zstd" and zstandard is None:
+                continue
+            start = time.perf_counter()
+            contents = dumps(logdict, compression)
+            write_time = time.perf_counter() - start
+            start = time.perf_counter()
+            loads(contents)
+            results[size][compression] = (write_time, time.perf_counter() - start, len(contents))
+        print(f"{size} entries:")
+        for name, (write_time, read_time, length) in results[size].items():
+            print(f"\t{name}: write {write_time:.4f}s read {read_time:.4f}s size {length} bytes")
+    return results
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,150 @@
+"""
+Description:
+    Stores the login history of a log apart from the log itself
+    Logins are kept as packed integer timestamps in an encrypted file next to the log file, each login is appended as
+    its own encrypted segment so the log is never rewritten for a login, and the history is bounded
+Usage:
+    from logins import LoginLog
+"""
+import os
+import datetime as dt
+from array import array
+from bisect import bisect_left, bisect_right, insort
+from cryptography.fernet import Fernet
+from assets import LOGIN_HISTORY_MAX, LOGIN_SEGMENTS_MAX
+
+
+class LoginLog:
+    """
+    Description:
+        a bounded, sorted history of login times
+    """
+
+    def __init__(self, file: (str, None), key: bytes, max_size: int = LOGIN_HISTORY_MAX):
+        """
+        Description:
+            Constructor method
+        Parameters:
+            :param file: the path to the login history file, None to keep the history in memory only
+            :param key: the fernet key used to encrypt the history
+            :param max_size: the number of logins to keep, older logins are dropped
+        """
+        self.file = file
+        self.fernet = Fernet(key)
+        self.max_size = max_size
+        self.times = array("q")
+        self.segments = 0
+        if self.file is not None and os.path.exists(self.file):
+            self._read()
+
+    def __len__(self):
+        return len(self.times)
+
+    def __iter__(self):
+        for timestamp in self.times:
+            yield dt.datetime.fromtimestamp(timestamp)
+
+    def _read(self):
+        """
+        Description:
+            reads every segment of the history file
+        Parameters:
+            :return: None
+        """
+        with open(self.file, "rb") as f:
+            for line in f:
+                if line := line.strip():
+                    self.times.frombytes(self.fernet.decrypt(line))
+                    self.segments += 1
+        self.times = array("q", sorted(self.times))
+
+    def _append(self, times: array):
+        """
+        Description:
+            appends an encrypted segment to the history file, compacting the file when it has too many segments or
+            logins
+        Parameters:
+            :param times: the timestamps of the segment
+            :return: None
+        """
+        if self.file is not None:
+            with open(self.file, "ab") as f:
+                f.write(self.fernet.encrypt(times.tobytes()) + b"\n")
+            self.segments += 1
+        if self.segments >= LOGIN_SEGMENTS_MAX or len(self.times) > self.max_size:
+            self.compact()
+
+    def compact(self):
+        """
+        Description:
+            rewrites the history file as a single segment, the file is read again first so logins appended by other
+            processes are kept
+        Parameters:
+            :return: None
+        """
+        if self.file is None:
+            self._trim()
+            return
+        if os.path.exists(self.file):
+            self.times = array("q")
+            self.segments = 0
+            self._read()
+        self._trim()
+        temp_file = f"{self.file}.{os.getpid()}.tmp"
+        with open(temp_file, "wb") as f:
+            f.write(self.fernet.encrypt(self.times.tobytes()) + b"\n")
+        os.replace(temp_file, self.file)
+        self.segments = 1
+
+    def _trim(self):
+        """
+        Description:
+            drops the oldest logins when the history is over its size
+        Parameters:
+            :return: bool based on if any logins were dropped
+        """
+        if len(self.times) <= self.max_size:
+            return False
+        del self.times[:len(self.times) - self.max_size]
+        return True
+
+    def add(self, when: dt.datetime = None):
+        """
+        Description:
+            adds a login to the history
+        Parameters:
+            :param when: the time of the login, defaults to now
+            :return: None
+        """
+        timestamp = int((when or dt.datetime.now()).timestamp())
+        if not self.times or timestamp >= self.times[-1]:
+            self.times.append(timestamp)
+        else:
+            insort(self.times, timestamp)
+        self._append(array("q", [timestamp]))
+
+    def extend(self, times):
+        """
+        Description:
+            adds many logins to the history as a single segment
+        Parameters:
+            :param times: an iterable of datetime of the logins
+            :return: None
+        """
+        times = array("q", (int(when.timestamp()) for when in times))
+        self.times = array("q", sorted(self.times + times))
+        self._append(times)
+
+    def between(self, start: dt.datetime, end: dt.datetime):
+        """
+        Description:
+            gets the logins in a range of time, without going over the whole history
+        Parameters:
+            :param start: the start of the range
+            :param end: the end of the range, inclusive
+            :return: generator of datetime of the logins
+        """
+        first = bisect_left(self.times, int(start.timestamp()))
+        last = bisect_right(self.times, int(end.timestamp()))
+        for timestamp in self.times[first:last]:
+            yield dt.datetime.fromtimestamp(timestamp)
@@ -0,0 +1,88 @@
+"""
+Description:
+    An advisory lock for a log file, so several processes can share a log
+    The lock is held on a "<log file>.lock" file next to the log while a process writes the log. Logs are always
+    written to a temporary file and moved into place, so readers never need the lock
+Usage:
+    from loglock import LogLock
+"""
+import time
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+    import msvcrt
+
+
+class LogLock:
+    """
+    Description:
+        a reentrant advisory lock for a log file
+    """
+
+    def __init__(self, file: (str, None)):
+        """
+        Description:
+            Constructor method
+        Parameters:
+            :param file: the path to the log file, None for a log that is only in memory, which needs no lock
+        """
+        self.file = None if file is None else f"{file}.lock"
+        self._handle = None
+        self._depth = 0
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.release()
+
+    def acquire(self):
+        """
+        Description:
+            waits for and takes the lock
+        Parameters:
+            :return: None
+        """
+        self._depth += 1
+        if self._depth > 1 or self.file is None:
+            return
+        handle = open(self.file, "a+b")
+        try:
+            if fcntl is not None:
+                fcntl.flock(handle.fileno(), fcntl.LOCK_EX)
+            else:
+                handle.seek(0)
+                while True:
+                    try:
+                        msvcrt.locking(handle.fileno(), msvcrt.LK_LOCK, 1)
+                        break
+                    except OSError:
+                        time.sleep(0.05)
+        except BaseException:
+            handle.close()
+            self._depth -= 1
+            raise
+        self._handle = handle
+
+    def release(self):
+        """
+        Description:
+            releases the lock once every acquire has been released
+        Parameters:
+            :return: None
+        """
+        self._depth -= 1
+        if self._depth or self._handle is None:
+            return
+        try:
+            if fcntl is not None:
+                fcntl.flock(self._handle.fileno(), fcntl.LOCK_UN)
+            else:
+                self._handle.seek(0)
+                msvcrt.locking(self._handle.fileno(), msvcrt.LK_UNLCK, 1)
+        finally:
+            self._handle.close()
+            self._handle = None
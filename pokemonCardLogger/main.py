@@ -10,9 +10,13 @@ import os
 # noinspection PyUnresolvedReferences
 import datetime as dt
 from getpass import getpass
+import importlib
 import clss_base
 import clss_pickle
 import test_api_status
+from valuation import Valuation, cents_to_dollars
+from pricestats import price_stats
+from migrate import SOURCE_SUFFIX, TARGET_SUFFIXES
 import cryptography
 from assets import *
 
@@ -145,7 +149,14 @@ def switch_mode(mode: int = 0):
         28: "avg full",
         29: "go back",
         30: "backup put",
-        31: "backup get"
+        31: "backup get",
+        32: "set completion",
+        33: "all set completion",
+        34: "log stats",
+        35: "log by price",
+        36: "collection worth",
+        37: "price stats",
+        38: "group log"
     }
     mode = switch.get(mode, "invalid entry")
     if mode == "invalid entry":
@@ -210,6 +221,13 @@ Collection Info Menu:
     8:  Length of both logs combined
     9:  Average price of the log using market price
     10: Average price of the log using all price data
+    11: Completion of a set
+    12: Completion of every set
+    13: Log statistics
+    14: Most valuable cards
+    15: Collection worth
+    16: Price statistics
+    17: Collection by set, rarity, type or release date
     """
     switch = {
         0: 29,
@@ -222,7 +240,14 @@ Collection Info Menu:
         7: 24,
         8: 25,
         9: 27,
-        10: 28
+        10: 28,
+        11: 32,
+        12: 33,
+        13: 34,
+        14: 35,
+        15: 36,
+        16: 37,
+        17: 38
     }
     mode = switch.get(ctt.get_user_input(menu, ctt.INT_TYPE), 29)
     return switch_mode(mode)
@@ -347,7 +372,7 @@ def get_card(db: clss_pickle.DbHandle,
         for print_type, qnty in db.get_card_by_id_only(card_id):
             print(f"\tfor {print_type}, you have {qnty}")
             total_qnty += qnty
-        print(f"for all of {card_name}, card id: {card_id}, you have {total_qnty}")
+        print(f"for all of {name}, card id: {card_id}, you have {total_qnty}")
         return
     qnty = db.get_card_qnty(card_id, print_type)
     print(f"the card {name} in pack {pack} quantity is: {qnty}")
@@ -465,6 +490,23 @@ def delete_card(db: clss_pickle.DbHandle,
         return
 
 
+def find_log(user: str):
+    """
+    Description:
+        finds the log of a user and the storage option it was saved with by its file extension, a log copied by
+        migrate.py is used over the clss_pickle log it was copied from
+    Parameters:
+        :param user: the name of the user
+        :return: a tuple of the module of the storage option and the path to the log, the path to a new clss_pickle log
+        if the user has no log
+    """
+    for backend, suffix in TARGET_SUFFIXES.items():
+        user_file = os.path.join(prog_data, f"{user}{suffix}")
+        if os.path.exists(user_file):
+            return importlib.import_module(backend), user_file
+    return clss_pickle, os.path.join(prog_data, f"{user}{SOURCE_SUFFIX}")
+
+
 def get_user():
     """
     Description:
@@ -478,17 +520,19 @@ def get_user():
     rq = clss_pickle.RqHandle(API_KEY)
     msg = "Please enter the name of the user. Enter 'default' for the default insecure no password login"
     user = ctt.get_user_input(msg, ctt.STR_TYPE, can_cancel=False)
-    user = f"{user}.pcllog"
-    user_file = os.path.join(prog_data, user)
-    if user in ["default.json", "default.pcllog"]:
+    backend, user_file = find_log(user)
+    if user == "default":
         psswrd = "default"
     print("Please enter password for said user.")
     psswrd = getpass(">>> ")
     if not os.path.exists(user_file):
-        db = clss_pickle.DbHandle(user_file, psswrd, rq)
+        db = backend.DbHandle(user_file, psswrd, rq)
         return db, rq
     try:
-        db = clss_pickle.DbHandle(user_file, psswrd, rq)
+        db = backend.DbHandle(user_file, psswrd, rq)
+    except PermissionError as e:
+        print(e)
+        quit()
     except cryptography.fernet.InvalidToken:
         print("Invalid password. Try again.")
         try:
@@ -510,6 +554,59 @@ def len_of_log(db: clss_pickle.DbHandle, *args, **kwargs):
     print(f"The size of your logged collection is {db.reg_log_size}")
 
 
+def print_card_prices(value: Valuation, index: int, indent: str = "\t"):
+    """
+    Description:
+        prints every price of a row of a valuation
+    Parameters:
+        :param value: an instance of valuation.Valuation
+        :param index: the index of the row in the log
+        :param indent: the text printed before each line
+        :return: None
+    """
+    card_id = value.card_ids[index]
+    qnty = value.qnty[index]
+    msg = f"{indent}The card id of the card is {card_id} card name is {value.names.get(card_id, card_id)}, the current print type is {value.print_types[index]}:"
+    print(msg)
+    for key, price in value.card_prices(index).items():
+        msg = f"{indent}\tThe price data is {key} has a price of {cents_to_dollars(price)} with a quantity of {qnty} the value of this card is {cents_to_dollars(price * qnty)}"
+        print(msg)
+
+
+def print_price_totals(value: Valuation, averages: bool = False):
+    """
+    Description:
+        prints the value of a valuation in every price category
+    Parameters:
+        :param value: an instance of valuation.Valuation
+        :param averages: if True the average price of each category is printed as well
+        :return: None
+    """
+    counts = value.counts()
+    average_prices = value.averages()
+    print("All prices put together: ")
+    for key, total in value.totals().items():
+        if not counts[key]:
+            continue
+        print(f"\tAll {key} prices added up = {cents_to_dollars(total)}. There are {counts[key]} cards with this price category")
+        if averages:
+            print(f"\tThe average of {key} prices are {cents_to_dollars(average_prices[key])}")
+
+
+def print_missing_prices(value: Valuation):
+    """
+    Description:
+        prints the cards of a valuation that have no prices
+    Parameters:
+        :param value: an instance of valuation.Valuation
+        :return: None
+    """
+    if value.missing:
+        print(f"\n{len(value.missing)} cards have no prices and were left out:")
+    for card_id, print_type, reason in value.missing:
+        print(f"\t{card_id} {print_type}: {reason}")
+
+
 def get_collection_value(db: clss_pickle.DbHandle,
                          rq: (clss_pickle.RqHandle, clss_base.RqHandle),
                          *args, **kwargs):
@@ -522,24 +619,16 @@ def get_collection_value(db: clss_pickle.DbHandle,
         :return: None
     """
     print("This may take some time. Please wait.")
-    value = 0.00
-    for card_id, print_type, qnty in db.get_log():
-        try:
-            data = rq.get_card(card_id, select=("name", "tcgplayer"))["data"]
-        except ConnectionError:
-            print("Connection Error. Try again.")
-            return
-        price = data["tcgplayer"]["prices"][print_type]["market"]
-        value = round((value + price), 2)
-        card_name = data["name"]
-        msg1 = f"The value of {card_id} who's name is {card_name} with print type of {print_type} is ${price} times the"
-        temp = 0
-        for _ in range(qnty):
-            temp = temp + price
-        msg2 = f"Quantity of {qnty} the value is ${round(temp, 2)}"
+    value = Valuation(db)
+    for card_id, print_type, qnty, price, card_value in value.card_values("market"):
+        if price is None:
+            continue
+        msg1 = f"The value of {card_id} who's name is {value.names[card_id]} with print type of {print_type} is {cents_to_dollars(price)} times the"
+        msg2 = f"Quantity of {qnty} the value is {cents_to_dollars(card_value)}"
         msg = f"{msg1} {msg2}"
         print(msg)
-    print(f"\nThe value of your collection is ${value}")
+    print_missing_prices(value)
+    print(f"\nThe value of your collection is {cents_to_dollars(value.totals()['market'])}")
 
 
 def get_card_value(rq: (clss_pickle.RqHandle, clss_base.RqHandle), *args, **kwargs):
@@ -574,8 +663,27 @@ def list_login(db: clss_pickle.DbHandle,
         :param db: an instance of pokemonCardLogger.clss_json.DbHandle or pokemonCardLogger.clss_pickle.DbHandle
         :return: None
     """
-    for day, month, year, hour, minute, second in db.list_login():
-        print(f"A successful login on {month} / {day} / {year} at {hour} : {minute} : {second}")
+    msg = "Would you like to only list the logins between two dates?('y' or 'n')"
+    if not ctt.get_user_input(msg, ctt.BOOL_TYPE, can_cancel=False):
+        for day, month, year, hour, minute, second in db.list_login():
+            print(f"A successful login on {month} / {day} / {year} at {hour} : {minute} : {second}")
+        return
+    dates = []
+    for point in ("first", "last"):
+        msg = f"Enter the month of the {point} date:"
+        month = ctt.get_user_input(msg, ctt.INT_TYPE, can_cancel=False)
+        msg = f"Enter what day of the month of the {point} date:"
+        day = ctt.get_user_input(msg, ctt.INT_TYPE, can_cancel=False)
+        msg = f"Enter the year of the {point} date:"
+        year = ctt.get_user_input(msg, ctt.INT_TYPE, can_cancel=False)
+        try:
+            dates.append(dt.datetime(year, month, day))
+        except ValueError:
+            print("That is not a valid date. Try again.")
+            return
+    start, end = dates[0], dates[1] + dt.timedelta(days=1, microseconds=-1)
+    for d in db.get_logins_between(start, end):
+        print(f"A successful login on {d.month} / {d.day} / {d.year} at {d.hour} : {d.minute} : {d.second}")
 
 
 def get_log_by_price(db: clss_pickle.DbHandle,
@@ -583,14 +691,27 @@ def get_log_by_price(db: clss_pickle.DbHandle,
                      *args, **kwargs):
     """
     Description:
-        gets and prints the log by price. not fully implemented.
+        gets and prints the most valuable entries of the log, most valuable first
     Parameters:
         :param db: an instance of pokemonCardLogger.clss_json.DbHandle or pokemonCardLogger.clss_pickle.DbHandle
         :param rq: an instance of pokemonCardLogger.clss_json.RqHandle or pokemonCardLogger.clss_pickle.RqHandle
         :return: None
     """
+    msg = "How many of the most valuable cards do you want to see? Enter 0 for the whole log"
+    n = ctt.get_user_input(msg, ctt.INT_TYPE)
+    if n is None:
+        print("Canceled.")
+        return
+    msg = "Select a price category:"
+    for index, category in enumerate(PRICE_CATEGORIES):
+        msg = f"{msg}\n{index} = {category}"
+    index = ctt.get_user_input(msg, ctt.INT_TYPE, can_cancel=False)
+    if not 0 <= index < len(PRICE_CATEGORIES):
+        print("Invalid entry. Try again.")
+        return
     print("This may take a while. Please be patient")
-    for card_id, print_type, qnty in db.get_log_by_total_value():
+    missing = []
+    for card_id, print_type, qnty, value in db.get_log_by_total_value(n or None, PRICE_CATEGORIES[index], missing):
         try:
             data = rq.get_card(card_id, select=("name", "set"))["data"]
         except ConnectionError:
@@ -598,7 +719,146 @@ def get_log_by_price(db: clss_pickle.DbHandle,
             return
         name = data["name"]
         pack = data["set"]["name"]
-        print(f"card name: {name} with print type: {print_type}; the pack of the card is: {pack}; count: {qnty}")
+        print(f"card name: {name} with print type: {print_type}; the pack of the card is: {pack}; count: {qnty}; value: ${value}")
+    if missing:
+        print(f"\n{len(missing)} cards have no {PRICE_CATEGORIES[index]} price and were left out")
+
+
+def get_collection_worth(db: clss_pickle.DbHandle, *args, **kwargs):
+    """
+    Description:
+        prints what the collection is worth in every price category, the collection is only valued the first time and
+        kept up to date after that, the prices can be requested again
+    Parameters:
+        :param db: an instance of pokemonCardLogger.clss_json.DbHandle or pokemonCardLogger.clss_pickle.DbHandle
+        :return: None
+    """
+    msg = "Would you like to request the prices again?('y' or 'n')"
+    if ctt.get_user_input(msg, ctt.BOOL_TYPE, can_cancel=False):
+        print("This may take a while. Please be patient")
+        print(f"The prices of {db.refresh_prices()} cards changed")
+    counts = db.collection_counts()
+    print("Your collection is worth:")
+    for key, total in db.collection_value().items():
+        if counts[key]:
+            print(f"\t{cents_to_dollars(total)} using {key} prices. There are {counts[key]} cards with this price category")
+
+
+def print_distribution(distribution, indent: str = ""):
+    """
+    Description:
+        prints the statistics of a price distribution
+    Parameters:
+        :param distribution: an instance of pricestats.PriceDistribution
+        :param indent: the text put before every line
+        :return: None
+    """
+    summary = distribution.summary()
+    estimate = "" if summary["exact"] else " (estimated)"
+    print(f"{indent}{summary['count']} cards worth {cents_to_dollars(summary['total'])}, the average price is {cents_to_dollars(summary['mean'])}")
+    print(f"{indent}the lowest price is {cents_to_dollars(summary['min'])} and the highest is {cents_to_dollars(summary['max'])}")
+    for percent, price in summary["percentiles"].items():
+        print(f"{indent}{percent}% of the cards cost at most {cents_to_dollars(price)}{estimate}")
+
+
+def get_price_stats(db: clss_pickle.DbHandle,
+                    rq: (clss_pickle.RqHandle, clss_base.RqHandle),
+                    *args, **kwargs):
+    """
+    Description:
+        prints the median, percentiles and a histogram of the price of a card in a price category, for the whole log and
+        each print type, the logs of other users on this computer can be added in
+    Parameters:
+        :param db: an instance of pokemonCardLogger.clss_json.DbHandle or pokemonCardLogger.clss_pickle.DbHandle
+        :param rq: an instance of pokemonCardLogger.clss_json.RqHandle or pokemonCardLogger.clss_pickle.RqHandle
+        :return: None
+    """
+    msg = "Select a price category:"
+    for index, category in enumerate(PRICE_CATEGORIES):
+        msg = f"{msg}\n{index} = {category}"
+    index = ctt.get_user_input(msg, ctt.INT_TYPE, can_cancel=False)
+    if not 0 <= index < len(PRICE_CATEGORIES):
+        print("Invalid entry. Try again.")
+        return
+    category = PRICE_CATEGORIES[index]
+    dbs = [db]
+    while ctt.get_user_input("Add the log of another user on this computer?('y' or 'n')", ctt.BOOL_TYPE, can_cancel=False):
+        other_user = ctt.get_user_input("Please enter the name of the user.", ctt.STR_TYPE)
+        if other_user is None:
+            break
+        backend, other_file = find_log(other_user)
+        if not os.path.exists(other_file) or other_file in (other_db.logfile for other_db in dbs):
+            print("That user has no log, or is already added.")
+            continue
+        print("Please enter the password of the user.")
+        try:
+            dbs.append(backend.DbHandle(other_file, getpass(">>> "), rq, read_only=True))
+        except PermissionError as e:
+            print(e)
+        except cryptography.fernet.InvalidToken:
+            print("Invalid password.")
+    print("This may take a while. Please be patient")
+    try:
+        stats = price_stats(*dbs, categories=(category, ))
+    finally:
+        for other_db in dbs[1:]:
+            other_db.close()
+    distribution = stats.distribution(category)
+    if not distribution.count:
+        print(f"No card has a {category} price.")
+        return
+    print(f"\nThe {category} price of a card:")
+    print_distribution(distribution, "\t")
+    print("Number of cards by price:")
+    for low, high, count in distribution.histogram():
+        print(f"\t{cents_to_dollars(low)} to {cents_to_dollars(high)}: {count}")
+    for print_type in stats.print_types(category):
+        print(f"\nThe {category} price of a {print_type} card:")
+        print_distribution(stats.distribution(category, print_type), "\t")
+    if stats.missing[category]:
+        print(f"\n{stats.missing[category]} cards have no {category} price and were left out")
+
+
+def group_log(db: clss_pickle.DbHandle, *args, **kwargs):
+    """
+    Description:
+        prints the number of cards and the value of each group of the log, by set, rarity, supertype, Pokémon type,
+        print type or release date, most valuable first
+    Parameters:
+        :param db: an instance of pokemonCardLogger.clss_json.DbHandle or pokemonCardLogger.clss_pickle.DbHandle
+        :return: None
+    """
+    group_keys = (
+        ("set_name", "set"), ("series", "series"), ("rarity", "rarity"), ("supertype", "supertype"),
+        ("type", "Pokémon type"), ("print_type", "print type"), ("release_year", "release year"),
+        ("release_date", "release date")
+    )
+    msg = "Group the log by:"
+    for index, (_, name) in enumerate(group_keys):
+        msg = f"{msg}\n{index} = {name}"
+    index = ctt.get_user_input(msg, ctt.INT_TYPE, can_cancel=False)
+    if not 0 <= index < len(group_keys):
+        print("Invalid entry. Try again.")
+        return
+    key, name = group_keys[index]
+    msg = "Select a price category, or enter nothing to only count the cards:"
+    for category_index, category in enumerate(PRICE_CATEGORIES):
+        msg = f"{msg}\n{category_index} = {category}"
+    category_index = ctt.get_user_input(msg, ctt.INT_TYPE)
+    if category_index is not None and not 0 <= category_index < len(PRICE_CATEGORIES):
+        print("Invalid entry. Try again.")
+        return
+    category = None if category_index is None else PRICE_CATEGORIES[category_index]
+    print("This may take a while the first time. Please be patient")
+    missing = []
+    groups = db.group_by(key, category, missing)
+    for group, totals in sorted(groups.items(), key=lambda item: (-item[1]["value"], -item[1]["cards"])):
+        msg = f"{name}: {'unknown' if group is None else group}; count: {totals['cards']} in {totals['entries']} entries"
+        if category is not None:
+            msg = f"{msg}; {category} value: {cents_to_dollars(totals['value'])} of {totals['priced']} cards"
+        print(msg)
+    if missing:
+        print(f"\n{len(missing)} entries have no metadata or no price, they are counted as unknown or left out of the value")
 
 
 def to_csv(db: clss_pickle.DbHandle, *args, **kwargs):
@@ -609,9 +869,11 @@ def to_csv(db: clss_pickle.DbHandle, *args, **kwargs):
         :param db: an instance of pokemonCardLogger.clss_json.DbHandle or pokemonCardLogger.clss_pickle.DbHandle
         :return: None
     """
+    msg = "Do you wish to include prices? this needs an internet connection ('y' or 'n')"
+    prices = ctt.get_user_input(msg, ctt.BOOL_TYPE, can_cancel=False)
     print("This may take a while. Please wait.")
     csv_file = f"pcllog-{db.user}.csv"
-    db.export_csv(os.path.join(documents_dir, csv_file))
+    db.export_csv(os.path.join(documents_dir, csv_file), prices=prices)
     print(f"\nThe location for the output file is in Documents. it is called: {csv_file}")
 
 
@@ -649,8 +911,15 @@ def from_csv(db: clss_pickle.DbHandle, *args, **kwargs):
         except RecursionError:
             print("To many retries. Try again.")
             return
+    msg = "Do you wish to only check the file without changing the log? ('y' or 'n')"
+    dry_run = ctt.get_user_input(msg, ctt.BOOL_TYPE, can_cancel=False)
     print("This may take a while. Please wait.")
-    print(f"The process was successful: {db.import_csv(path, output=True)}")
+    report = db.import_csv(path, output=True, dry_run=dry_run)
+    if not report:
+        print("The process was not successful.")
+        return
+    action = "would be set" if dry_run else "were set"
+    print(f"{report['rows']} rows were read, {report['cards']} cards {action}, {len(report['bad_rows'])} rows were skipped")
 
 
 def get_card_full_price(db: clss_pickle.DbHandle,
@@ -692,21 +961,10 @@ def get_full_price_in_collection(db: clss_pickle.DbHandle,
         :return: None
     """
     print("")
-    for row in db.get_log():
-        card_id = row[0]
-        print_type = row[1]
-        qnty = row[2]
-        try:
-            card_data = rq.get_card(card_id, select=("name", ))["data"]
-        except ConnectionError:
-            print("Connection Error. Try again.")
-            return
-        card_name = card_data["name"]
-        msg = f"The card id of the card is {card_id} card name is {card_name}, the current print type is {print_type}:"
-        print(msg)
-        for key, price in db.get_full_price_data(card_id, print_type):
-            msg = f"\tThe price data is {key} has a price of ${price} with a quantity of {qnty} the value of this card is ${round((price * qnty), 2)}"
-            print(msg)
+    value = Valuation(db)
+    for index in range(len(value)):
+        print_card_prices(value, index, "")
+    print_missing_prices(value)
 
 
 def get_full_price_in_collection_and_collection_value(db: clss_pickle.DbHandle,
@@ -721,29 +979,34 @@ def get_full_price_in_collection_and_collection_value(db: clss_pickle.DbHandle,
         :return: None
     """
     print("")
-    full_collection = {}
+    value = Valuation(db)
     print("The full collection:")
-    for card_id, print_type, qnty in db.get_log():
-        try:
-            card_data = rq.get_card(card_id, select=("name", ))["data"]
-        except ConnectionError:
-            print("Connection Error. Try again.")
-            return
-        card_name = card_data["name"]
-        msg = f"\tThe card id of the card is {card_id} card name is {card_name}, the current print type is {print_type}:"
-        print(msg)
-        for key, price in db.get_full_price_data(card_id, print_type):
-            msg = f"\t\tThe price data is {key} has a price of ${price} with a quantity of {qnty} the value of this card is ${round((price * qnty), 2)}"
-            print(msg)
-            fc = full_collection.get(key, {"fc": 0})["fc"]
-            fc = round(((price * qnty) + fc), 2)
-            count = full_collection.get(key, {"count": 0})["count"]
-            full_collection[key] = {"fc": fc, "count": count+qnty}
-    print("All prices put together: ")
-    for key, value in full_collection.items():
-        count = value["count"]
-        price = value["fc"]
-        print(f"\tAll {key} prices added up = ${round((price * qnty), 2)}. There are {count} cards with this price category")
+    for index in range(len(value)):
+        print_card_prices(value, index)
+    print_missing_prices(value)
+    print_price_totals(value)
+
+
+def get_trade_cards(rq: (clss_pickle.RqHandle, clss_base.RqHandle), user: str):
+    """
+    Description:
+        asks the user for the cards one side of a trade gives, until they enter nothing
+    Parameters:
+        :param rq:  instance of pokemonCardLogger.clss_json.RqHandle or pokemonCardLogger.clss_pickle.RqHandle
+        :param user: the name of the side, used in the prompts
+        :return: list of tuple card_id, print_type and qnty
+    """
+    cards = []
+    while True:
+        print(f"Select a card for {user}, enter nothing when {user} has no more cards to give")
+        card_id, print_type = get_card_id_and_print_type(rq)
+        if not card_id:
+            return cards
+        qnty = ctt.get_user_input("How many?", ctt.INT_TYPE)
+        if qnty is None or qnty <= 0:
+            print("Invalid quantity, the card was left out.")
+            continue
+        cards.append((card_id, print_type, qnty))
 
 
 def trade(db: clss_pickle.DbHandle,
@@ -751,52 +1014,71 @@ def trade(db: clss_pickle.DbHandle,
           *args, **kwargs):
     """
     Description:
-        trades a card with another user using a csv file for user two
+        trades cards with another user, whose log is either on this computer or a csv file
     Parameters:
         :param db: instance of pokemonCardLogger.clss_json.DbHandle or pokemonCardLogger.clss_pickle.DbHandle
         :param rq:  instance of pokemonCardLogger.clss_json.RqHandle or pokemonCardLogger.clss_pickle.RqHandle
         :return: None
     """
     print("")
-    other_db = clss_pickle.DbHandle(":memory:", "default", rq)
-    msg = "Please enter the path to the user two's csv file. Enter nothing to try again later."
-    csv_path = ctt.get_user_input(msg, ctt.STR_TYPE)
-    if csv_path is None:
-        print("Canceled.")
-        return
-    if not os.path.exists(csv_path) or os.path.isdir(csv_path):
-        print("Invalid path. Try using full path. Try again.")
-        return
-    print("Adding csv to memory. This may take a while. Please wait")
-    other_db.import_csv(csv_path)
-    print("Select a card for user one")
-    card_id, print_type = get_card_id_and_print_type(rq)
-    msg = "How many?"
-    qnty = ctt.get_user_input(msg, ctt.INT_TYPE)
-    print("Select a card for user two")
-    other_card_id, other_print_type = get_card_id_and_print_type(rq)
-    other_qnty = ctt.get_user_input(msg, ctt.INT_TYPE)
-    other_card_data = rq.get_card(other_card_id, select=("tcgplayer", ))["data"]
-    card_data = rq.get_card(card_id, select=("tcgplayer", ))["data"]
-    other_price_data = other_card_data["tcgplayer"]["prices"][print_type]["market"]
-    price_data = card_data["tcgplayer"]["prices"][print_type]["market"]
-    trade_value = round((price_data - other_price_data), 2)
-    if trade_value < 0:
-        trade_value = round((other_price_data - price_data), 2)
-        print(f"the trade value is tipped in favor of user two by ${trade_value}")
-    else:
-        print(f"the trade value is tipped in favor of user one by ${trade_value}")
-    msg = "do you wish to continue?"
-
-    if not ctt.get_user_input(msg, ctt.BOOL_TYPE):
-        print("Canceled.")
-        return
-    trade_code = db.trade(other_db, other_card_id, other_print_type, other_qnty, card_id, print_type, qnty)
-    if trade_code != clss_base.TRADE_SUCCESS:
-        print(f"Process failed. Fail code {trade_code}")
+    csv_path = None
+    msg = "Is user two's log on this computer? ('y' or 'n', 'n' to use user two's csv file)"
+    if ctt.get_user_input(msg, ctt.BOOL_TYPE, can_cancel=False):
+        msg = "Please enter the name of user two. Enter nothing to try again later."
+        other_user = ctt.get_user_input(msg, ctt.STR_TYPE)
+        if other_user is None:
+            print("Canceled.")
+            return
+        backend, other_file = find_log(other_user)
+        if not os.path.exists(other_file) or other_file == db.logfile:
+            print("That user has no log, or is you. Try again.")
+            return
+        print("Please enter password for user two.")
+        try:
+            other_db = backend.DbHandle(other_file, getpass(">>> "), rq)
+        except PermissionError as e:
+            print(e)
+            return
+        except cryptography.fernet.InvalidToken:
+            print("Invalid password. Try again.")
+            return
     else:
-        print("Process successful. Saving user two's updated csv.")
-        other_db.export_csv(csv_path)
+        msg = "Please enter the path to the user two's csv file. Enter nothing to try again later."
+        csv_path = ctt.get_user_input(msg, ctt.STR_TYPE)
+        if csv_path is None:
+            print("Canceled.")
+            return
+        if not os.path.exists(csv_path) or os.path.isdir(csv_path):
+            print("Invalid path. Try using full path. Try again.")
+            return
+        other_db = clss_pickle.DbHandle(":memory:", "default", rq)
+        print("Adding csv to memory. This may take a while. Please wait")
+        other_db.import_csv(csv_path, output=False)
+    try:
+        give = get_trade_cards(rq, "user one")
+        take = get_trade_cards(rq, "user two")
+        summary = db.trade_summary(give, take)
+        print(f"user one gives ${summary['give']} and gets ${summary['take']}")
+        if summary["difference"] < 0:
+            print(f"the trade value is tipped in favor of user two by ${-summary['difference']}")
+        else:
+            print(f"the trade value is tipped in favor of user one by ${summary['difference']}")
+        for card_id, print_type, reason in summary["missing"]:
+            print(f"{card_id} {print_type} was left out of the values: {reason}")
+        msg = "do you wish to continue?"
+        if not ctt.get_user_input(msg, ctt.BOOL_TYPE):
+            print("Canceled.")
+            return
+        trade_code = db.trade_cards(other_db, give, take)
+        if trade_code != clss_base.TRADE_SUCCESS:
+            print(f"Process failed. Fail code {trade_code}")
+        elif csv_path is not None:
+            print("Process successful. Saving user two's updated csv.")
+            other_db.export_csv(csv_path)
+        else:
+            print("Process successful.")
+    finally:
+        other_db.close()
 
 
 def get_energy_id_and_print_type(rq: (clss_pickle.RqHandle, clss_base.RqHandle), *args, **kwargs):
@@ -941,6 +1223,23 @@ def full_len(db: clss_pickle.DbHandle, *args, **kwargs):
     print(f"\nThe full size of the log including energy log and regular log, is {len(db)}")
 
 
+def log_stats(db: clss_pickle.DbHandle, *args, **kwargs):
+    """
+    Description:
+        prints out the running totals of the log
+    Parameters:
+        :param db: instance of pokemonCardLogger.clss_pickle.DbHandle or pokemonCardLogger.clss_sqlite.DbHandle
+        :return: None
+    """
+    stats = db.stats()
+    print(f"\nThere are {stats['cards']} cards in {stats['entries']} entries in the log")
+    for print_type, qnty in stats["print_types"].items():
+        print(f"\t{qnty} of them are {print_type}")
+    print(f"There are {stats['energy']} energy cards in {stats['energy_entries']} entries in the energy log")
+    for energy_type, qnty in stats["energy_types"].items():
+        print(f"\t{qnty} of them are {ENERGY_TYPES.get(energy_type, energy_type)} energy")
+
+
 def preload_log(db: clss_pickle.DbHandle, rq: (clss_pickle.RqHandle, clss_base.RqHandle), *args, **kwargs):
     print("\nThis may take a while. Please wait.")
     print("Loading packs.")
@@ -949,6 +1248,7 @@ def preload_log(db: clss_pickle.DbHandle, rq: (clss_pickle.RqHandle, clss_base.R
             try:
                 _ = rq.get_pack(pid)
                 _ = rq.get_pack(pid, select=("name", ))
+                _ = rq.get_set_cards(pid)
             except ConnectionError:
                 print(f"Failed on pack {pid}. Retrying.")
                 try:
@@ -983,49 +1283,70 @@ def preload_log(db: clss_pickle.DbHandle, rq: (clss_pickle.RqHandle, clss_base.R
 
 def collection_price_average_full(db: clss_pickle.DbHandle, rq: (clss_pickle.RqHandle, clss_base.RqHandle), *args, **kwargs):
     print("")
-    full_collection = {}
+    value = Valuation(db)
     print("The full collection:")
-    for card_id, print_type, qnty in db.get_log():
-        try:
-            card_data = rq.get_card(card_id, select=("name", ))["data"]
-        except ConnectionError:
-            print("Connection Error. Try again.")
-            return
-        card_name = card_data["name"]
-        msg = f"\tThe card id of the card is {card_id} card name is {card_name}, the current print type is {print_type}:"
-        print(msg)
-        for key, price in db.get_full_price_data(card_id, print_type):
-            msg = f"\t\tThe price data is {key} has a price of ${price} with a quantity of {qnty} the value of this card is ${round((price * qnty), 2)}"
-            print(msg)
-            fc = full_collection.get(key, {"fc": 0})["fc"]
-            fc = round(((price * qnty) + fc), 2)
-            count = full_collection.get(key, {"count": 0})["count"]
-            full_collection[key] = {"fc": fc, "count": count + qnty}
-    print("All prices put together: ")
-    for key, value in full_collection.items():
-        count = value["count"]
-        price = value["fc"]
-        print(
-            f"\tAll {key} prices added up = ${round((price * qnty), 2)}. There are {count} cards with this price category")
-        print(f"\tThe average of {key} prices are ${round(((price * qnty) / count), 2)}")
+    for index in range(len(value)):
+        print_card_prices(value, index)
+    print_missing_prices(value)
+    print_price_totals(value, averages=True)
 
 
 def collection_average_price(db: clss_pickle.DbHandle, rq: (clss_pickle.RqHandle, clss_base.RqHandle), *args, **kwargs):
     print("")
     print("Full collection:")
-    t_price = 0
-    count = 0
-    for card_id, print_type, qnty, price in db.log_with_prices(db.get_log()):
-        t_price += price
-        count += qnty
-        try:
-            card_name = rq.get_card(card_id, select=("name", ))["data"]["name"]
-        except ConnectionError:
-            print("Connection Error. Try again.")
-            return
-        msg = f"\tThe card {card_id} who's card name is {card_name}, has a price of ${round(price, 2)}, with a quantity of {qnty}, the value is {round((price * qnty), 2)}"
+    value = Valuation(db, categories=("market", ))
+    for card_id, print_type, qnty, price, card_value in value.card_values("market"):
+        if price is None:
+            continue
+        msg = f"\tThe card {card_id} who's card name is {value.names[card_id]}, has a price of {cents_to_dollars(price)}, with a quantity of {qnty}, the value is {cents_to_dollars(card_value)}"
         print(msg)
-    print(f"\nThe average market price of your log is ${round((t_price / count), 2)} based on a price of ${round(t_price, 2)} amd a count of {count}")
+    print_missing_prices(value)
+    count = value.counts()["market"]
+    if not count:
+        return
+    total = value.totals()["market"]
+    print(f"\nThe average market price of your log is {cents_to_dollars(value.averages()['market'])} based on a price of {cents_to_dollars(total)} amd a count of {count}")
+
+
+def set_completion(db: clss_pickle.DbHandle, *args, **kwargs):
+    """
+    Description:
+        prints out how complete a set is and which card numbers are missing
+    Parameters:
+        :param db: instance of pokemonCardLogger.clss_pickle.DbHandle or pokemonCardLogger.clss_sqlite.DbHandle
+        :return: None
+    """
+    msg = "Please type the pack id of the set. If you dont know what that is use list packs from the resource menu:"
+    set_id = ctt.get_user_input(msg, ctt.STR_TYPE)
+    if set_id is None:
+        print("Canceled.")
+        return
+    try:
+        owned, total, missing = db.get_set_completion(set_id)
+    except ConnectionError:
+        print("Either the pack is invalid, or your connection to the api has failed. Try again.")
+        return
+    print(f"\nYou have {owned} of the {total} cards in {set_id}")
+    if missing:
+        print(f"The missing card numbers are: {', '.join(missing)}")
+
+
+def all_set_completion(db: clss_pickle.DbHandle, *args, **kwargs):
+    """
+    Description:
+        prints out how complete every set is
+    Parameters:
+        :param db: instance of pokemonCardLogger.clss_pickle.DbHandle or pokemonCardLogger.clss_sqlite.DbHandle
+        :return: None
+    """
+    print("\nIf the card lists have not been preloaded, this may take a while. Please wait.")
+    msg = "Only show sets you have cards from? ('y' or 'n')"
+    owned_only = ctt.get_user_input(msg, ctt.BOOL_TYPE, can_cancel=False)
+    try:
+        for set_id, set_name, owned, total, missing in db.get_all_set_completion(owned_only):
+            print(f"the pack {set_name} ({set_id}) has {owned} of {total} cards, missing {len(missing)}")
+    except ConnectionError:
+        print("Connection Error. Try again.")
 
 
 def dummy(*args, **kwargs):
@@ -1095,10 +1416,19 @@ def main():
         "avg price": collection_average_price,
         "go back": dummy,
         "backup put": backup,
-        "backup get": restore
+        "backup get": restore,
+        "set completion": set_completion,
+        "all set completion": all_set_completion,
+        "log stats": log_stats,
+        "log by price": get_log_by_price,
+        "collection worth": get_collection_worth,
+        "price stats": get_price_stats,
+        "group log": group_log
     }
     while True:
         mode = menu_mode()
+        if db.refresh():
+            print("The log was changed by another program, those changes were loaded.")
         func = switch[mode]
         func(db=db, rq=rq)
 
@@ -0,0 +1,164 @@
+"""
+Description:
+    Copies clss_pickle logs into another storage backend without going online
+    The cards of a log are read a set at a time where its format allows it, so a log is never held in memory twice,
+    and every copy is read back and checked against the source by its entry count, card total, energy total and a
+    checksum of its rows. A whole folder of users can be migrated in parallel, one process per log
+    clss_pickle logs are moved to the current file format by opening them, so clss_pickle is not a target
+    main.py finds the log of a user by its file extension, and opens the copy instead of the clss_pickle log once
+    there is one, the clss_pickle log is left as it was
+Usage:
+    python3 migrate.py <backend> [folder]
+    from pokemonCardLogger import migrate
+"""
+import sys
+import importlib
+from getpass import getpass
+from concurrent.futures import ProcessPoolExecutor
+from cryptography.fernet import InvalidToken
+import clss_base
+import logformat
+from clss_base import *
+
+SOURCE_SUFFIX = BACKEND_SUFFIXES["clss_pickle"]
+TARGET_SUFFIXES = {backend: suffix for backend, suffix in BACKEND_SUFFIXES.items() if backend != "clss_pickle"}
+
+
+def source_checksum(pickle_file: str, key: bytes):
+    """
+    Description:
+        sums up a clss_pickle log into counts and a checksum, reading its cards a set at a time
+        raises cryptography.fernet.InvalidToken if the key is wrong, and ValueError if the log is malformed
+    Parameters:
+        :param pickle_file: the path to the clss_pickle log file
+        :param key: the key of the log
+        :return: dictionary of the entry count, card total and checksum of the card log, and the energy total
+    """
+    with open(pickle_file, "rb") as f:
+        contents = Fernet(key).decrypt(f.read())
+    logdict, rows = logformat.stream_log(contents)
+    del contents
+    checksum = logformat.log_checksum(rows)
+    checksum["energy"] = sum(qnty for print_types in logdict["energy"].values() for qnty in print_types.values())
+    return checksum
+
+
+def migrate_log(pickle_file: str, destination: str, psswrd: str, backend: str = "clss_sqlite"):
+    """
+    Description:
+        copies a clss_pickle log into a new log of another backend, then reopens the copy and checks it
+        raises ValueError if the backend is unknown, the destination already exists, or the copy does not match
+    Parameters:
+        :param pickle_file: the path to the clss_pickle log file
+        :param destination: the path to the new log
+        :param psswrd: the password of the log, the copy uses the same password
+        :param backend: one of the keys of TARGET_SUFFIXES
+        :return: dictionary of the entry count, card total and checksum of the card log, and the energy total
+    """
+    if backend not in TARGET_SUFFIXES:
+        raise ValueError(f"unknown backend {backend}")
+    if os.path.exists(destination):
+        raise ValueError(f"{destination} already exists")
+    expected = source_checksum(pickle_file, derive_key(psswrd))
+    module = importlib.import_module(backend)
+    rq = RqHandle(clss_base.API_KEY)
+    db = module.DbHandle(destination, psswrd, rq)
+    try:
+        db.migrate_pickle(pickle_file)
+    finally:
+        db.close()
+    db = module.DbHandle(destination, psswrd, rq)
+    try:
+        copied = db.log_checksum()
+    finally:
+        db.close()
+    if copied != expected:
+        raise ValueError(f"the copy in {destination} does not match: expected {expected}, found {copied}")
+    return copied
+
+
+def find_users(folder: str = prog_data):
+    """
+    Description:
+        finds the users that have a clss_pickle log in a folder
+    Parameters:
+        :param folder: the folder of the logs
+        :return: sorted list of user names
+    """
+    return sorted(name[:-len(SOURCE_SUFFIX)] for name in os.listdir(folder) if name.endswith(SOURCE_SUFFIX))
+
+
+def _migrate_user(api_key: str, iterations: int, pickle_file: str, destination: str, psswrd: str, backend: str):
+    """
+    Description:
+        migrates one log in a worker process, which has to set up the module globals itself
+    Parameters:
+        :param api_key: the api key of the parent process
+        :param iterations: the password iterations of the parent process
+        :param pickle_file: the path to the clss_pickle log file
+        :param destination: the path to the new log
+        :param psswrd: the password of the log
+        :param backend: one of the keys of TARGET_SUFFIXES
+        :return: tuple of the checksum of the copy and None, or None and the reason the migration failed
+    """
+    init(api_key, iterations)
+    try:
+        return migrate_log(pickle_file, destination, psswrd, backend), None
+    except InvalidToken:
+        return None, "wrong password"
+    except (ValueError, OSError) as e:
+        return None, str(e)
+
+
+def migrate_folder(backend: str, passwords: dict, folder: str = prog_data, workers: int = None):
+    """
+    Description:
+        migrates the clss_pickle log of every user of a folder in parallel, the copies are made next to the old logs
+        and the old logs are left untouched
+    Parameters:
+        :param backend: one of the keys of TARGET_SUFFIXES
+        :param passwords: dictionary of user names to passwords, users that are not in it are skipped
+        :param folder: the folder of the logs
+        :param workers: the number of processes, defaults to the number of processors
+        :return: dictionary of user names to tuple of the checksum of the copy and None, or None and the reason the
+        migration failed
+    """
+    if backend not in TARGET_SUFFIXES:
+        raise ValueError(f"unknown backend {backend}")
+    results = {}
+    with ProcessPoolExecutor(workers) as executor:
+        futures = {
+            user: executor.submit(
+                _migrate_user,
+                clss_base.API_KEY,
+                clss_base.ITERATIONS,
+                os.path.join(folder, f"{user}{SOURCE_SUFFIX}"),
+                os.path.join(folder, f"{user}{TARGET_SUFFIXES[backend]}"),
+                psswrd,
+                backend
+            )
+            for user, psswrd in passwords.items()
+        }
+        for user, future in futures.items():
+            results[user] = future.result()
+    return results
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] not in TARGET_SUFFIXES:
+        print(f"usage: python3 migrate.py <{'|'.join(TARGET_SUFFIXES)}> [folder]")
+        print("main.py opens the copy of a log instead of the clss_pickle log once it exists")
+        quit(1)
+    init(clss_base.API_KEY)
+    _folder = sys.argv[2] if len(sys.argv) > 2 else prog_data
+    _passwords = {}
+    for _user in find_users(_folder):
+        print(f"Please enter the password of the user {_user}. Enter nothing to skip the user.")
+        _psswrd = getpass(">>> ")
+        if _psswrd:
+            _passwords[_user] = _psswrd
+    for _user, (_checksum, _error) in migrate_folder(sys.argv[1], _passwords, _folder).items():
+        if _error is None:
+            print(f"{_user}: copied {_checksum['entries']} entries, {_checksum['cards']} cards and {_checksum['energy']} energy")
+        else:
+            print(f"{_user}: failed, {_error}")
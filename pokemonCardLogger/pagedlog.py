@@ -0,0 +1,530 @@
+"""
+Description:
+    A card log that is read lazily from a memory mapped file, or from a folder of shard files
+    Every set of the log is stored as its own encrypted page, and an encrypted footer holds the page index, the
+    running totals and the rest of the log dictionary. Opening a log only decrypts the footer, pages are decrypted the
+    first time a card of their set is used, and pages that were not changed are copied as is when saving
+    The sharded version keeps each page in its own file and the footer in a manifest file, so saving only writes the
+    shards of the sets that were changed
+File layout:
+    MAGIC, the pages, the footer, then the trailer of the footer offset, the footer length and MAGIC
+Folder layout:
+    the manifest file and one file per set named after a hash of the set id and the generation it was written in
+Usage:
+    from pagedlog import PagedCardLog, ShardedCardLog
+"""
+import os
+import sys
+import json
+import mmap
+import struct
+import hashlib
+import contextlib
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+from cardlog import CardLog, _SetBlock, split_card_id, PRINT_TYPE_BITS
+
+MAGIC = b"PCLPAGED"
+PAGED_VERSION = 1
+TRAILER = struct.Struct("<QQ8s")
+MANIFEST = "manifest"
+SHARD_SUFFIX = ".shard"
+SHARD_KEEP_GENERATIONS = 8
+
+
+def shard_name(set_id: str, generation: int):
+    """
+    Description:
+        gets the file name of the shard of a set, set ids are hashed so they are always safe file names
+    Parameters:
+        :param set_id: the id of the set according to pokemonTcgApi
+        :param generation: the generation of the log the shard was written in
+        :return: string of the file name
+    """
+    return f"{hashlib.sha1(set_id.encode('utf-8')).hexdigest()[:16]}.{generation}{SHARD_SUFFIX}"
+
+
+def _write_file(file: str, contents: bytes):
+    """
+    Description:
+        writes a file in one step, so it is never left half written
+    Parameters:
+        :param file: the path to the file
+        :param contents: the bytes to write
+        :return: None
+    """
+    temp_file = f"{file}.tmp"
+    with open(temp_file, "wb") as f:
+        f.write(contents)
+    os.replace(temp_file, file)
+
+
+def _dump_footer(footer: dict):
+    """
+    Description:
+        packs a footer as json, so opening a log never runs code from the file
+    Parameters:
+        :param footer: the footer dictionary
+        :return: bytes of the footer
+    """
+    return json.dumps(footer).encode("utf-8")
+
+
+def _load_footer(contents: bytes):
+    """
+    Description:
+        unpacks a footer, raises ValueError if it is not a json footer, footers are never unpickled so opening a log
+        can not run code from the file
+    Parameters:
+        :param contents: the decrypted bytes of the footer
+        :return: the footer dictionary
+    """
+    try:
+        footer = json.loads(contents)
+    except (UnicodeDecodeError, json.JSONDecodeError):
+        raise ValueError("the footer of the log is not in a known format") from None
+    if not isinstance(footer, dict):
+        raise ValueError("the footer of the log is not in a known format")
+    return footer
+
+
+def is_paged_file(file: str):
+    """
+    Description:
+        checks if a file is a paged log file
+    Parameters:
+        :param file: the path to the file
+        :return: bool based on if the file starts with the paged log header
+    """
+    if not os.path.isfile(file):
+        return False
+    with open(file, "rb") as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+class _LazySets:
+    """
+    Description:
+        the set blocks of a paged log, pages that are not loaded yet are only kept as their index entry
+        implements the part of the dictionary interface that CardLog uses
+    """
+    __slots__ = ("loaded", "pages", "load")
+
+    def __init__(self, load):
+        """
+        Description:
+            Constructor method
+        Parameters:
+            :param load: function taking a set id and its index entry, and returning the set block of the page
+        """
+        self.loaded = {}
+        self.pages = {}
+        self.load = load
+
+    def __len__(self):
+        return len(self.loaded) + len(self.pages)
+
+    def __contains__(self, set_id):
+        return set_id in self.loaded or set_id in self.pages
+
+    def __iter__(self):
+        return self.keys()
+
+    def __getitem__(self, set_id: str):
+        block = self.get(set_id)
+        if block is None:
+            raise KeyError(set_id)
+        return block
+
+    def __setitem__(self, set_id: str, block: _SetBlock):
+        self.pages.pop(set_id, None)
+        self.loaded[set_id] = block
+
+    def __delitem__(self, set_id: str):
+        if self.pages.pop(set_id, None) is None:
+            del self.loaded[set_id]
+
+    def get(self, set_id: str, default=None):
+        block = self.loaded.get(set_id)
+        if block is None:
+            page = self.pages.pop(set_id, None)
+            if page is None:
+                return default
+            block = self.loaded[set_id] = self.load(set_id, page)
+        return block
+
+    def keys(self):
+        yield from list(self.loaded)
+        yield from list(self.pages)
+
+    def values(self):
+        for _, block in self.items():
+            yield block
+
+    def items(self):
+        for set_id in self.keys():
+            block = self.get(set_id)
+            if block is not None:
+                yield set_id, block
+
+
+class PagedCardLog(CardLog):
+    """
+    Description:
+        a card log whose sets are loaded from a memory mapped page file the first time they are used
+    """
+    __slots__ = ("_source", "_index", "_dirty", "_fernet", "_generation")
+
+    def __init__(self):
+        """
+        Description:
+            Constructor method
+        """
+        super().__init__()
+        self._sets = _LazySets(self._load_page)
+        self._source = None
+        self._index = {}
+        self._dirty = set()
+        self._fernet = None
+        self._generation = 0
+
+    def __repr__(self):
+        return f"PagedCardLog({len(self)} entries, {len(self._sets.loaded)} of {len(self._sets)} sets loaded)"
+
+    def set(self, card_id: str, print_type: str, qnty: int):
+        self._dirty.add(split_card_id(card_id)[0])
+        super().set(card_id, print_type, qnty)
+
+    def pop(self, card_id: str, print_type: str):
+        self._dirty.add(split_card_id(card_id)[0])
+        return super().pop(card_id, print_type)
+
+    def loaded_set_count(self):
+        """
+        Description:
+            gets how many sets have had their page loaded
+        Parameters:
+            :return: int of the number of loaded sets
+        """
+        return len(self._sets.loaded)
+
+    def _load_page(self, set_id: str, page: tuple):
+        """
+        Description:
+            decrypts and unpacks the page of a set from the memory mapped file
+        Parameters:
+            :param set_id: the id of the set according to pokemonTcgApi
+            :param page: the index entry of the page
+            :return: the set block of the page
+        """
+        offset, length, _, _ = page
+        return self._decode_page(self._fernet.decrypt(self._source[offset:offset + length]))
+
+    @staticmethod
+    def _page_totals(block: _SetBlock):
+        """
+        Description:
+            gets the totals of each print type of a set, for the page index
+        Parameters:
+            :param block: the entries of the set
+            :return: tuple of tuple print type code and total quantity
+        """
+        mask = (1 << PRINT_TYPE_BITS) - 1
+        totals = {}
+        for key, qnty in zip(block.keys, block.qnty):
+            totals[key & mask] = totals.get(key & mask, 0) + qnty
+        return tuple(sorted(totals.items()))
+
+    def _check_blocks(self, print_type_totals: array):
+        """
+        Description:
+            checks every loaded set of the log, pages that are not loaded are checked against their index entry only
+        Parameters:
+            :param print_type_totals: the print type totals to add the entries to
+            :return: the number of entries of the log
+        """
+        entries = sum(
+            self._check_block(set_id, block, print_type_totals) for set_id, block in self._sets.loaded.items()
+        )
+        for set_id, (_, _, page_entries, page_totals) in self._sets.pages.items():
+            if page_entries <= 0:
+                raise ValueError(f"empty page for set {set_id}")
+            for code, qnty in page_totals:
+                if code >= len(print_type_totals):
+                    raise ValueError(f"unknown print type code for set {set_id}")
+                print_type_totals[code] += qnty
+            entries += page_entries
+        return entries
+
+    @classmethod
+    def open(cls, file: str, fernet):
+        """
+        Description:
+            opens a paged log file, only the footer is decrypted
+            raises cryptography.fernet.InvalidToken if the key is wrong, and ValueError if the file is not a paged log
+        Parameters:
+            :param file: the path to the paged log file
+            :param fernet: an instance of Fernet with the key of the log
+            :return: tuple of the card log and the rest of the log dictionary
+        """
+        with open(file, "rb") as f:
+            source = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(source) < len(MAGIC) + TRAILER.size or source[:len(MAGIC)] != MAGIC:
+            source.close()
+            raise ValueError(f"{file} is not a paged log file")
+        footer_offset, footer_length, magic = TRAILER.unpack_from(source, len(source) - TRAILER.size)
+        if magic != MAGIC:
+            source.close()
+            raise ValueError(f"{file} is not a complete paged log file")
+        try:
+            footer = _load_footer(fernet.decrypt(source[footer_offset:footer_offset + footer_length]))
+        except Exception:
+            source.close()
+            raise
+        if footer["version"] > PAGED_VERSION:
+            source.close()
+            raise ValueError(f"{file} was made by a newer version")
+        card_log = cls._from_footer(footer, fernet)
+        card_log._source = source
+        return card_log, footer["logdict"]
+
+    @classmethod
+    def _from_footer(cls, footer: dict, fernet):
+        """
+        Description:
+            builds a card log with no loaded pages from a footer
+        Parameters:
+            :param footer: the decrypted footer dictionary
+            :param fernet: an instance of Fernet with the key of the log
+            :return: a new instance of the class
+        """
+        card_log = cls()
+        card_log._fernet = fernet
+        card_log._generation = footer.get("generation", 0)
+        card_log._index = footer["index"]
+        card_log._print_types = list(footer["print_types"])
+        card_log._print_type_codes = {print_type: code for code, print_type in enumerate(card_log._print_types)}
+        card_log._print_type_totals = array("q", footer["print_type_totals"])
+        card_log._entries = footer["entries"]
+        card_log._total = footer["total"]
+        card_log._sets.pages = dict(footer["index"])
+        return card_log
+
+    def _footer(self, index: dict, logdict: dict):
+        """
+        Description:
+            builds the footer of the log
+        Parameters:
+            :param index: the page index
+            :param logdict: the rest of the log dictionary
+            :return: the footer dictionary
+        """
+        return {
+            "version": PAGED_VERSION,
+            "generation": self._generation,
+            "print_types": self._print_types,
+            "print_type_totals": self._print_type_totals.tolist(),
+            "entries": self._entries,
+            "total": self._total,
+            "index": index,
+            "logdict": logdict
+        }
+
+    def _is_clean(self, set_id: str):
+        """
+        Description:
+            checks if the stored page of a set can be kept as is when saving
+        Parameters:
+            :param set_id: the id of the set according to pokemonTcgApi
+            :return: bool based on if the set was not changed since it was last written
+        """
+        return set_id in self._sets.pages or (set_id not in self._dirty and set_id in self._index)
+
+    def write(self, file: str, fernet, logdict: dict):
+        """
+        Description:
+            writes the log to a paged log file, pages of sets that were not changed are copied without being
+            decrypted, the file is replaced in one step so it is never left half written
+        Parameters:
+            :param file: the path to the paged log file
+            :param fernet: an instance of Fernet with the key of the log
+            :param logdict: the rest of the log dictionary, kept in the footer
+            :return: None
+        """
+        temp_file = f"{file}.tmp"
+        index = {}
+        self._generation += 1
+        with open(temp_file, "wb") as f:
+            f.write(MAGIC)
+            offset = len(MAGIC)
+            for set_id in self._sets.keys():
+                if self._is_clean(set_id):
+                    page_offset, length, entries, totals = self._index[set_id]
+                    token = self._source[page_offset:page_offset + length]
+                else:
+                    block = self._sets.loaded[set_id]
+                    token = fernet.encrypt(self._encode_page(block))
+                    entries = len(block.keys)
+                    totals = self._page_totals(block)
+                index[set_id] = (offset, len(token), entries, totals)
+                f.write(token)
+                offset += len(token)
+            footer = fernet.encrypt(_dump_footer(self._footer(index, logdict)))
+            f.write(footer)
+            f.write(TRAILER.pack(offset, len(footer), MAGIC))
+        self.close()
+        os.replace(temp_file, file)
+        with open(file, "rb") as f:
+            self._source = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._fernet = fernet
+        self._index = index
+        self._sets.pages = {set_id: index[set_id] for set_id in self._sets.pages}
+        self._dirty.clear()
+
+    def close(self):
+        """
+        Description:
+            closes the memory map of the file, pages that are not loaded cannot be read after this
+        Parameters:
+            :return: None
+        """
+        if self._source is not None:
+            self._source.close()
+            self._source = None
+
+
+class ShardedCardLog(PagedCardLog):
+    """
+    Description:
+        a card log kept in a folder with one encrypted shard file per set and an encrypted manifest
+        saving writes only the shards of changed sets and then replaces the manifest, so the folder always holds a
+        complete log, and shards can be read in parallel
+        replaced shards are kept for SHARD_KEEP_GENERATIONS saves, so other processes that opened an older manifest
+        can still read them
+    """
+    __slots__ = ("_folder", "_retired")
+
+    def __init__(self):
+        """
+        Description:
+            Constructor method
+        """
+        super().__init__()
+        self._folder = None
+        self._retired = []
+
+    def __repr__(self):
+        return f"ShardedCardLog({len(self)} entries, {len(self._sets.loaded)} of {len(self._sets)} sets loaded)"
+
+    def _read_shard(self, page: tuple):
+        """
+        Description:
+            reads and decrypts a shard file
+        Parameters:
+            :param page: the index entry of the shard
+            :return: bytes of the page
+        """
+        with open(os.path.join(self._folder, page[0]), "rb") as f:
+            return self._fernet.decrypt(f.read())
+
+    def _load_page(self, set_id: str, page: tuple):
+        """
+        Description:
+            reads the shard of a set
+        Parameters:
+            :param set_id: the id of the set according to pokemonTcgApi
+            :param page: the index entry of the shard
+            :return: the set block of the shard
+        """
+        return self._decode_page(self._read_shard(page))
+
+    def load_all(self, workers: int = None):
+        """
+        Description:
+            loads every shard that is not loaded yet, reading and decrypting the shards in parallel
+        Parameters:
+            :param workers: the number of threads to use, defaults to the ThreadPoolExecutor default
+            :return: the number of shards that were loaded
+        """
+        pages = list(self._sets.pages.items())
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for (set_id, _), page in zip(pages, executor.map(self._read_shard, (page for _, page in pages))):
+                self._sets[set_id] = self._decode_page(page)
+        return len(pages)
+
+    @classmethod
+    def open(cls, folder: str, fernet):
+        """
+        Description:
+            opens a sharded log folder, only the manifest is decrypted
+            raises cryptography.fernet.InvalidToken if the key is wrong
+        Parameters:
+            :param folder: the path to the log folder
+            :param fernet: an instance of Fernet with the key of the log
+            :return: tuple of the card log and the rest of the log dictionary
+        """
+        with open(os.path.join(folder, MANIFEST), "rb") as f:
+            footer = _load_footer(fernet.decrypt(f.read()))
+        if footer["version"] > PAGED_VERSION:
+            raise ValueError(f"{folder} was made by a newer version")
+        card_log = cls._from_footer(footer, fernet)
+        card_log._folder = folder
+        card_log._retired = footer.get("retired", [])
+        return card_log, footer["logdict"]
+
+    def _footer(self, index: dict, logdict: dict):
+        """
+        Description:
+            builds the manifest of the log
+        Parameters:
+            :param index: the shard index
+            :param logdict: the rest of the log dictionary
+            :return: the manifest dictionary
+        """
+        footer = super()._footer(index, logdict)
+        footer["retired"] = self._retired
+        return footer
+
+    def write(self, folder: str, fernet, logdict: dict):
+        """
+        Description:
+            writes the shards of the sets that were changed, then the manifest, then removes shards that are no longer
+            used
+        Parameters:
+            :param folder: the path to the log folder
+            :param fernet: an instance of Fernet with the key of the log
+            :param logdict: the rest of the log dictionary, kept in the manifest
+            :return: the number of shards that were written
+        """
+        os.makedirs(folder, exist_ok=True)
+        if folder != self._folder:
+            self.load_all()
+            self._index = {}
+        self._generation += 1
+        index = {}
+        written = 0
+        for set_id in self._sets.keys():
+            if self._is_clean(set_id):
+                index[set_id] = self._index[set_id]
+                continue
+            block = self._sets.loaded[set_id]
+            file_name = shard_name(set_id, self._generation)
+            _write_file(os.path.join(folder, file_name), fernet.encrypt(self._encode_page(block)))
+            index[set_id] = (file_name, self._generation, len(block.keys), self._page_totals(block))
+            written += 1
+        used = {page[0] for page in index.values()}
+        retired = [(file_name, generation) for file_name, generation in self._retired if file_name not in used]
+        retired.extend((page[0], self._generation) for page in self._index.values() if page[0] not in used)
+        oldest = self._generation - SHARD_KEEP_GENERATIONS
+        removed = [file_name for file_name, generation in retired if generation <= oldest]
+        self._retired = [(file_name, generation) for file_name, generation in retired if file_name not in removed]
+        _write_file(os.path.join(folder, MANIFEST), fernet.encrypt(_dump_footer(self._footer(index, logdict))))
+        for file_name in removed:
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(os.path.join(folder, file_name))
+        self._folder = folder
+        self._fernet = fernet
+        self._index = index
+        self._sets.pages = {set_id: index[set_id] for set_id in self._sets.pages}
+        self._dirty.clear()
+        return written
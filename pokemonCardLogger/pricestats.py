@@ -0,0 +1,427 @@
+"""
+Description:
+    Distribution statistics of the price of a card of a log, its median, percentiles and histograms, weighted by
+    quantity and broken down by price category and print type
+    Prices are added as the log is streamed, so the prices of a log are never held in memory. A distribution keeps the
+    exact quantity of every distinct price until it has more than EXACT_LIMIT of them, then it turns into a sketch that
+    puts prices into logarithmic buckets, which answers percentiles within a relative error of its accuracy in a fixed
+    amount of memory. Distributions of the same accuracy merge into one, so the logs of several users can be read one
+    at a time and merged
+Usage:
+    from pricestats import price_stats
+    stats = price_stats(db)
+    print(cents_to_dollars(stats.distribution("market").median()))
+"""
+import math
+import bisect
+from valuation import *
+
+EXACT_LIMIT = 4096
+SKETCH_ACCURACY = 0.01
+PERCENTILES = (10, 25, 50, 75, 90)
+
+
+class PriceDistribution:
+    """
+    Description:
+        a quantity weighted distribution of prices in cents, exact until it has more than exact_limit distinct prices
+    """
+
+    def __init__(self, exact_limit: int = EXACT_LIMIT, accuracy: float = SKETCH_ACCURACY):
+        """
+        Description:
+            Constructor method
+        Parameters:
+            :param exact_limit: the largest number of distinct prices that are kept exactly
+            :param accuracy: the relative error of a percentile once the distribution is a sketch, between 0 and 1
+        """
+        if not 0 < accuracy < 1:
+            raise ValueError("the accuracy must be between 0 and 1")
+        self.exact_limit = exact_limit
+        self.accuracy = accuracy
+        self.gamma = (1 + accuracy) / (1 - accuracy)
+        self.count = 0
+        self.total = 0
+        self._minimum = None
+        self._maximum = None
+        self.values = {}
+        self.buckets = None
+        self.zero = 0
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def exact(self):
+        return self.buckets is None
+
+    @property
+    def minimum(self):
+        if self.buckets is None:
+            return min(self.values, default=None)
+        return self._minimum
+
+    @property
+    def maximum(self):
+        if self.buckets is None:
+            return max(self.values, default=None)
+        return self._maximum
+
+    def _bucket(self, cents: int):
+        """
+        Description:
+            the index of the logarithmic bucket of a price above 0
+        Parameters:
+            :param cents: the price in cents
+            :return: int of the index
+        """
+        return math.ceil(math.log(cents, self.gamma))
+
+    def _bucket_value(self, index: int):
+        """
+        Description:
+            the price that stands for every price in a bucket, within the accuracy of all of them
+        Parameters:
+            :param index: the index of the bucket
+            :return: float of the price in cents
+        """
+        return 2 * self.gamma ** index / (self.gamma + 1)
+
+    def _to_sketch(self):
+        """
+        Description:
+            moves the exact prices into buckets
+        Parameters:
+            :return: None
+        """
+        self._minimum, self._maximum = self.minimum, self.maximum
+        values, self.values = self.values, None
+        self.buckets = {}
+        for cents, weight in values.items():
+            self._add_sketch(cents, weight)
+
+    def _add_sketch(self, cents: int, weight: int):
+        """
+        Description:
+            adds a price to the buckets
+        Parameters:
+            :param cents: the price in cents
+            :param weight: the quantity of cards with this price
+            :return: None
+        """
+        if cents <= 0:
+            self.zero += weight
+        else:
+            index = self._bucket(cents)
+            self.buckets[index] = self.buckets.get(index, 0) + weight
+
+    def add(self, cents: int, weight: int = 1):
+        """
+        Description:
+            adds the price of a card
+        Parameters:
+            :param cents: the price in cents
+            :param weight: the quantity of cards with this price
+            :return: None
+        """
+        if weight <= 0:
+            return
+        self.count += weight
+        self.total += cents * weight
+        if self.buckets is not None:
+            self._minimum = min(self._minimum, cents)
+            self._maximum = max(self._maximum, cents)
+            self._add_sketch(cents, weight)
+            return
+        self.values[cents] = self.values.get(cents, 0) + weight
+        if len(self.values) > self.exact_limit:
+            self._to_sketch()
+
+    def merge(self, other: "PriceDistribution"):
+        """
+        Description:
+            adds every price of another distribution to this one, the result is exact if both are exact and there are
+            not more than exact_limit distinct prices between them
+        Parameters:
+            :param other: a PriceDistribution of the same accuracy
+            :return: this distribution
+        """
+        if other.accuracy != self.accuracy:
+            raise ValueError("only distributions of the same accuracy can be merged")
+        if not other.count:
+            return self
+        if other.buckets is None:
+            for cents, weight in other.values.items():
+                self.add(cents, weight)
+            return self
+        if self.buckets is None:
+            self._to_sketch()
+        self.count += other.count
+        self.total += other.total
+        self._minimum = other.minimum if self._minimum is None else min(self._minimum, other.minimum)
+        self._maximum = other.maximum if self._maximum is None else max(self._maximum, other.maximum)
+        self.zero += other.zero
+        for index, weight in other.buckets.items():
+            self.buckets[index] = self.buckets.get(index, 0) + weight
+        return self
+
+    def _items(self):
+        """
+        Description:
+            the prices and their quantities from the lowest price, the prices of a sketch are the values of its buckets
+        Parameters:
+            :return: list of tuple of the price in cents and the quantity
+        """
+        if self.buckets is None:
+            return sorted(self.values.items())
+        items = [(0, self.zero)] if self.zero else []
+        items.extend((self._bucket_value(index), weight) for index, weight in sorted(self.buckets.items()))
+        return items
+
+    def quantiles(self, fractions):
+        """
+        Description:
+            the prices below which a fraction of the cards are, a card at the rank of a fraction is the price of that
+            fraction, so the median of an even number of cards is the lower of the two middle prices
+        Parameters:
+            :param fractions: an iterable of fractions between 0 and 1
+            :return: list of the price in cents of each fraction, None if there are no cards
+        """
+        fractions = list(fractions)
+        if not self.count:
+            return [None] * len(fractions)
+        minimum, maximum = self.minimum, self.maximum
+        items = self._items()
+        cumulative = list(itertools.accumulate(weight for _, weight in items))
+        prices = []
+        for fraction in fractions:
+            if not 0 <= fraction <= 1:
+                raise ValueError("a fraction must be between 0 and 1")
+            index = bisect.bisect_left(cumulative, max(1, math.ceil(fraction * self.count)))
+            price = items[index][0]
+            prices.append(round(min(max(price, minimum), maximum)))
+        return prices
+
+    def quantile(self, fraction: float):
+        """
+        Description:
+            the price below which a fraction of the cards are
+        Parameters:
+            :param fraction: a fraction between 0 and 1
+            :return: the price in cents, None if there are no cards
+        """
+        return self.quantiles((fraction, ))[0]
+
+    def percentiles(self, percents: tuple = PERCENTILES):
+        """
+        Description:
+            the prices at several percentiles
+        Parameters:
+            :param percents: the percentiles, between 0 and 100
+            :return: dictionary of percentile to the price in cents
+        """
+        return dict(zip(percents, self.quantiles(percent / 100 for percent in percents)))
+
+    def median(self):
+        """
+        Description:
+            the median price of a card
+        Parameters:
+            :return: the price in cents, None if there are no cards
+        """
+        return self.quantile(0.5)
+
+    def mean(self):
+        """
+        Description:
+            the average price of a card, exact even for a sketch
+        Parameters:
+            :return: the price in cents, None if there are no cards
+        """
+        return round(self.total / self.count) if self.count else None
+
+    def histogram(self, edges: list = None, bins: int = 10):
+        """
+        Description:
+            the number of cards in each price range, the last range includes its upper edge
+        Parameters:
+            :param edges: the rising edges of the ranges in cents, defaults to bins ranges of the same width from the
+            lowest to the highest price
+            :param bins: the number of ranges when edges are not given
+            :return: list of tuple of the lower edge, the upper edge and the number of cards, cards outside of the
+            edges are left out
+        """
+        if not self.count:
+            return [] if edges is None else [(low, high, 0) for low, high in zip(edges, edges[1:])]
+        minimum, maximum = self.minimum, self.maximum
+        if edges is None:
+            width = max(1, math.ceil((maximum - minimum) / bins))
+            edges = [minimum + width * index for index in range(bins + 1)]
+        counts = [0] * (len(edges) - 1)
+        for price, weight in self._items():
+            price = min(max(price, minimum), maximum)
+            index = bisect.bisect_right(edges, price) - 1
+            if index == len(counts) and price == edges[-1]:
+                index -= 1
+            if 0 <= index < len(counts):
+                counts[index] += weight
+        return list(zip(edges, edges[1:], counts))
+
+    def summary(self, percents: tuple = PERCENTILES):
+        """
+        Description:
+            the count, total, mean, lowest and highest price and percentiles of the distribution
+        Parameters:
+            :param percents: the percentiles, between 0 and 100
+            :return: dictionary of the statistics, prices are in cents
+        """
+        return {
+            "count": self.count,
+            "total": self.total,
+            "mean": self.mean(),
+            "min": self.minimum,
+            "max": self.maximum,
+            "percentiles": self.percentiles(percents),
+            "exact": self.exact
+        }
+
+
+class PriceStats:
+    """
+    Description:
+        the price distributions of one or more logs for each price category and print type
+    """
+
+    def __init__(self, categories: tuple = PRICE_CATEGORIES, exact_limit: int = EXACT_LIMIT,
+                 accuracy: float = SKETCH_ACCURACY):
+        """
+        Description:
+            Constructor method
+        Parameters:
+            :param categories: the price categories
+            :param exact_limit: the largest number of distinct prices a distribution keeps exactly
+            :param accuracy: the relative error of a percentile once a distribution is a sketch
+        """
+        self.categories = tuple(categories)
+        self.exact_limit = exact_limit
+        self.accuracy = accuracy
+        self.distributions = {}
+        self.missing = dict.fromkeys(self.categories, 0)
+
+    def _distribution(self, category: str, print_type: str):
+        """
+        Description:
+            the distribution of a price category and print type, made if it does not exist yet
+        Parameters:
+            :param category: the price category
+            :param print_type: the print type
+            :return: PriceDistribution
+        """
+        key = (category, print_type)
+        if key not in self.distributions:
+            self.distributions[key] = PriceDistribution(self.exact_limit, self.accuracy)
+        return self.distributions[key]
+
+    def add(self, print_type: str, prices: tuple, qnty: int):
+        """
+        Description:
+            adds the prices of a row of a log
+        Parameters:
+            :param print_type: the print type of the card
+            :param prices: tuple of the price in cents or None of each category
+            :param qnty: the quantity of the card
+            :return: None
+        """
+        for category, price in zip(self.categories, prices):
+            if price is None:
+                self.missing[category] += qnty
+            else:
+                self._distribution(category, print_type).add(price, qnty)
+
+    def add_log(self, db: DbHandleBase, workers: int = PRICE_WORKERS, window: int = PRICE_WINDOW):
+        """
+        Description:
+            streams a log into the distributions, requesting the prices of several cards at the same time
+        Parameters:
+            :param db: an instance of a DbHandle
+            :param workers: the number of prices requested at the same time
+            :param window: the largest number of cards requested ahead
+            :return: this PriceStats
+        """
+        rq = db.rq
+
+        def request(rows: list):
+            try:
+                return rows, rq.get_card(rows[0][0])["data"]
+            except ConnectionError:
+                return rows, None
+
+        groups = (list(rows) for _, rows in itertools.groupby(db.get_log(), key=lambda row: row[0]))
+        for rows, data in prefetch_map(request, groups, workers, window, PRICE_CHUNK):
+            for _, print_type, qnty in rows:
+                self.add(print_type, card_cents(data, print_type, self.categories)[0], qnty)
+        return self
+
+    def merge(self, other: "PriceStats"):
+        """
+        Description:
+            adds every distribution of another PriceStats to this one
+        Parameters:
+            :param other: a PriceStats of the same accuracy
+            :return: this PriceStats
+        """
+        for (category, print_type), distribution in other.distributions.items():
+            self._distribution(category, print_type).merge(distribution)
+        for category, qnty in other.missing.items():
+            self.missing[category] = self.missing.get(category, 0) + qnty
+        return self
+
+    def print_types(self, category: str = "market"):
+        """
+        Description:
+            the print types that have prices in a category
+        Parameters:
+            :param category: the price category
+            :return: sorted list of the print types
+        """
+        return sorted(print_type for key_category, print_type in self.distributions if key_category == category)
+
+    def distribution(self, category: str = "market", print_type: str = None):
+        """
+        Description:
+            the distribution of a price category, of one print type or of every print type together
+        Parameters:
+            :param category: the price category
+            :param print_type: the print type, None for every print type
+            :return: PriceDistribution
+        """
+        if category not in self.categories:
+            raise ValueError(f"unknown price category {category}")
+        if print_type is not None:
+            return self.distributions.get((category, print_type)) or PriceDistribution(self.exact_limit, self.accuracy)
+        merged = PriceDistribution(self.exact_limit, self.accuracy)
+        for (key_category, _), distribution in self.distributions.items():
+            if key_category == category:
+                merged.merge(distribution)
+        return merged
+
+
+def price_stats(*dbs: DbHandleBase, categories: tuple = PRICE_CATEGORIES, exact_limit: int = EXACT_LIMIT,
+                accuracy: float = SKETCH_ACCURACY, workers: int = PRICE_WORKERS, window: int = PRICE_WINDOW):
+    """
+    Description:
+        the price distributions of one or more logs, each log is streamed into its own PriceStats which are then
+        merged, so a log of any size is read in a fixed amount of memory
+    Parameters:
+        :param dbs: instances of a DbHandle
+        :param categories: the price categories
+        :param exact_limit: the largest number of distinct prices a distribution keeps exactly
+        :param accuracy: the relative error of a percentile once a distribution is a sketch
+        :param workers: the number of prices requested at the same time
+        :param window: the largest number of cards requested ahead
+        :return: PriceStats
+    """
+    stats = PriceStats(categories, exact_limit, accuracy)
+    for db in dbs:
+        stats.merge(PriceStats(categories, exact_limit, accuracy).add_log(db, workers, window))
+    return stats
@@ -0,0 +1,404 @@
+"""
+Description:
+    Values a whole card log at once from the cached card prices, in integer cents
+    The log is turned into a quantity vector and one price vector per price category (low, mid, high, market and
+    directLow), with a presence mask for the prices that are missing, so every total, count and average is a product
+    or sum over whole vectors instead of a walk over the log with lookups per card
+    Prices are requested once per card, several at the same time, and cached by RqHandle
+    RunningValue keeps the totals of a Valuation up to date as the log changes, so DbHandleBase can answer what the
+    collection is worth without valuing the log again, and without requesting a price while the log is written
+Usage:
+    from valuation import Valuation
+    value = Valuation(db)
+    print(cents_to_dollars(value.totals()["market"]))
+"""
+import operator
+from array import array
+from clss_base import *
+from cardlog import CardLog
+
+
+def to_cents(price: float):
+    """
+    Description:
+        converts a price in dollars to whole cents
+    Parameters:
+        :param price: the price in dollars
+        :return: int of the price in cents
+    """
+    return round(price * 100)
+
+
+def cents_to_dollars(cents: int):
+    """
+    Description:
+        formats a price in cents as dollars
+    Parameters:
+        :param cents: the price in cents
+        :return: string of the price, like "$12.05"
+    """
+    sign = "-" if cents < 0 else ""
+    cents = abs(cents)
+    return f"{sign}${cents // 100}.{cents % 100:02d}"
+
+
+def card_cents(data: (dict, None), print_type: str, categories: tuple = PRICE_CATEGORIES):
+    """
+    Description:
+        gets the prices of a print type of a card in cents
+    Parameters:
+        :param data: the card data from pokemonTcgApi, or None if it could not be requested
+        :param print_type: the print type of the card
+        :param categories: the price categories
+        :return: tuple of a tuple of the price in cents or None of each category, and None or the reason the prices
+        are missing
+    """
+    missing = (None, ) * len(categories)
+    if data is None:
+        return missing, "the card could not be requested"
+    all_prices = data.get("tcgplayer", {}).get("prices")
+    if not all_prices:
+        return missing, "the card has no prices"
+    prices = all_prices.get(print_type)
+    if not prices:
+        return missing, f"the card has no prices for {print_type}"
+    return tuple(None if prices.get(category) is None else to_cents(prices[category]) for category in categories), None
+
+
+class Valuation:
+    """
+    Description:
+        the prices of every card of a log, in integer cents, as vectors over the log
+    """
+
+    def __init__(self, db: DbHandleBase, categories: tuple = PRICE_CATEGORIES, workers: int = PRICE_WORKERS,
+                 window: int = PRICE_WINDOW):
+        """
+        Description:
+            Constructor method, requests the prices of every card of the log
+        Parameters:
+            :param db: an instance of a DbHandle
+            :param categories: the price categories to value the log by
+            :param workers: the number of prices requested at the same time
+            :param window: the largest number of cards requested ahead of the valuation
+        """
+        self.rq = db.rq
+        self.categories = tuple(categories)
+        self.card_ids = []
+        self.print_types = []
+        self.qnty = array("q")
+        self.prices = {category: array("q") for category in self.categories}
+        self.present = {category: array("b") for category in self.categories}
+        self.names = {}
+        self.missing = []
+        groups = (list(rows) for _, rows in itertools.groupby(db.get_log(), key=lambda row: row[0]))
+        for rows, data in prefetch_map(self._request, groups, workers, window, PRICE_CHUNK):
+            for card_id, print_type, qnty in rows:
+                self._append(card_id, print_type, qnty, data)
+
+    def __len__(self):
+        return len(self.qnty)
+
+    def _request(self, rows: list):
+        """
+        Description:
+            requests the data of the card of a group of rows
+        Parameters:
+            :param rows: a list of tuple card_id, print_type and qnty of one card
+            :return: tuple of the rows and the card data, or None if the card could not be requested
+        """
+        try:
+            return rows, self.rq.get_card(rows[0][0])["data"]
+        except ConnectionError:
+            return rows, None
+
+    def _append(self, card_id: str, print_type: str, qnty: int, data: (dict, None)):
+        """
+        Description:
+            adds a row of the log to the vectors, noting why its prices are missing if they are
+        Parameters:
+            :param card_id: the id of the card according to pokemonTcgApi
+            :param print_type: the print type of the card
+            :param qnty: the quantity of the card
+            :param data: the card data from pokemonTcgApi, or None if it could not be requested
+            :return: None
+        """
+        self.card_ids.append(card_id)
+        self.print_types.append(print_type)
+        self.qnty.append(qnty)
+        if data is not None:
+            self.names[card_id] = data.get("name", card_id)
+        prices, reason = card_cents(data, print_type, self.categories)
+        if reason is not None:
+            self.missing.append((card_id, print_type, reason))
+        for category, price in zip(self.categories, prices):
+            self.prices[category].append(0 if price is None else price)
+            self.present[category].append(price is not None)
+
+    def totals(self):
+        """
+        Description:
+            the value of the log in each price category, cards without a price in a category are left out of it
+        Parameters:
+            :return: dictionary of price category to the value in cents
+        """
+        return {category: sum(map(operator.mul, self.prices[category], self.qnty)) for category in self.categories}
+
+    def counts(self):
+        """
+        Description:
+            the number of cards of the log that have a price in each price category
+        Parameters:
+            :return: dictionary of price category to the number of cards
+        """
+        return {
+            category: sum(itertools.compress(self.qnty, self.present[category])) for category in self.categories
+        }
+
+    def averages(self):
+        """
+        Description:
+            the average price of a card of the log in each price category
+        Parameters:
+            :return: dictionary of price category to the average price in cents, None if no card has a price in it
+        """
+        counts = self.counts()
+        return {
+            category: round(total / counts[category]) if counts[category] else None
+            for category, total in self.totals().items()
+        }
+
+    def card_values(self, category: str = "market"):
+        """
+        Description:
+            the price and value of every card of the log in a price category, in the order of the log
+        Parameters:
+            :param category: the price category
+            :return: generator of tuple card_id, print_type, qnty, the price in cents and the value in cents, the price
+            and value are None when the card has no price in the category
+        """
+        for card_id, print_type, qnty, price, present in zip(
+                self.card_ids, self.print_types, self.qnty, self.prices[category], self.present[category]
+        ):
+            if present:
+                yield card_id, print_type, qnty, price, price * qnty
+            else:
+                yield card_id, print_type, qnty, None, None
+
+    def card_prices(self, index: int):
+        """
+        Description:
+            every price of a row of the log
+        Parameters:
+            :param index: the index of the row in the log
+            :return: dictionary of price category to the price in cents, for the categories the card has a price in
+        """
+        return {
+            category: self.prices[category][index] for category in self.categories if self.present[category][index]
+        }
+
+
+class RunningValue:
+    """
+    Description:
+        the value of a log in each price category, kept up to date as the log changes instead of being recomputed
+        the prices each entry was valued at are kept, so a change or a price refresh only applies the difference it
+        makes, and the totals always match a new Valuation made with the same prices
+        every entry has a slot in typed arrays of its quantity and prices, the slot of an entry is found through a
+        CardLog of slot numbers, which keys it by its packed card number and print type like the log itself
+        a change never requests a price, an entry that was not valued yet is pending until the next read values all
+        the pending entries at once
+    """
+
+    def __init__(self, valuation: Valuation):
+        """
+        Description:
+            Constructor method
+        Parameters:
+            :param valuation: a Valuation of the log to start from
+        """
+        self.rq = valuation.rq
+        self.categories = valuation.categories
+        self.totals = valuation.totals()
+        self.counts = valuation.counts()
+        self.qnty = array("q", valuation.qnty)
+        self.prices = {category: array("q", valuation.prices[category]) for category in self.categories}
+        self.present = {category: array("b", valuation.present[category]) for category in self.categories}
+        self._slots = CardLog.from_rows(
+            (card_id, print_type, slot + 1)
+            for slot, (card_id, print_type) in enumerate(zip(valuation.card_ids, valuation.print_types))
+        )
+        self._free = array("q")
+        self.pending = {}
+
+    def _slot(self, card_id: str, print_type: str):
+        """
+        Description:
+            gets the slot of an entry
+        Parameters:
+            :param card_id: the id of the card according to pokemonTcgApi
+            :param print_type: the print type of the card
+            :return: int index of the slot in the arrays, -1 if the entry has none
+        """
+        return self._slots.get(card_id, print_type) - 1
+
+    def _new_slot(self, card_id: str, print_type: str):
+        """
+        Description:
+            gives an entry a slot, reusing the slot of a removed entry if there is one
+        Parameters:
+            :param card_id: the id of the card according to pokemonTcgApi
+            :param print_type: the print type of the card
+            :return: int index of the slot in the arrays
+        """
+        if self._free:
+            slot = self._free.pop()
+        else:
+            slot = len(self.qnty)
+            self.qnty.append(0)
+            for category in self.categories:
+                self.prices[category].append(0)
+                self.present[category].append(False)
+        self._slots.set(card_id, print_type, slot + 1)
+        return slot
+
+    def _slot_prices(self, slot: int):
+        """
+        Description:
+            the prices a slot was valued at
+        Parameters:
+            :param slot: the index of the slot in the arrays
+            :return: tuple of the price in cents or None of each category
+        """
+        return tuple(
+            self.prices[category][slot] if self.present[category][slot] else None for category in self.categories
+        )
+
+    def _store(self, slot: int, prices: tuple):
+        """
+        Description:
+            stores the prices of a slot
+        Parameters:
+            :param slot: the index of the slot in the arrays
+            :param prices: tuple of the price in cents or None of each category
+            :return: None
+        """
+        for category, price in zip(self.categories, prices):
+            self.prices[category][slot] = 0 if price is None else price
+            self.present[category][slot] = price is not None
+
+    def _apply(self, prices: tuple, change: int):
+        """
+        Description:
+            adds the value of a change in quantity to the totals
+        Parameters:
+            :param prices: tuple of the price in cents or None of each category
+            :param change: the change in quantity
+            :return: None
+        """
+        for category, price in zip(self.categories, prices):
+            if price is not None:
+                self.totals[category] += price * change
+                self.counts[category] += change
+
+    def entry_prices(self, card_id: str, print_type: str):
+        """
+        Description:
+            the prices an entry is valued at
+        Parameters:
+            :param card_id: the id of the card according to pokemonTcgApi
+            :param print_type: the print type of the card
+            :return: tuple of the price in cents or None of each category, None if the entry was not valued
+        """
+        slot = self._slot(card_id, print_type)
+        if slot < 0 or slot in self.pending:
+            return None
+        return self._slot_prices(slot)
+
+    def change(self, card_id: str, print_type: str, old_qnty: int, new_qnty: int):
+        """
+        Description:
+            applies a change in the quantity of an entry, a new entry is pending until value_pending values it
+        Parameters:
+            :param card_id: the id of the card according to pokemonTcgApi
+            :param print_type: the print type of the card
+            :param old_qnty: the quantity before the change
+            :param new_qnty: the quantity after the change
+            :return: None
+        """
+        if old_qnty == new_qnty:
+            return
+        slot = self._slot(card_id, print_type)
+        if slot < 0:
+            if new_qnty <= 0:
+                return
+            slot = self._new_slot(card_id, print_type)
+            self.pending[slot] = (card_id, print_type)
+        elif slot not in self.pending:
+            self._apply(self._slot_prices(slot), new_qnty - old_qnty)
+        if new_qnty > 0:
+            self.qnty[slot] = new_qnty
+            return
+        self._slots.pop(card_id, print_type)
+        self.pending.pop(slot, None)
+        self.qnty[slot] = 0
+        self._store(slot, (None, ) * len(self.categories))
+        self._free.append(slot)
+
+    def value_pending(self, workers: int = PRICE_WORKERS, window: int = PRICE_WINDOW):
+        """
+        Description:
+            values the entries that changed since they were last valued without a price, several cards at the same
+            time and cached by RqHandle
+        Parameters:
+            :param workers: the number of prices requested at the same time
+            :param window: the largest number of cards requested ahead
+            :return: the number of entries that were valued
+        """
+        if not self.pending:
+            return 0
+
+        def request(card_id: str):
+            try:
+                return card_id, self.rq.get_card(card_id)["data"]
+            except ConnectionError:
+                return card_id, None
+
+        by_card = {}
+        for slot, (card_id, print_type) in self.pending.items():
+            by_card.setdefault(card_id, []).append((slot, print_type))
+        for card_id, data in prefetch_map(request, by_card, workers, window, PRICE_CHUNK):
+            for slot, print_type in by_card[card_id]:
+                prices, _ = card_cents(data, print_type, self.categories)
+                self._store(slot, prices)
+                self._apply(prices, self.qnty[slot])
+        valued = len(self.pending)
+        self.pending = {}
+        return valued
+
+    def reprice(self, card_id: str, print_type: str, qnty: int, data: (dict, None)):
+        """
+        Description:
+            values an entry at new prices, applying only the difference to the totals
+        Parameters:
+            :param card_id: the id of the card according to pokemonTcgApi
+            :param print_type: the print type of the card
+            :param qnty: the quantity of the entry
+            :param data: the new card data from pokemonTcgApi, or None if it could not be requested
+            :return: bool based on if the prices of the entry changed
+        """
+        prices, _ = card_cents(data, print_type, self.categories)
+        slot = self._slot(card_id, print_type)
+        if slot < 0:
+            slot = self._new_slot(card_id, print_type)
+        elif slot in self.pending:
+            del self.pending[slot]
+        else:
+            old_prices = self._slot_prices(slot)
+            if old_prices == prices and self.qnty[slot] == qnty:
+                return False
+            self._apply(old_prices, -self.qnty[slot])
+        self.qnty[slot] = qnty
+        self._store(slot, prices)
+        self._apply(prices, qnty)
+        return True
@@ -16,6 +16,7 @@ setup(
     long_description=LONG_DESCRIPTION,
     packages=find_packages(),
     install_requires=["requests", "cliTextTools", "delayedKeyInt"],
+    extras_require={"arrow": ["pyarrow"], "zstd": ["zstandard"]},
     keywords=['python', 'pokemon', 'card', 'tcg'],
     classifiers=[
         "Development Status :: 4 - Beta",
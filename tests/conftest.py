@@ -0,0 +1,56 @@
+import functools
+import os
+import sys
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "pokemonCardLogger"))
+
+import clss_base
+
+clss_base.init("", iterations=1000)
+
+PRICES = {
+    "normal": {"low": 0.1, "mid": 0.25, "high": 1.0, "market": 0.2, "directLow": None},
+    "holofoil": {"low": 1.0, "mid": 2.5, "high": 10.0, "market": 2.0, "directLow": 1.5}
+}
+
+
+class StubRq(clss_base.RqHandle):
+    """
+    Description:
+        answers card requests without the api, every card of a set numbered 1 to 100 exists, ids starting with "bad"
+        can not be requested and the prices of a card are PRICES times its multiplier
+    """
+
+    def __init__(self):
+        super().__init__("")
+        self.multipliers = {}
+        self.requests = 0
+
+    @functools.lru_cache(None)
+    def _get_card(self, card_id: str, select, generation: int):
+        self.requests += 1
+        if card_id.startswith("bad"):
+            raise ConnectionError
+        set_id, number = card_id.rsplit("-", 1)
+        multiplier = self.multipliers.get(card_id, 1)
+        prices = {
+            print_type: {key: None if price is None else round(price * multiplier, 2) for key, price in values.items()}
+            for print_type, values in PRICES.items()
+        }
+        return {"data": {
+            "id": card_id, "name": f"card {card_id}", "number": number, "rarity": "Common", "supertype": "Pokémon",
+            "types": ["Fire"], "set": {"id": set_id, "name": f"set {set_id}", "releaseDate": "2020/01/01"},
+            "tcgplayer": {"prices": prices}
+        }}
+
+    @functools.lru_cache(None)
+    def get_set_cards(self, set_id: str):
+        if set_id.startswith("bad"):
+            raise ConnectionError
+        return tuple(str(number) for number in range(1, 101))
+
+
+@pytest.fixture
+def rq():
+    return StubRq()
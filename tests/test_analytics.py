@@ -0,0 +1,52 @@
+import pytest
+import clss_pickle
+from analytics import MetadataCache, group_log
+
+
+def data(card_id, types):
+    set_id, number = card_id.rsplit("-", 1)
+    return {"id": card_id, "number": number, "rarity": "Common", "supertype": "Pokémon" if types else "Trainer",
+            "types": types, "set": {"id": set_id, "name": f"set {set_id}", "releaseDate": "2020/01/01"}}
+
+
+@pytest.fixture
+def cache():
+    cache = MetadataCache(":memory:")
+    cache.put("swsh1-1", data("swsh1-1", ["Fire", "Water"]))
+    cache.put("swsh1-2", data("swsh1-2", ["Fire"]))
+    cache.put("swsh2-1", data("swsh2-1", []))
+    yield cache
+    cache.close()
+
+
+@pytest.fixture
+def db(rq):
+    db = clss_pickle.DbHandle(":memory:", "default", rq)
+    db.add_cards([("swsh1-1", "normal", 2), ("swsh1-2", "holofoil", 1), ("swsh2-1", "normal", 3)])
+    yield db
+    db.close()
+
+
+def test_cards_of_several_types_are_in_the_group_of_each_type(db, rq, cache):
+    requests = rq.requests
+    assert group_log(db, "type", None, cache=cache) == {
+        "Fire": {"cards": 3, "entries": 2, "value": 0, "priced": 0},
+        "Water": {"cards": 2, "entries": 1, "value": 0, "priced": 0},
+        None: {"cards": 3, "entries": 1, "value": 0, "priced": 0}
+    }
+    assert rq.requests == requests
+    groups = group_log(db, "type", "market", cache=cache)
+    assert groups["Fire"] == {"cards": 3, "entries": 2, "value": 2 * 20 + 200, "priced": 3}
+    assert groups["Water"] == {"cards": 2, "entries": 1, "value": 2 * 20, "priced": 2}
+    assert sum(group["cards"] for group in groups.values()) == 8
+
+
+def test_several_keys_expand_into_every_combination(db, cache):
+    groups = group_log(db, ("type", "print_type"), None, cache=cache)
+    assert {group: totals["cards"] for group, totals in groups.items()} == {
+        ("Fire", "normal"): 2, ("Water", "normal"): 2, ("Fire", "holofoil"): 1, (None, "normal"): 3
+    }
+    groups = group_log(db, ("set", "type"), None, cache=cache)
+    assert {group: totals["entries"] for group, totals in groups.items()} == {
+        ("swsh1", "Fire"): 2, ("swsh1", "Water"): 1, ("swsh2", None): 1
+    }
@@ -0,0 +1,44 @@
+import pytest
+import clss_pickle
+import clss_arrow
+import clss_sqlite
+
+BACKENDS = [clss_pickle, clss_arrow, clss_sqlite]
+
+
+@pytest.fixture(params=BACKENDS, ids=lambda module: module.__name__)
+def db(request, rq, tmp_path):
+    db = request.param.DbHandle(str(tmp_path / "ash.pcllog"), "default", rq)
+    db.add_cards([("swsh1-1", "normal", 3), ("swsh1-2", "holofoil", 1)])
+    yield db
+    db.close()
+
+
+def test_rows_of_the_same_card_are_added_up(db):
+    assert db.add_cards([("swsh1-1", "normal", 1), ("swsh1-3", "normal", 2), ("swsh1-1", "normal", 2)]) == [
+        True, True, True
+    ]
+    assert sorted(db.get_log()) == [("swsh1-1", "normal", 6), ("swsh1-2", "holofoil", 1), ("swsh1-3", "normal", 2)]
+
+
+def test_zero_and_negative_quantities_are_refused(db):
+    before = sorted(db.get_log())
+    assert db.add_cards([("swsh1-1", "normal", 0), ("swsh1-1", "normal", -2), ("swsh1-4", "normal", -1)]) == [
+        False, False, False
+    ]
+    assert db.remove_cards([("swsh1-1", "normal", 0), ("swsh1-1", "normal", -2)]) == [False, False]
+    assert db.set_quantities({("swsh1-1", "normal"): -1, ("swsh1-4", "normal"): -3}) == {
+        ("swsh1-1", "normal"): False, ("swsh1-4", "normal"): False
+    }
+    assert sorted(db.get_log()) == before
+
+
+def test_cards_that_reach_zero_are_removed(db):
+    assert db.remove_cards([("swsh1-1", "normal", 2), ("swsh1-1", "normal", 2), ("swsh1-3", "normal", 1)]) == [
+        True, True, False
+    ]
+    assert db.set_quantities({("swsh1-2", "holofoil"): 0, ("swsh1-5", "normal"): 0, ("bad-1", "normal"): 1}) == {
+        ("swsh1-2", "holofoil"): True, ("swsh1-5", "normal"): True, ("bad-1", "normal"): False
+    }
+    assert list(db.get_log()) == []
+    assert db.check_log()
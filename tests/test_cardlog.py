@@ -0,0 +1,25 @@
+import pytest
+from cardlog import CardLog, PRINT_TYPE_BITS
+
+
+def test_set_get_and_pop():
+    log = CardLog()
+    log.set("swsh1-1", "normal", 3)
+    log.set("swsh1-1", "holofoil", 2)
+    assert log.get("swsh1-1", "normal") == 3
+    assert log.pop("swsh1-1", "normal") == 3
+    assert sorted(log) == [("swsh1-1", "holofoil", 2)]
+    assert log.check()
+
+
+def test_too_many_print_types():
+    log = CardLog()
+    index = 0
+    while len(log._print_types) < 1 << PRINT_TYPE_BITS:
+        log.set("swsh1-1", f"print{index}", 1)
+        index += 1
+    with pytest.raises(ValueError):
+        log.set("swsh1-2", "one too many", 1)
+    assert log.get("swsh1-1", "print0") == 1
+    assert len(log) == index
+    assert log.check()
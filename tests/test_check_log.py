@@ -0,0 +1,48 @@
+import pytest
+import clss_pickle
+import clss_sqlite
+
+
+@pytest.fixture(params=[clss_pickle, clss_sqlite], ids=["pickle", "sqlite"])
+def db(request, rq):
+    db = request.param.DbHandle(":memory:", "default", rq)
+    db.add_cards([("swsh1-1", "normal", 3), ("swsh1-2", "holofoil", 1), ("swsh2-10", "normal", 2)])
+    db.add_energy_card("fr", "normal", 4)
+    yield db
+    db.close()
+
+
+def test_clean_log(db):
+    assert db.check_log()
+    db.remove_card("swsh1-1", 3, "normal")
+    db.delete_energy_card("fr", "normal")
+    assert db.check_log()
+
+
+def corrupt_quantity(db):
+    if isinstance(db, clss_sqlite.DbHandle):
+        db.conn.execute("UPDATE cards SET qnty = -1 WHERE card_id = 'swsh1-1'")
+    else:
+        block = db.logdict["log"]._sets["swsh1"]
+        block.qnty[0] = -block.qnty[0]
+
+
+def corrupt_totals(db):
+    if isinstance(db, clss_sqlite.DbHandle):
+        db.conn.execute("UPDATE totals SET qnty = qnty + 1 WHERE kind = 'print_type' AND key = 'normal'")
+    else:
+        db.logdict["log"]._total += 1
+
+
+def corrupt_energy_totals(db):
+    if isinstance(db, clss_sqlite.DbHandle):
+        db.conn.execute("UPDATE totals SET entries = entries + 1 WHERE kind = 'energy_type'")
+    else:
+        db._energy_entries += 1
+
+
+@pytest.mark.parametrize("corrupt", [corrupt_quantity, corrupt_totals, corrupt_energy_totals])
+def test_corrupted_log(db, corrupt):
+    corrupt(db)
+    with pytest.raises(ValueError):
+        db.check_log()
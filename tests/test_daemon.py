@@ -0,0 +1,69 @@
+import time
+import threading
+import clss_base
+import clss_sqlite
+import daemon
+import migrate
+
+
+def test_reads_and_writes_are_run_on_the_thread_of_the_daemon(rq, tmp_path, monkeypatch):
+    db = clss_sqlite.DbHandle(str(tmp_path / "ash.pcldb"), "default", rq)
+    db.add_card("swsh1-1", 2, "normal")
+    db.close()
+    db = clss_sqlite.DbHandle(str(tmp_path / "misty.pcldb"), "water", rq)
+    db.add_card("swsh1-3", 1, "normal")
+    db.close()
+    server = daemon.LogDaemon("clss_sqlite", str(tmp_path), str(tmp_path / "d.sock"))
+    server.rq = rq
+    results = {}
+    key_threads = []
+
+    def derive_key(psswrd):
+        key_threads.append(threading.current_thread())
+        return clss_base.derive_key(psswrd)
+
+    monkeypatch.setattr(daemon, "derive_key", derive_key)
+
+    def connect():
+        for _ in range(100):
+            try:
+                return daemon.DaemonClient("ash", "default", server.socket_file)
+            except ConnectionError:
+                time.sleep(0.05)
+        return daemon.DaemonClient("ash", "default", server.socket_file)
+
+    def client():
+        try:
+            with connect() as log:
+                results["added"] = log.add_cards([["swsh1-2", "holofoil", 1]])
+                results["log"] = sorted(map(tuple, log.get_log()))
+                results["refreshed"] = log.refresh_prices()
+                results["set"] = log.set_quantities([["swsh1-2", "holofoil", 3], ["bad-1", "normal", 1]])
+                results["merged"] = log.merge("misty", "water")
+                results["merged log"] = sorted(map(tuple, log.get_log()))
+        except Exception as e:
+            results["error"] = e
+        finally:
+            server.shutdown()
+
+    thread = threading.Thread(target=client)
+    thread.start()
+    server.serve_forever()
+    thread.join()
+    assert "error" not in results, results.get("error")
+    assert results["added"] == [True]
+    assert results["log"] == [("swsh1-1", "normal", 2), ("swsh1-2", "holofoil", 1)]
+    assert results["refreshed"] == 0
+    assert "refresh_prices" in daemon.WRITE_OPERATIONS and "refresh_prices" not in daemon.READ_OPERATIONS
+    assert results["set"] == [["swsh1-2", "holofoil", True], ["bad-1", "normal", False]]
+    assert results["merged"] == 1
+    assert results["merged log"] == [("swsh1-1", "normal", 2), ("swsh1-2", "holofoil", 3), ("swsh1-3", "normal", 1)]
+    assert len(key_threads) == 2 and threading.main_thread() not in key_threads
+
+
+def test_backend_suffixes_are_defined_once():
+    assert daemon.BACKEND_SUFFIXES is clss_base.BACKEND_SUFFIXES
+    assert migrate.SOURCE_SUFFIX == clss_base.BACKEND_SUFFIXES["clss_pickle"]
+    assert migrate.TARGET_SUFFIXES == {
+        backend: suffix for backend, suffix in clss_base.BACKEND_SUFFIXES.items() if backend != "clss_pickle"
+    }
@@ -0,0 +1,18 @@
+import pytest
+import clss_pickle
+import clss_arrow
+import clss_sqlite
+
+BACKENDS = [clss_pickle, clss_arrow, clss_sqlite]
+
+
+@pytest.mark.parametrize("module", BACKENDS, ids=lambda module: module.__name__)
+def test_deleting_a_card_that_is_not_in_the_log_returns_false(module, rq, tmp_path):
+    db = module.DbHandle(str(tmp_path / "brock.pcllog"), "default", rq)
+    db.add_card("swsh1-1", 2, "normal")
+    assert not db.delete_card("swsh1-1", "holofoil")
+    assert not db.delete_card("swsh1-2", "normal")
+    assert db.delete_card("swsh1-1", "normal")
+    assert not db.delete_card("swsh1-1", "normal")
+    assert list(db.get_log()) == []
+    db.close()
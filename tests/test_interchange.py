@@ -0,0 +1,132 @@
+import gzip
+import json
+import pytest
+import clss_pickle
+import clss_sqlite
+import interchange
+
+BACKENDS = [clss_pickle, clss_sqlite]
+
+
+def make_log(module, file, rq):
+    db = module.DbHandle(file, "default", rq)
+    db.add_cards([("swsh1-1", "normal", 2), ("swsh1-2", "holofoil", 1), ("swsh2-5", "reverseHolofoil", 3)])
+    db.add_energy_card("fr", "normal", 4)
+    db.add_energy_card("fy", "reverseHolofoil", 1)
+    return db
+
+
+def snapshot(db):
+    return sorted(db.get_log()), sorted(db.get_energy_log()), set(db.list_login())
+
+
+def write_jsonl(file, rows):
+    with open(file, "w") as f:
+        for row in rows:
+            f.write(row if isinstance(row, str) else json.dumps(row))
+            f.write("\n")
+
+
+@pytest.mark.parametrize("module", BACKENDS, ids=lambda module: module.__name__)
+@pytest.mark.parametrize("dump", ["dump.jsonl", "dump.jsonl.gz", "dump"])
+def test_a_dump_imported_into_an_empty_log_matches_the_log(module, dump, rq, tmp_path):
+    source = make_log(module, str(tmp_path / "ash.pcllog"), rq)
+    dump = str(tmp_path / dump)
+    if dump.endswith(".jsonl") or dump.endswith(".gz"):
+        counts = interchange.export_jsonl(source, dump)
+    else:
+        counts = interchange.export_parquet(source, dump)
+    assert counts == {"card": 3, "energy": 2, "login": len(list(source.list_login()))}
+    if dump.endswith(".gz"):
+        with open(dump, "rb") as f:
+            assert f.read(2) == b"\x1f\x8b"
+    target_file = str(tmp_path / "misty.pcllog")
+    target = module.DbHandle(target_file, "default", rq)
+    own_logins = set(target.list_login())
+    if dump.endswith(".jsonl") or dump.endswith(".gz"):
+        report = interchange.import_jsonl(target, dump)
+    else:
+        report = interchange.import_parquet(target, dump)
+    assert report["bad_rows"] == []
+    assert (report["cards"], report["energy"]) == (3, 2)
+    cards, energy, logins = snapshot(source)
+    assert snapshot(target) == (cards, energy, logins | own_logins)
+    target.close()
+    target = module.DbHandle(target_file, "default", rq, read_only=True)
+    assert snapshot(target)[:2] == (cards, energy)
+    assert snapshot(target)[2] >= logins
+    target.close()
+    source.close()
+
+
+@pytest.mark.parametrize("module", BACKENDS, ids=lambda module: module.__name__)
+def test_logins_already_in_the_history_are_skipped(module, rq, tmp_path):
+    db = make_log(module, str(tmp_path / "ash.pcllog"), rq)
+    dump = str(tmp_path / "dump.jsonl")
+    write_jsonl(dump, [
+        {"kind": "login", "time": "2020-01-02T03:04:05"},
+        {"kind": "login", "time": "2020-01-02T03:04:05"},
+        {"kind": "login", "time": "2021-06-07T08:09:10"}
+    ])
+    assert interchange.import_jsonl(db, dump)["logins"] == 2
+    assert interchange.import_jsonl(db, dump)["logins"] == 0
+    assert (2, 1, 2020, 3, 4, 5) in set(db.list_login())
+    db.close()
+
+
+def test_a_dry_run_in_chunks_counts_without_changing_the_log(rq, tmp_path, monkeypatch):
+    monkeypatch.setattr(interchange, "CHUNK_ROWS", 2)
+    db = make_log(clss_pickle, str(tmp_path / "ash.pcllog"), rq)
+    before = snapshot(db)
+    rows = [("row 1", "card", {"card_id": "swsh3-1", "print_type": "normal", "qnty": 1}),
+            ("row 2", "card", {"card_id": "swsh3-2", "print_type": "normal", "qnty": 2}),
+            ("row 3", "card", {"card_id": "bad-1", "print_type": "normal", "qnty": 1}),
+            ("row 4", "card", {"card_id": "swsh1-1", "print_type": "normal", "qnty": 0}),
+            ("row 5", "energy", {"energy_type": "fr", "print_type": "normal", "qnty": 1}),
+            ("row 6", "login", {"time": "2020-01-02T03:04:05"})]
+    report = interchange.import_rows(db, rows, dry_run=True)
+    assert report == {"rows": 6, "cards": 3, "energy": 1, "logins": 1,
+                      "bad_rows": [("row 3", "bad-1 is not a valid card id")]}
+    assert snapshot(db) == before
+    report = interchange.import_rows(db, rows)
+    assert (report["cards"], report["energy"], report["logins"]) == (3, 1, 1)
+    assert sorted(db.get_log()) == [
+        ("swsh1-2", "holofoil", 1), ("swsh2-5", "reverseHolofoil", 3), ("swsh3-1", "normal", 1),
+        ("swsh3-2", "normal", 2)
+    ]
+    db.close()
+
+
+def test_bad_rows_are_reported_and_skipped(rq, tmp_path):
+    db = clss_pickle.DbHandle(str(tmp_path / "ash.pcllog"), "default", rq)
+    dump = str(tmp_path / "dump.jsonl.gz")
+    with gzip.open(dump, "wt") as f:
+        for row in [
+            "not json",
+            {"kind": "deck"},
+            {"kind": "card", "card_id": "swsh1-1", "qnty": 1},
+            {"kind": "card", "card_id": "swsh1-1", "print_type": "normal", "qnty": -1},
+            {"kind": "card", "card_id": "swsh1-1", "print_type": "shiny", "qnty": 1},
+            {"kind": "card", "card_id": "bad-1", "print_type": "normal", "qnty": 1},
+            {"kind": "energy", "energy_type": "fr", "print_type": "holofoil", "qnty": 1},
+            {"kind": "energy", "energy_type": "xx", "print_type": "normal", "qnty": 1},
+            {"kind": "login", "time": "yesterday"},
+            {"kind": "card", "card_id": " swsh1-1 ", "print_type": " normal ", "qnty": 2}
+        ]:
+            f.write((row if isinstance(row, str) else json.dumps(row)) + "\n")
+    report = interchange.import_jsonl(db, dump)
+    assert report["rows"] == 10
+    assert report["bad_rows"] == [
+        ("line 1", "the row is not a JSON object"),
+        ("line 2", "the row has an unknown kind 'deck'"),
+        ("line 3", "the card row is missing one of card_id, print_type, qnty"),
+        ("line 4", "the card row has a quantity that is not a whole number of 0 or more"),
+        ("line 5", "shiny is not a print type"),
+        ("line 7", "holofoil is not a print type"),
+        ("line 8", "xx is not a basic energy type"),
+        ("line 9", "the login time is not an iso format time"),
+        ("line 6", "bad-1 is not a valid card id")
+    ]
+    assert list(db.get_log()) == [("swsh1-1", "normal", 2)]
+    assert list(db.get_energy_log()) == []
+    db.close()
@@ -0,0 +1,55 @@
+import pytest
+import clss_pickle
+import clss_arrow
+import clss_sqlite
+
+BACKENDS = [clss_pickle, clss_arrow, clss_sqlite]
+MINE = [("swsh1-1", "normal", 3), ("swsh1-2", "holofoil", 1), ("swsh2-1", "normal", 2), ("swsh3-1", "normal", 5)]
+THEIRS = [("swsh1-1", "normal", 1), ("swsh1-2", "holofoil", 4), ("swsh2-2", "normal", 1), ("swsh3-1", "normal", 5)]
+
+
+@pytest.fixture(params=BACKENDS, ids=lambda module: module.__name__)
+def logs(request, rq, tmp_path):
+    mine = request.param.DbHandle(str(tmp_path / "ash.pcllog"), "default", rq)
+    mine.add_cards(MINE)
+    theirs = clss_sqlite.DbHandle(str(tmp_path / "misty.pcldb"), "default", rq)
+    theirs.add_cards(THEIRS)
+    yield mine, theirs
+    mine.close()
+    theirs.close()
+
+
+def test_diff_sorts_the_cards_into_added_removed_and_changed(logs, rq):
+    mine, theirs = logs
+    requests = rq.requests
+    assert mine.diff(theirs) == {
+        "added": [("swsh2-2", "normal", 1)],
+        "removed": [("swsh2-1", "normal", 2)],
+        "changed": [("swsh1-1", "normal", 1), ("swsh1-2", "holofoil", 4)]
+    }
+    assert mine.diff(mine) == {"added": [], "removed": [], "changed": []}
+    assert rq.requests == requests
+
+
+@pytest.mark.parametrize("strategy, expected", [
+    ("sum", [("swsh1-1", "normal", 4), ("swsh1-2", "holofoil", 5), ("swsh2-1", "normal", 2),
+             ("swsh2-2", "normal", 1), ("swsh3-1", "normal", 10)]),
+    ("max", [("swsh1-1", "normal", 3), ("swsh1-2", "holofoil", 4), ("swsh2-1", "normal", 2),
+             ("swsh2-2", "normal", 1), ("swsh3-1", "normal", 5)]),
+    ("theirs", [("swsh1-1", "normal", 1), ("swsh1-2", "holofoil", 4), ("swsh2-1", "normal", 2),
+                ("swsh2-2", "normal", 1), ("swsh3-1", "normal", 5)])
+])
+def test_merge_resolves_conflicts_by_its_strategy(logs, strategy, expected):
+    mine, theirs = logs
+    changes = sum(1 for row in expected if row not in MINE)
+    assert mine.merge(theirs, strategy) == changes
+    assert sorted(mine.get_log()) == expected
+    assert sorted(theirs.get_log()) == sorted(THEIRS)
+    assert mine.check_log()
+
+
+def test_merge_refuses_unknown_strategies(logs):
+    mine, theirs = logs
+    with pytest.raises(ValueError):
+        mine.merge(theirs, "mine")
+    assert sorted(mine.get_log()) == sorted(MINE)
@@ -0,0 +1,31 @@
+import pickle
+import pytest
+from cryptography.fernet import Fernet
+from pagedlog import PagedCardLog, MAGIC, TRAILER
+
+
+def test_pages_are_read_back(tmp_path):
+    file = str(tmp_path / "ash.pcllog")
+    fernet = Fernet(Fernet.generate_key())
+    log = PagedCardLog()
+    log.set("swsh1-1", "normal", 3)
+    log.set("swsh2-1", "holofoil", 1)
+    log.write(file, fernet, {"login": []})
+    log.close()
+    log, logdict = PagedCardLog.open(file, fernet)
+    assert logdict == {"login": []}
+    assert log.loaded_set_count() == 0
+    assert log.get("swsh1-1", "normal") == 3
+    assert log.loaded_set_count() == 1
+    assert sorted(log) == [("swsh1-1", "normal", 3), ("swsh2-1", "holofoil", 1)]
+    log.close()
+
+
+def test_pickled_footers_are_refused(tmp_path):
+    file = str(tmp_path / "ash.pcllog")
+    fernet = Fernet(Fernet.generate_key())
+    footer = fernet.encrypt(pickle.dumps({"version": 1}))
+    with open(file, "wb") as f:
+        f.write(MAGIC + footer + TRAILER.pack(len(MAGIC), len(footer), MAGIC))
+    with pytest.raises(ValueError):
+        PagedCardLog.open(file, fernet)
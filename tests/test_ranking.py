@@ -0,0 +1,35 @@
+import pytest
+import clss_pickle
+import clss_sqlite
+
+BACKENDS = [clss_pickle, clss_sqlite]
+
+
+@pytest.fixture(params=BACKENDS, ids=lambda module: module.__name__)
+def db(request, rq, tmp_path):
+    db = request.param.DbHandle(str(tmp_path / "ash.pcllog"), "default", rq)
+    db.add_cards([
+        ("swsh1-3", "normal", 5), ("swsh1-1", "normal", 10), ("swsh1-2", "holofoil", 1), ("swsh1-4", "holofoil", 2),
+        ("swsh2-1", "holofoil", 1), ("swsh2-2", "normal", 10)
+    ])
+    yield db
+    db.close()
+
+
+def test_entries_are_ranked_by_value_and_ties_keep_log_order(db):
+    order = [(card_id, print_type) for card_id, print_type, _ in db.get_log()]
+    ranking = db.get_log_by_total_value()
+    assert [row[3] for row in ranking] == [4.0, 2.0, 2.0, 2.0, 2.0, 1.0]
+    ties = [order.index(row[:2]) for row in ranking if row[3] == 2.0]
+    assert ties == sorted(ties)
+    for n in range(len(ranking) + 2):
+        assert db.get_log_by_total_value(n) == ranking[:n]
+
+
+def test_entries_without_a_price_are_left_out(db):
+    missing = []
+    ranking = db.get_log_by_total_value(None, "directLow", missing)
+    assert [row[3] for row in ranking] == [3.0, 1.5, 1.5]
+    assert sorted(card_id for card_id, _, _ in missing) == ["swsh1-1", "swsh1-3", "swsh2-2"]
+    with pytest.raises(ValueError):
+        db.get_log_by_total_value(3, "average")
@@ -0,0 +1,27 @@
+import os
+import pytest
+import clss_pickle
+import clss_arrow
+import clss_sqlite
+
+BACKENDS = [clss_pickle, clss_arrow, clss_sqlite]
+
+
+@pytest.mark.parametrize("module", BACKENDS, ids=lambda module: module.__name__)
+def test_read_only_logs_record_no_login_and_are_not_saved(module, rq, tmp_path):
+    file = str(tmp_path / "misty.pcllog")
+    db = module.DbHandle(file, "default", rq)
+    db.add_card("swsh1-1", 2, "normal")
+    logins = list(db.list_login())
+    db.close()
+    files = {name: os.stat(tmp_path / name).st_mtime_ns for name in os.listdir(tmp_path)}
+    other = module.DbHandle(file, "default", rq, read_only=True)
+    assert list(other.get_log()) == [("swsh1-1", "normal", 2)]
+    assert list(other.list_login()) == logins
+    other.close()
+    assert {name: os.stat(tmp_path / name).st_mtime_ns for name in os.listdir(tmp_path)} == files
+
+
+def test_read_only_logs_must_exist(rq, tmp_path):
+    with pytest.raises(FileNotFoundError):
+        clss_pickle.DbHandle(str(tmp_path / "brock.pcllog"), "default", rq, read_only=True)
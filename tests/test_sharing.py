@@ -0,0 +1,62 @@
+import pytest
+import clss_pickle
+import clss_arrow
+import clss_sqlite
+
+BACKENDS = [clss_pickle, clss_arrow, clss_sqlite]
+
+
+@pytest.fixture(params=BACKENDS, ids=lambda module: module.__name__)
+def handles(request, rq, tmp_path):
+    file = str(tmp_path / "user.pcllog")
+    first = request.param.DbHandle(file, "default", rq)
+    second = request.param.DbHandle(file, "default", rq)
+    yield request.param, file, first, second
+    first.close()
+    second.close()
+
+
+def reopen(module, file, rq):
+    db = module.DbHandle(file, "default", rq)
+    log = sorted(db.get_log())
+    db.close()
+    return log
+
+
+def test_bulk_changes_survive_a_save_by_another_handle(handles, rq):
+    module, file, first, second = handles
+    second.add_card("swsh1-9", 1, "normal")
+    assert first.add_cards([("swsh1-1", "normal", 2), ("swsh1-2", "holofoil", 1)]) == [True, True]
+    assert first.set_quantities({("swsh1-3", "normal"): 4}) == {("swsh1-3", "normal"): True}
+    second.add_card("swsh1-8", 1, "normal")
+    assert first.remove_cards([("swsh1-1", "normal", 1)]) == [True]
+    expected = [
+        ("swsh1-1", "normal", 1), ("swsh1-2", "holofoil", 1), ("swsh1-3", "normal", 4), ("swsh1-8", "normal", 1),
+        ("swsh1-9", "normal", 1)
+    ]
+    assert sorted(first.get_log()) == expected
+    assert reopen(module, file, rq) == expected
+
+
+def test_merge_and_trade_survive_a_save_by_another_handle(handles, rq):
+    module, file, first, second = handles
+    other = clss_pickle.DbHandle(":memory:", "default", rq)
+    other.add_cards([("swsh2-1", "normal", 2), ("swsh2-2", "normal", 1)])
+    second.add_card("swsh1-9", 1, "normal")
+    assert first.merge(other, "sum") == 2
+    second.add_card("swsh1-8", 1, "normal")
+    assert first.trade_cards(other, [("swsh2-1", "normal", 1)], [("swsh2-2", "normal", 1)]) == clss_pickle.TRADE_SUCCESS
+    expected = [("swsh1-8", "normal", 1), ("swsh1-9", "normal", 1), ("swsh2-1", "normal", 1), ("swsh2-2", "normal", 2)]
+    assert reopen(module, file, rq) == expected
+
+
+def test_energy_changes_survive_a_save_by_another_handle(handles, rq):
+    module, file, first, second = handles
+    first.add_energy_card("fr", "normal", 3)
+    second.add_energy_card("fy", "normal", 1)
+    first.remove_energy_card("fr", "normal", 1)
+    db = module.DbHandle(file, "default", rq)
+    try:
+        assert sorted(db.get_energy_log()) == [("fr", "normal", 2), ("fy", "normal", 1)]
+    finally:
+        db.close()
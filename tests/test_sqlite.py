@@ -0,0 +1,119 @@
+import os
+import sqlite3
+import hashlib
+import pytest
+import clss_pickle
+import clss_sqlite
+from cryptography.fernet import Fernet, InvalidToken
+
+
+def is_encrypted(file):
+    for name in (file, f"{file}-wal"):
+        if os.path.exists(name):
+            with open(name, "rb") as f:
+                if b"swsh" in f.read():
+                    return False
+    return True
+
+
+def read_pages(file):
+    conn = sqlite3.connect(file)
+    try:
+        return dict(conn.execute("SELECT page, data FROM pages"))
+    finally:
+        conn.close()
+
+
+def plaintext_database(file):
+    conn = sqlite3.connect(file)
+    conn.executescript(clss_sqlite.SCHEMA)
+    key_hash = hashlib.sha512(clss_sqlite.derive_key("default")).hexdigest()
+    conn.execute("INSERT INTO meta (key, value) VALUES ('key_hash', ?)", (key_hash, ))
+    conn.execute("INSERT INTO cards VALUES ('swsh1-1', 'normal', 'swsh1', 3)")
+    conn.execute("CREATE TABLE login_times (login_time TEXT)")
+    conn.execute("INSERT INTO login_times VALUES ('2020-01-02T03:04:05')")
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.commit()
+    conn.close()
+
+
+def test_file_stays_encrypted_while_open(rq, tmp_path):
+    file = str(tmp_path / "user.pcllog")
+    db = clss_sqlite.DbHandle(file, "default", rq)
+    db.add_card("swsh1-1", 2, "normal")
+    assert is_encrypted(file)
+    other = clss_sqlite.DbHandle(file, "default", rq)
+    assert list(other.get_log()) == [("swsh1-1", "normal", 2)]
+    other.close()
+    db.close()
+    assert is_encrypted(file)
+    with pytest.raises(InvalidToken):
+        clss_sqlite.DbHandle(file, "wrong", rq)
+
+
+def test_an_edit_only_writes_the_page_of_its_set(rq, tmp_path):
+    file = str(tmp_path / "user.pcllog")
+    db = clss_sqlite.DbHandle(file, "default", rq)
+    db.add_cards([("swsh1-1", "normal", 2), ("swsh2-1", "normal", 1), ("swsh3-1", "holofoil", 1)])
+    before = read_pages(file)
+    db.add_card("swsh2-1", 1, "normal")
+    after = read_pages(file)
+    assert before.keys() == after.keys()
+    assert [page for page in before if before[page] != after[page]] == [
+        clss_sqlite.page_id(db.key, clss_sqlite.PAGE_CARDS, "swsh2")
+    ]
+    db.delete_card("swsh3-1", "holofoil")
+    assert clss_sqlite.page_id(db.key, clss_sqlite.PAGE_CARDS, "swsh3") not in read_pages(file)
+    db.close()
+
+
+def test_plaintext_file_is_refused_until_encrypted(rq, tmp_path):
+    file = str(tmp_path / "user.pcllog")
+    plaintext_database(file)
+    with pytest.raises(PermissionError):
+        clss_sqlite.DbHandle(file, "default", rq)
+    with pytest.raises(InvalidToken):
+        clss_sqlite.encrypt_plaintext(file, "wrong")
+    assert clss_sqlite.encrypt_plaintext(file, "default")
+    assert is_encrypted(file)
+    assert not clss_sqlite.encrypt_plaintext(file, "default")
+    db = clss_sqlite.DbHandle(file, "default", rq)
+    assert list(db.get_log()) == [("swsh1-1", "normal", 3)]
+    assert len(list(db.list_login())) == 2
+    assert db.check_log()
+    db.close()
+
+
+def test_files_encrypted_as_a_whole_are_moved_to_pages(rq, tmp_path):
+    file = str(tmp_path / "user.pcllog")
+    plaintext_database(file)
+    with open(file, "rb") as f:
+        contents = f.read()
+    with open(file, "wb") as f:
+        f.write(Fernet(clss_sqlite.derive_key("default")).encrypt(contents))
+    with pytest.raises(InvalidToken):
+        clss_sqlite.DbHandle(file, "wrong", rq)
+    db = clss_sqlite.DbHandle(file, "default", rq)
+    assert list(db.get_log()) == [("swsh1-1", "normal", 3)]
+    db.close()
+    assert is_encrypted(file)
+    assert len(read_pages(file)) == 2
+    assert sorted(os.listdir(tmp_path)) == ["user.pcllog", "user.pcllog.lock"]
+
+
+def test_migrate_pickle_replaces_the_cards(rq, tmp_path):
+    pickle_file = str(tmp_path / "user.pcllog")
+    source = clss_pickle.DbHandle(pickle_file, "default", rq)
+    source.add_card("swsh1-2", 4, "normal")
+    source.add_energy_card("fr", "normal", 2)
+    source.close()
+    db = clss_sqlite.DbHandle(str(tmp_path / "user.pcldb"), "default", rq)
+    db.add_card("swsh1-1", 1, "normal")
+    db.add_energy_card("fy", "normal", 1)
+    assert db.migrate_pickle(pickle_file) == 1
+    assert list(db.get_log()) == [("swsh1-2", "normal", 4)]
+    assert list(db.get_energy_log()) == [("fr", "normal", 2)]
+    db.close()
+    db = clss_sqlite.DbHandle(str(tmp_path / "user.pcldb"), "default", rq)
+    assert list(db.get_log()) == [("swsh1-2", "normal", 4)]
+    db.close()
@@ -0,0 +1,69 @@
+import pytest
+import clss_base
+import clss_pickle
+import clss_sqlite
+
+BACKENDS = [clss_pickle, clss_sqlite]
+
+
+def make_logs(module, tmp_path, rq):
+    ash = module.DbHandle(str(tmp_path / "ash.pcllog"), "default", rq)
+    ash.add_cards([("swsh1-1", "normal", 3), ("swsh1-2", "holofoil", 1)])
+    misty = module.DbHandle(str(tmp_path / "misty.pcllog"), "default", rq)
+    misty.add_cards([("swsh2-1", "normal", 2), ("swsh1-1", "normal", 1)])
+    return ash, misty
+
+
+def logs(*dbs):
+    return [sorted(db.get_log()) for db in dbs]
+
+
+@pytest.mark.parametrize("module", BACKENDS, ids=lambda module: module.__name__)
+def test_a_trade_moves_every_card_at_once(module, rq, tmp_path):
+    ash, misty = make_logs(module, tmp_path, rq)
+    give = [("swsh1-1", "normal", 2), ("swsh1-2", "holofoil", 1)]
+    take = [("swsh2-1", "normal", 1), ("swsh2-1", "normal", 1)]
+    assert ash.trade_cards(misty, give, take) == clss_base.TRADE_SUCCESS
+    assert logs(ash, misty) == [
+        [("swsh1-1", "normal", 1), ("swsh2-1", "normal", 2)],
+        [("swsh1-1", "normal", 3), ("swsh1-2", "holofoil", 1)]
+    ]
+    ash.close()
+    misty.close()
+
+
+@pytest.mark.parametrize("module", BACKENDS, ids=lambda module: module.__name__)
+def test_a_refused_trade_changes_neither_log(module, rq, tmp_path):
+    ash, misty = make_logs(module, tmp_path, rq)
+    before = logs(ash, misty)
+    assert ash.trade_cards(misty, [("swsh1-1", "normal", 4)], []) == clss_base.TRADE_CODE_CARD_NOT_IN_LOG_QNTY
+    assert ash.trade_cards(misty, [], [("swsh1-2", "normal", 1)]) == clss_base.TRADE_CODE_CARD_NOT_IN_LOG
+    assert ash.trade_cards(misty, [("bad-1", "normal", 1)], []) == clss_base.TRADE_CODE_CARD_DOES_NOT_EXIST
+    assert ash.trade_cards(misty, [("swsh1-1", "normal", 0)], []) == clss_base.TRADE_CODE_INVALID_TRADE
+    assert ash.trade_cards(ash, [("swsh1-1", "normal", 1)], []) == clss_base.TRADE_CODE_INVALID_TRADE
+    assert logs(ash, misty) == before
+    ash.close()
+    misty.close()
+
+
+@pytest.mark.parametrize("module", BACKENDS, ids=lambda module: module.__name__)
+@pytest.mark.parametrize("failing", ["ash", "misty"])
+def test_a_failed_save_leaves_both_logs_unchanged(module, failing, rq, tmp_path, monkeypatch):
+    ash, misty = make_logs(module, tmp_path, rq)
+    before = logs(ash, misty)
+
+    def save():
+        raise OSError("the disk is full")
+
+    monkeypatch.setattr(ash if failing == "ash" else misty, "save", save)
+    with pytest.raises(OSError):
+        ash.trade_cards(misty, [("swsh1-1", "normal", 2)], [("swsh2-1", "normal", 2)])
+    assert logs(ash, misty) == before
+    monkeypatch.undo()
+    ash.close()
+    misty.close()
+    ash = module.DbHandle(str(tmp_path / "ash.pcllog"), "default", rq, read_only=True)
+    misty = module.DbHandle(str(tmp_path / "misty.pcllog"), "default", rq, read_only=True)
+    assert logs(ash, misty) == before
+    ash.close()
+    misty.close()
@@ -0,0 +1,73 @@
+import pytest
+import clss_pickle
+from valuation import Valuation
+
+
+@pytest.fixture
+def db(rq):
+    db = clss_pickle.DbHandle(":memory:", "default", rq)
+    db.add_cards([("swsh1-1", "normal", 2), ("swsh1-2", "holofoil", 1), ("swsh2-5", "normal", 3), ("bad-1", "normal", 1)])
+    yield db
+    db.close()
+
+
+def assert_matches_fresh_valuation(db):
+    fresh = Valuation(db)
+    assert db.collection_value() == fresh.totals()
+    assert db.collection_counts() == fresh.counts()
+
+
+def test_changes_and_reprices_match_a_fresh_valuation(db, rq):
+    assert_matches_fresh_valuation(db)
+    db.add_card("swsh1-1", 3, "normal")
+    db.add_card("swsh1-3", 1, "holofoil")
+    market = db.collection_value()["market"]
+    assert db.remove_card("swsh2-5", 1, "normal")
+    assert db.collection_value()["market"] < market
+    assert_matches_fresh_valuation(db)
+    db.set_quantities({("swsh1-2", "holofoil"): 4, ("swsh1-4", "normal"): 2, ("swsh1-1", "normal"): 0})
+    db.delete_card("swsh2-5", "normal")
+    db.add_card("swsh2-5", 2, "holofoil")
+    assert_matches_fresh_valuation(db)
+    rq.multipliers.update({"swsh1-2": 3, "swsh1-3": 0.5})
+    assert db.refresh_prices() == 2
+    assert_matches_fresh_valuation(db)
+    db.add_card("swsh1-3", 1, "holofoil")
+    db.remove_cards([("swsh1-4", "normal", 2)])
+    assert_matches_fresh_valuation(db)
+
+
+def test_changes_do_not_request_prices(db, rq):
+    db.collection_value()
+    requests = rq.requests
+    rq.forget_cards(["swsh3-1", "swsh3-2", "swsh1-1"])
+    value = db._value
+    value.change("swsh3-1", "normal", 0, 2)
+    value.change("swsh3-2", "holofoil", 0, 1)
+    value.change("swsh3-2", "holofoil", 1, 0)
+    value.change("swsh1-1", "normal", 2, 5)
+    assert rq.requests == requests
+    assert value.entry_prices("swsh3-1", "normal") is None
+    assert value.value_pending() == 1
+    assert rq.requests == requests + 1
+    assert value.entry_prices("swsh3-1", "normal") == (10, 25, 100, 20, None)
+
+
+def test_removed_slots_are_reused(db):
+    db.collection_value()
+    value = db._value
+    slots = len(value.qnty)
+    db.delete_card("swsh1-1", "normal")
+    db.add_card("swsh3-1", 1, "normal")
+    assert len(value.qnty) == slots
+    assert_matches_fresh_valuation(db)
+
+
+def test_refreshing_prices_keeps_the_cached_cards_of_other_logs(db, rq):
+    db.collection_value()
+    other = rq.get_card("swsh4-1")
+    requests = rq.requests
+    db.refresh_prices()
+    assert rq.requests == requests + len(set(db.get_card_ids()))
+    assert rq.get_card("swsh4-1") is other
+    assert rq.requests == requests + len(set(db.get_card_ids()))